@@ -2,5 +2,10 @@
 
 BASE_DIR=/opt/gource_studio
 
-# Start Celery worker
-celery -A gource_studio worker --loglevel=INFO
+if [ "$1" = "beat" ]; then
+    # Start Celery beat scheduler (run only one instance)
+    exec celery -A gource_studio beat --loglevel=INFO
+fi
+
+# Start Celery worker (consuming default and draft build queues)
+celery -A gource_studio worker -Q celery,${DRAFT_BUILD_QUEUE:-drafts} --loglevel=INFO
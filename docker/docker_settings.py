@@ -38,7 +38,17 @@ if os.environ.get('SECRET_KEY'):
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER', 'redis://redis:6379')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_BACKEND', 'redis://redis:6379')
 
+# Shared cache configuration
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_URL', 'redis://redis:6379/1'),
+    }
+}
+
 MEDIA_ROOT = "/var/run/gource_studio/media"
+# Cloned repositories kept on data volume (shared by Celery workers)
+VCS_CACHE_DIR = "/var/run/gource_studio/vcs_cache"
 
 #if DEBUG:
 #    INTERNAL_IPS = ["127.0.0.1"]
@@ -56,5 +66,8 @@ else:
         'gitlab.com',
     ]
 
+# Celery queue of draft builds (also consumed by worker, see `celery-entrypoint.sh`)
+DRAFT_BUILD_QUEUE = os.environ.get('DRAFT_BUILD_QUEUE', 'drafts')
+
 # Enable using headless X11 buffer
 USE_XVFB = True
@@ -15,3 +15,33 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+
+@app.on_after_configure.connect
+def setup_periodic_tasks(sender, **kwargs):
+    from django.conf import settings
+
+    # Check remote branches of projects for new commits (see `PROJECT_REFRESH_INTERVAL`)
+    interval = getattr(settings, 'PROJECT_REFRESH_INTERVAL', None)
+    if interval:
+        sender.add_periodic_task(interval, sender.signature('gource_studio.core.tasks.schedule_project_refreshes'),
+                                 name='schedule-project-refreshes')
+
+    # Remove expired draft builds (see `DRAFT_BUILD_MAX_AGE`)
+    if getattr(settings, 'DRAFT_BUILD_MAX_AGE', None):
+        sender.add_periodic_task(60*60, sender.signature('gource_studio.core.tasks.cleanup_draft_builds'),
+                                 name='cleanup-draft-builds')
+
+    # Remove work directories of errored/aborted builds (see `BUILD_WORK_DIR_MAX_AGE`)
+    if getattr(settings, 'BUILD_WORK_DIR', None):
+        sender.add_periodic_task(60*60, sender.signature('gource_studio.core.tasks.cleanup_build_work_dirs'),
+                                 name='cleanup-build-work-dirs')
+
+    # Keep VCS repository cache within size limit (see `VCS_CACHE_MAX_SIZE`)
+    if getattr(settings, 'VCS_CACHE_DIR', None) and getattr(settings, 'VCS_CACHE_MAX_SIZE', None):
+        sender.add_periodic_task(60*60, sender.signature('gource_studio.core.tasks.evict_vcs_mirrors'),
+                                 name='evict-vcs-mirrors')
+
+    # Remove log summaries no longer used by any project or build
+    sender.add_periodic_task(24*60*60, sender.signature('gource_studio.core.tasks.cleanup_log_summaries'),
+                             name='cleanup-log-summaries')
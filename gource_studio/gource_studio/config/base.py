@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -178,6 +179,17 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_BROKER_URL = "redis://localhost:6379"
 CELERY_BROKER_CONNECTION_RETRY = True
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Builds are acknowledged after completion (see `generate_gource_build`), so
+# keep them reserved longer than the longest render before redelivering
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 5*60*60}   # 5 hours
+
+# Cache shared by web and Celery processes (VCS snapshots, per-host fetch limits)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': "redis://localhost:6379/1",
+    }
+}
 
 # Whitelist of web domains that projects can be pulled from
 PROJECT_DOMAINS = [
@@ -186,6 +198,69 @@ PROJECT_DOMAINS = [
     'gitlab.com',
 ]
 
+# Automatic refresh of project logs (projects with active project URL)
+# - Seconds between checks of each project's remote branch (None disables)
+PROJECT_REFRESH_INTERVAL = 60*60
+# - Maximum concurrent checks/fetches per host (shared through Django cache)
+PROJECT_REFRESH_HOST_CONCURRENCY = 2
+# - Queue a new build after refreshing a changed project log
+PROJECT_REFRESH_AUTO_BUILD = False
+# - Extend video of previous build when possible (render only new log entries)
+PROJECT_REFRESH_INCREMENTAL_BUILD = False
+
+# Local cache of cloned Git/Mercurial repositories (updated using `git fetch`/`hg pull`)
+# - Default: user cache folder (`$XDG_CACHE_HOME` or "~/.cache"), outside the source tree
+# - Set to None to always clone into a temporary folder
+VCS_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / ".cache") / "gource_studio" / "vcs_cache"
+# - Disk budget (in bytes), least recently used repositories are removed first
+VCS_CACHE_MAX_SIZE = 5*1024*1024*1024   # 5 GB
+# Seconds to reuse a downloaded log/tags snapshot for the same repository/branch
+VCS_SNAPSHOT_CACHE_TIMEOUT = 60
+
+# Segmented rendering (split timeline into windows rendered concurrently)
+# - Number of segments per video ("auto" = one per 2 CPU cores, 1 disables)
+GOURCE_RENDER_SEGMENTS = 1
+# - Upper limit when using "auto"
+GOURCE_RENDER_MAX_SEGMENTS = 8
+# - Minimum (estimated) seconds of video per segment
+GOURCE_SEGMENT_MIN_SECONDS = 60
+# - Seconds rendered (and dropped) at start of each segment to build up file tree
+GOURCE_SEGMENT_PREROLL_SECONDS = 2.0
+
+# Format of frames piped from Gource to FFmpeg: "ppm" (FFmpeg decodes PPM images)
+# or "rawvideo" (PPM headers stripped before FFmpeg), or mapping of video size
+# to format (see `python manage.py benchmark_pipe_formats`)
+GOURCE_PIPE_FORMAT = "ppm"
+
+# Draft (preview) builds (see `Project.create_build(draft=True)`)
+# - Celery queue of draft builds (run a separate worker for it, e.g.
+#   `celery -A gource_studio worker -Q drafts`), None to use default queue
+DRAFT_BUILD_QUEUE = "drafts"
+# - Output framerate of draft videos
+DRAFT_BUILD_FRAMERATE = 30
+# - Seconds until finished draft builds are removed (None to keep)
+DRAFT_BUILD_MAX_AGE = 24*60*60
+
+# Seconds unreferenced build files (blobs) are kept after last being written or
+# shared, as they may be about to be referenced by a new build (see `gc_blobs`)
+BLOB_MIN_AGE = 60*60
+
+# Persistent work directory of running builds (one folder per build)
+# - Rendered segments are kept, so interrupted builds resume where they left off
+# - None (default) renders in a temporary folder (no resume); set to a local
+#   folder with room for rendered video, e.g. `MEDIA_ROOT.parent / "build_work"`
+#   or "/tmp/gource_studio/build_work"
+BUILD_WORK_DIR = None
+# - Maximum (estimated) seconds of video per checkpointed segment (e.g. 10*60),
+#   None to only split renders into `GOURCE_RENDER_SEGMENTS`
+GOURCE_CHECKPOINT_SECONDS = None
+# - Attempts at processing a build (including redeliveries after a worker
+#   restart or crash) before it is marked as errored
+BUILD_MAX_ATTEMPTS = 3
+# - Seconds work directories of finished (e.g. errored) builds are kept for
+#   re-queueing, before removal by Celery beat
+BUILD_WORK_DIR_MAX_AGE = 7*24*60*60
+
 # Custom software executable paths
 # - `git`
 GIT_PATH = None
@@ -7,6 +7,7 @@ from ..models import (
     ProjectBuild,
     ProjectBuildOption,
     ProjectCaption,
+    ProjectFetch,
     ProjectOption,
     ProjectMember,
     ProjectUserAvatar,
@@ -36,6 +37,32 @@ class ProjectLogSerializer(serializers.Serializer):
         fields = ('commit_hash', 'commit_preview', 'commit_time', 'updated_at', 'url')
 
 
+class ProjectLogDetailSerializer(ProjectLogSerializer):
+    """Adds cached log summary details (used for delta updates)"""
+    sha256 = serializers.SerializerMethodField()
+    size = serializers.SerializerMethodField()
+
+    def _get_log_summary(self, obj):
+        if not obj.project_log:
+            return None
+        try:
+            return obj.get_log_summary()
+        except (RuntimeError, ValueError):
+            return None     # Missing/invalid log
+
+    def get_sha256(self, obj):
+        summary = self._get_log_summary(obj)
+        return summary.sha256 if summary else None
+
+    def get_size(self, obj):
+        summary = self._get_log_summary(obj)
+        return summary.size if summary else None
+
+    class Meta:
+        model = Project
+        fields = ProjectLogSerializer.Meta.fields + ('sha256', 'size')
+
+
 class ProjectMemberSerializer(serializers.HyperlinkedModelSerializer):
     project = serializers.SerializerMethodField('get_project_url')
     project_id = serializers.PrimaryKeyRelatedField(source='project', read_only=True)
@@ -124,7 +151,7 @@ class ProjectSerializer(serializers.HyperlinkedModelSerializer):
         model = Project
         fields = ('id', 'name', 'project_slug', 'project_url', 'project_url_active',
                   'project_branch', 'project_vcs',
-                  'project_log', 'video_size', 'build_title',
+                  'project_log', 'video_size', 'encoder_profile', 'build_title',
                   'build_logo', 'build_background',
                   'build_audio', 'build_audio_name',
                   'options', 'builds', 'captions', 'avatars', 'members',
@@ -173,14 +200,34 @@ class ProjectBuildSerializer(serializers.HyperlinkedModelSerializer):
         model = ProjectBuild
         fields = ('id', 'project_id', 'project_branch',
                   'status', 'error_description', 'content', 'content_size', 'duration',
-                  'screenshot', 'thumbnail', 'project_log', 'options',
-                  'is_full_build', 'current_build_stage', 'current_build_message',
+                  'screenshot', 'thumbnail', 'project_log', 'options', 'encoder_profile',
+                  'is_full_build', 'is_draft', 'base_build_id', 'current_build_stage', 'current_build_message',
                   'queued_at', 'running_at', 'aborted_at', 'completed_at', 'errored_at', 'url')
         read_only_fields = ('project_id', 'project_branch', 'status', 'content_size', 'duration',
-                            'is_full_build', 'current_build_stage', 'current_build_message',
+                            'encoder_profile', 'is_full_build', 'is_draft', 'base_build_id', 'current_build_stage', 'current_build_message',
                             'queued_at', 'running_at', 'aborted_at', 'completed_at', 'errored_at')
 
 
+class ProjectFetchSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+    build = serializers.SerializerMethodField('get_build_url')
+
+    def get_url(self, obj):
+        return reverse('api-project-fetch-detail', args=[obj.project_id, obj.pk], request=self.context.get('request'))
+
+    def get_build_url(self, obj):
+        if obj.build_id:
+            return reverse('api-project-build-detail', args=[obj.project_id, obj.build_id], request=self.context.get('request'))
+        return None
+
+    class Meta:
+        model = ProjectFetch
+        fields = ('id', 'project_id', 'project_url', 'project_branch', 'status', 'error_description',
+                  'commit_hash', 'load_captions', 'queue_build', 'build', 'duration',
+                  'queued_at', 'running_at', 'completed_at', 'errored_at', 'url')
+        read_only_fields = fields
+
+
 class ProjectOptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProjectOption
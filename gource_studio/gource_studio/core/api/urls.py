@@ -19,6 +19,7 @@ urlpatterns = [
     re_path(r'^playlists/(?P<playlist_id>\d+)/projects/(?P<playlist_project_id>\d+)/?$', views.UserPlaylistProjectDetail.as_view(), name='api-user-playlist-project-detail'),
     # - Projects
     re_path(r'^projects/?$', views.ProjectsList.as_view(), name='api-projects-list'),
+    re_path(r'^projects/import/?$', views.ProjectsImport.as_view(), name='api-projects-import'),
     re_path(r'^projects/(?P<project_id>\d+)/?$', views.ProjectDetail.as_view(), name='api-project-detail'),
     re_path(r'^projects/(?P<project_id>\d+)/actions/?$', views.ProjectActions.as_view(), name='api-project-actions'),
     re_path(r'^projects/(?P<project_id>\d+)/avatars/?$', views.ProjectUserAvatarsList.as_view(), name='api-project-useravatars-list'),
@@ -44,6 +45,8 @@ urlpatterns = [
     re_path(r'^projects/(?P<project_id>\d+)/builds/(?P<project_build_id>\d+)/screenshot/download/?$', views.ProjectBuildScreenshotDownload.as_view(), name='api-project-build-screenshot-download'),
     re_path(r'^projects/(?P<project_id>\d+)/builds/(?P<project_build_id>\d+)/thumbnail/download/?$', views.ProjectBuildThumbnailDownload.as_view(), name='api-project-build-thumbnail-download'),
     re_path(r'^projects/(?P<project_id>\d+)/captions/?$', views.ProjectCaptionsList.as_view(), name='api-project-captions-list'),
+    re_path(r'^projects/(?P<project_id>\d+)/fetches/?$', views.ProjectFetchesList.as_view(), name='api-project-fetches-list'),
+    re_path(r'^projects/(?P<project_id>\d+)/fetches/(?P<project_fetch_id>\d+)/?$', views.ProjectFetchDetail.as_view(), name='api-project-fetch-detail'),
     re_path(r'^projects/(?P<project_id>\d+)/members/?$', views.ProjectMembersList.as_view(), name='api-project-members-list'),
     re_path(r'^projects/(?P<project_id>\d+)/members/(?P<user_id>\d+)/?$', views.ProjectMemberDetail.as_view(), name='api-project-member-detail'),
     re_path(r'^projects/(?P<project_id>\d+)/options/?$', views.ProjectOptionsList.as_view(), name='api-project-options-list'),
@@ -51,6 +54,7 @@ urlpatterns = [
     re_path(r'^projects/(?P<project_slug>[-\w]+)/project_log/?$', views.ProjectLogDetail.as_view(), name='api-project-log-slug'),
     re_path(r'^projects/(?P<project_id>\d+)/project_log/download/?$', views.ProjectLogDownload.as_view(), name='api-project-log-download'),
     re_path(r'^projects/(?P<project_id>\d+)/utils/duration/?$', views.ProjectDurationUtility.as_view(), name='api-project-duration-utility'),
+    re_path(r'^projects/(?P<project_id>\d+)/utils/duration/batch/?$', views.ProjectDurationBatchUtility.as_view(), name='api-project-duration-batch-utility'),
     #re_path(r'^projects/(?P<project_id>\d+)/utils/members_query/?$', views.ProjectQueryMembersUtility.as_view(), name='api-project-query-members-utility'),
     re_path(r'^users/?$', views.AvailableUsersList.as_view(), name='api-available-users-list'),
 ]
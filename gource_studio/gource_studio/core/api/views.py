@@ -8,7 +8,7 @@ from django import forms
 from django.core.files.base import ContentFile
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser, Group as AuthGroup
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import DateTimeField, Exists, Max, OuterRef, Prefetch, Q, Subquery, Value
 from django.db.models.functions import Coalesce, Greatest
 from django.shortcuts import get_object_or_404
@@ -22,11 +22,14 @@ from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
 from ..constants import GOURCE_OPTIONS, VIDEO_OPTIONS
+from ..importer import import_projects, load_project_manifest
 from ..models import (
+    LogSummary,
     Project,
     ProjectBuild,
     ProjectBuildOption,
     ProjectCaption,
+    ProjectFetch,
     ProjectMember,
     ProjectOption,
     ProjectUserAvatar,
@@ -38,16 +41,14 @@ from ..models import (
 )
 from ..tasks import generate_gource_build
 from ..utils import (
-    analyze_gource_log,
     convert_image_to_supported,
-    download_git_log,
-    download_git_tags,
-    estimate_gource_video_duration,
+    download_git_snapshot,
     get_ffmpeg_version,
     get_git_version,
     get_gource_version,
     get_mercurial_version,
     get_xvfb_run,
+    serve_gource_log,
     test_http_url,
     validate_project_url,
 )
@@ -56,7 +57,8 @@ from .serializers import (
     ProjectBuildOptionSerializer,
     ProjectBuildSerializer,
     ProjectCaptionSerializer,
-    ProjectLogSerializer,
+    ProjectFetchSerializer,
+    ProjectLogDetailSerializer,
     ProjectMemberSerializer,
     ProjectOptionSerializer,
     ProjectSerializer,
@@ -221,35 +223,10 @@ class ProjectsList(ProjectPermissionQuerySetMixin, generics.ListCreateAPIView):
                     response['project_url'] = f"Failed to validate project URL: {str(e)}"
                     return Response(response, status=status.HTTP_400_BAD_REQUEST)
 
-                # Test that URL is reachable
-                # NOTE: some domains don't support HEAD/OPTIONS requests...
-                try:
-                    test_http_url(project_url)
-                except Exception as e:
-                    response['project_url'] = f"Failed to reach project URL: {str(e)}"
-                    return Response(response, status=status.HTTP_400_BAD_REQUEST)
-
         else:
             # If no project URL provided, unset this
             project_url_active = False
 
-        # Download initial project data
-        log_data = log_hash = log_subject = tags_list = None
-        if project_url and project_url_active:
-            try:
-                if project_vcs == 'git':
-                    log_data, log_hash, log_subject, tags_list = download_git_log(project_url, branch=project_branch)
-                elif project_vcs == 'hg':
-                    # TODO
-                    response['project_vcs'] = "Mercurial download not supported"
-                    return Response(response, status=status.HTTP_400_BAD_REQUEST)
-                else:
-                    response['project_vcs'] = f"Invalid VCS option: {project_vcs}"
-                    return Response(response, status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                response['project_url'] = f"Error downloading initial VCS log: {str(e)}"
-                return Response(response, status=status.HTTP_400_BAD_REQUEST)
-
         project = Project(
             name=project_name,
             project_url=project_url,
@@ -259,41 +236,54 @@ class ProjectsList(ProjectPermissionQuerySetMixin, generics.ListCreateAPIView):
             is_public=project_is_public,
             created_by=request.user
         )
-        # Populate attributes from source download
-        if log_hash:
-            project.project_log_commit_hash = log_hash
-        if log_subject:
-            project.project_log_commit_preview = log_subject
-        # Get time/author from last entry
-        if log_data is not None:
-            latest_commit = log_data.splitlines()[-1].split('|')
-            project.project_log_commit_time = datetime.utcfromtimestamp(int(latest_commit[0])).replace(tzinfo=timezone.utc)
         project.save()
 
-        # Load initial ProjectCaptions from VCS tags
-        if 'load_captions_from_tags' in request.data \
-                and str(request.data['load_captions_from_tags']).lower() in ['1', 't', 'true'] \
-                and tags_list:
-            try:
-                for timestamp, tag_name in tags_list:
-                    try:
-                        caption, created = ProjectCaption.objects.get_or_create(
-                            project=project,
-                            timestamp=timestamp,
-                            text=tag_name
-                        )
-                    except Exception as ex:
-                        logging.error("Failed to load caption: %s", str(ex))
-            except Exception as e:
-                logging.error("Failed to retrieve project tags: %s", str(e))
+        # Download initial project data (and ProjectCaptions from VCS tags)
+        # in background; client polls `fetch.url` for progress
+        if project_url and project_url_active:
+            load_captions = str(request.data.get('load_captions_from_tags', '')).lower() in ['1', 't', 'true']
+            fetch = project.queue_fetch(load_captions=load_captions, user=request.user)
+            response = ProjectSerializer(project, context={'request': request}).data
+            response['fetch'] = ProjectFetchSerializer(fetch, context={'request': request}).data
+            return Response(response, status=status.HTTP_202_ACCEPTED,
+                            headers={'Location': response['fetch']['url']})
 
-        # Save new Gource log content
-        if log_data is not None:
-            project.project_log.save('gource.log', ContentFile(log_data))
         response = ProjectSerializer(project, context={'request': request}).data
         return Response(response, status=status.HTTP_201_CREATED)
 
 
+class ProjectsImport(views.APIView):
+    """
+    Create projects in bulk from a manifest (see `importer.import_projects()`).
+
+        {
+            "projects": [
+                {"project_url", "name", "project_branch", "is_public", "options", ...},
+                ...
+            ]
+        }
+
+    Project logs are downloaded in background (see `ProjectFetch`), and
+    the response lists the result of each entry (in manifest order).
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            manifest = load_project_manifest(request.data)
+        except ValueError as e:
+            return Response({"projects": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = import_projects(manifest, user=request.user, fetch_logs=False, queue_fetches=True)
+        for result in results:
+            if result['fetch_id']:
+                result['fetch_url'] = reverse('api-project-fetch-detail', args=[result['project_id'], result['fetch_id']], request=request)
+        response = {"results": results}
+        if any(result['status'] == 'queued' for result in results):
+            return Response(response, status=status.HTTP_202_ACCEPTED)
+        return Response(response, status=status.HTTP_200_OK)
+
+
 class ProjectDetail(ProjectPermissionQuerySetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve details about a project.
@@ -309,7 +299,7 @@ class ProjectDetail(ProjectPermissionQuerySetMixin, generics.RetrieveUpdateDestr
 
         # Determine if request contains fields that would change video content
         # (and therefore require a new video build)
-        VIDEO_FIELDS = ['gource_options', 'captions', 'video_size', 'build_title']
+        VIDEO_FIELDS = ['gource_options', 'captions', 'video_size', 'encoder_profile', 'build_title']
         has_video_settings = any(k in VIDEO_FIELDS for k in request.data.keys())
 
         # Gource Video options list
@@ -462,7 +452,7 @@ class ProjectActions(ProjectPermissionQuerySetMixin, views.APIView):
             if not project.project_url_active:
                 return Response({"detail": "VCS fetch is not enabled for this project."}, status=status.HTTP_400_BAD_REQUEST)
             content = test_http_url(project.project_url)
-            tags_list = download_git_tags(project.project_url, branch=project.project_branch)
+            tags_list = download_git_snapshot(project.project_url, branch=project.project_branch, vcs=project.project_vcs).tags
             for timestamp, tag_name in tags_list:
                 captions_added = 0
                 try:
@@ -488,9 +478,14 @@ class ProjectActions(ProjectPermissionQuerySetMixin, views.APIView):
 class ProjectLogDetail(ProjectPermissionQuerySetMixin, generics.RetrieveUpdateAPIView):
     """
     Update project (Gource) 'project.log' contents or metadata.
+
+    Send the full log contents using `project_log`, or only the new entries
+    to be appended using `project_log_delta`.  Delta updates must include
+    `project_log_base` set to the current log `sha256`, and are rejected
+    (409 Conflict) if the log has since changed.
     """
     queryset = Project.objects.all()
-    serializer_class = ProjectLogSerializer
+    serializer_class = ProjectLogDetailSerializer
 
     def get_object(self, *args, **kwargs):
         if 'project_id' in self.kwargs:
@@ -508,6 +503,13 @@ class ProjectLogDetail(ProjectPermissionQuerySetMixin, generics.RetrieveUpdateAP
 
     def put(self, request, *args, **kwargs):
         project = self.get_object()
+        # Lock project while updating, so concurrent updates (e.g. deltas
+        # against the same base) are applied one at a time
+        with transaction.atomic():
+            project = Project.objects.select_for_update().get(pk=project.pk)
+            return self._update_project_log(request, project)
+
+    def _update_project_log(self, request, project):
         response_status = status.HTTP_200_OK
         if not project.project_log:
             response_status = status.HTTP_201_CREATED
@@ -522,20 +524,29 @@ class ProjectLogDetail(ProjectPermissionQuerySetMixin, generics.RetrieveUpdateAP
         if 'project_log' in request.data:
             log_data = request.data['project_log']
             try:
-                analyze_gource_log(log_data)
+                log_summary = LogSummary.objects.get_or_create_for_log(log_data)
             except Exception as e:
                 # Invalid Gource log
                 logging.exception("Error analyzing log")
                 return Response({"project_log": "Error analyzing project log: {0}".format(str(e))}, status=status.HTTP_400_BAD_REQUEST)
             try:
-                if project.project_log:
-                    #os.remove(project.project_log.path)
-                    project.project_log.delete()
-                project.project_log.save('gource.log', ContentFile(log_data))
+                project.save_project_log(log_data, summary=log_summary)
             except Exception as e:
                 # Error saving (500?)
                 logging.exception("Error saving log")
                 return Response({"project_log": "Error saving project log: {0}".format(str(e))}, status=status.HTTP_400_BAD_REQUEST)
+        elif 'project_log_delta' in request.data:
+            if not project.project_log:
+                return Response({"project_log_delta": "Project has no log to append to."}, status=status.HTTP_409_CONFLICT)
+            if 'project_log_base' not in request.data:
+                return Response({"project_log_base": "Missing required field."}, status=status.HTTP_400_BAD_REQUEST)
+            if request.data['project_log_base'] != project.get_log_summary().sha256:
+                return Response({"project_log_base": "Project log has changed; full upload required."}, status=status.HTTP_409_CONFLICT)
+            try:
+                project.append_project_log(request.data['project_log_delta'])
+            except ValueError as e:
+                return Response({"project_log_delta": "Error analyzing project log: {0}".format(str(e))}, status=status.HTTP_400_BAD_REQUEST)
+        project.save()
 
         serializer = self.get_serializer(project, context={'request': request})
         return Response(serializer.data, status=response_status)
@@ -544,12 +555,14 @@ class ProjectLogDetail(ProjectPermissionQuerySetMixin, generics.RetrieveUpdateAP
 class ProjectLogDownload(ProjectPermissionQuerySetMixin, views.APIView):
     """
     Download project (Gource) 'project.log' contents.
+
+    Compressed logs are sent as stored if client accepts gzip encoding.
     """
     queryset = Project.objects.all()
 
     def get(self, request, *args, **kwargs):
         project = get_object_or_404(self.get_queryset(), **{'id': self.kwargs['project_id']})
-        return _serve_file_field(request, project, 'project_log')
+        return serve_gource_log(request, project.project_log.path)
 
 
 class ProjectLogoDetail(ProjectPermissionQuerySetMixin, views.APIView):
@@ -897,6 +910,33 @@ class ProjectBuildsByProjectList(ProjectBuildsList):
         return super().get_queryset().filter(project=project)
 
 
+class ProjectFetchesList(generics.ListAPIView):
+    """
+    Retrieve a list of VCS log fetches for a project.
+    """
+    queryset = ProjectFetch.objects.all()
+    serializer_class = ProjectFetchSerializer
+
+    def get_queryset(self):
+        project = get_object_or_404(Project.objects.filter_permissions(self.request.user), **{'id': self.kwargs['project_id']})
+        return super().get_queryset().filter(project=project)
+
+
+class ProjectFetchDetail(generics.RetrieveAPIView):
+    """
+    Retrieve status of a VCS log fetch.
+    """
+    queryset = ProjectFetch.objects.all()
+    serializer_class = ProjectFetchSerializer
+
+    def get_object(self):
+        project = get_object_or_404(Project.objects.filter_permissions(self.request.user), **{'id': self.kwargs['project_id']})
+        return get_object_or_404(super().get_queryset(), **{
+            'project_id': project.id,
+            'id': self.kwargs['project_fetch_id']
+        })
+
+
 class ProjectBuildDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = ProjectBuild.objects.all()
     serializer_class = ProjectBuildSerializer
@@ -949,17 +989,30 @@ class CreateNewProjectBuild(generics.CreateAPIView):
         refetch_log = request.data.get('refetch_log', None)
         # Determine if new build should only remix audio from preview build
         remix_audio = request.data.get('remix_audio', None)
+        # Determine if new build should extend video of previous build (new log entries only)
+        incremental = str(request.data.get('incremental', '')).lower() in ['t', 'true', '1']
+        # Determine if new build is a quick (low resolution) preview
+        draft = str(request.data.get('draft', '')).lower() in ['t', 'true', '1']
 
         response = {}
         # Check if project currently has queued build
+        # - Draft builds are queued separately from full builds
         # TODO: allow more than one at a time?
-        if project.builds.filter(status__in=['pending', 'queued', 'running']).count():
+        if project.builds.filter(is_draft=draft, status__in=['pending', 'queued', 'running']).count():
             response = {
-                "detail": "Project already has pending builds."
+                "detail": "Project already has a pending draft build." if draft else "Project already has pending builds."
             }
             return Response(response, status=status.HTTP_400_BAD_REQUEST)
 
         try:
+            # Preview current project settings (using current project log)
+            if draft:
+                if not project.project_log:
+                    return Response({"detail": "Project does not have a log yet. Cannot build."}, status=status.HTTP_400_BAD_REQUEST)
+                build = project.create_build(draft=True)
+                serializer = self.get_serializer(build, context={'request': request})
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
+
             # Utilize feature to remix audio only
             if str(remix_audio).lower() in ['t', 'true', '1']:
                 latest_build = project.latest_build
@@ -984,28 +1037,17 @@ class CreateNewProjectBuild(generics.CreateAPIView):
                 # Return success response
                 return Response(response, status=status.HTTP_201_CREATED)
 
-            if not project.project_log:
-                response = {
-                    "detail": "Project does not have a log yet. Cannot build."
-                }
-                return Response(response, status=status.HTTP_400_BAD_REQUEST)
-
             # Check if user requested new VCS log to be downloaded
+            # - Log is downloaded in background, then build is queued
             if str(refetch_log).lower() in ['t', 'true', '1']:
                 if not project.project_url_active:
                     return Response({"detail": "VCS fetch is not enabled for this project."}, status=status.HTTP_400_BAD_REQUEST)
-                # Download latest VCS branch; generate Gource log
-                content = test_http_url(project.project_url)
-                log_data, log_hash, log_subject, tags_list = download_git_log(project.project_url, branch=project.project_branch)
-                project.project_log_commit_hash = log_hash
-                project.project_log_commit_preview = log_subject
-                # Get time/author from last entry
-                latest_commit = log_data.splitlines()[-1].split('|')
-                project.project_log_commit_time = datetime.utcfromtimestamp(int(latest_commit[0])).replace(tzinfo=timezone.utc)
-                if project.project_log:
-                    #os.remove(project.project_log.path)
-                    project.project_log.delete()
-                project.project_log.save('gource.log', ContentFile(log_data))
+                if project.pending_fetch:
+                    return Response({"detail": "Project already has a pending VCS fetch."}, status=status.HTTP_400_BAD_REQUEST)
+                fetch = project.queue_fetch(queue_build=True, user=request.user)
+                response = ProjectFetchSerializer(fetch, context={'request': request}).data
+                return Response(response, status=status.HTTP_202_ACCEPTED,
+                                headers={'Location': response['url']})
 
             if not project.project_log:
                 response = {
@@ -1014,7 +1056,7 @@ class CreateNewProjectBuild(generics.CreateAPIView):
                 return Response(response, status=status.HTTP_400_BAD_REQUEST)
 
             # Create new build (immediately in "queued" state)
-            build = project.create_build()
+            build = project.create_build(incremental=incremental)
 
             # Update parent project to unset `is_project_changed`
             project.set_project_changed(False)
@@ -1064,7 +1106,7 @@ class ProjectBuildProjectLogDownload(views.APIView):
             'project_id': project.id,
             'id': self.kwargs['project_build_id']
         })
-        return _serve_file_field(request, project_build, 'project_log')
+        return serve_gource_log(request, project_build.project_log.path)
 
 
 class ProjectBuildLogoDownload(views.APIView):
@@ -1483,6 +1525,10 @@ class ProjectDurationUtility(views.APIView):
 
         `seconds-per-day`       [float] Speed of simulation in seconds per day.
         `auto-skip-seconds`     [float] Idle duration before skipping to next date entry.
+        `start-date`            [str] Only include log entries from this date (YYYY-MM-DD [HH:mm:ss]).
+        `stop-date`             [str] Only include log entries until this date.
+
+    Estimates are corrected using the results of past builds.
 
     Returns estimated video duration in seconds.
     """
@@ -1494,32 +1540,9 @@ class ProjectDurationUtility(views.APIView):
         # Check for project log and read contents
         if not bool(project.project_log):
             return Response({"detail": "Project has no project log available for estimation."}, status=status.HTTP_400_BAD_REQUEST)
-        with open(project.project_log.path, 'r') as _file:
-            data = _file.read()
-
-        # Parse project log and determine action counts
-        added = 0
-        modded = 0
-        deleted = 0
-        lines = data.strip().split('\n')
-        for line in lines:
-            # <TIME>|<AUTHOR>|<MODIFICATION>|<PATH>
-            segments = line.split('|')
-            if segments[2] == 'A': added += 1
-            elif segments[2] == 'M': modded += 1
-            elif segments[2] == 'D': deleted += 1
 
         # Load relevant video duration options
-        PROJECT_DURATION_OPTIONS = ['seconds-per-day', 'auto-skip-seconds']
-        project_options = project.options.filter(name__in=PROJECT_DURATION_OPTIONS)
-        # - Gource defaults
-        option_spd = 1.0
-        option_ass = 3.0
-        for option in project_options:
-            if option.name == 'seconds-per-day':
-                option_spd = float(option.value)
-            if option.name == 'auto-skip-seconds':
-                option_ass = float(option.value)
+        option_spd, option_ass = self.get_project_duration_options(project)
         # - Allow for HTTP request overrides (via URL params)
         try:
             option_spd = float(request.GET.get('seconds-per-day', None))
@@ -1535,7 +1558,11 @@ class ProjectDurationUtility(views.APIView):
             'seconds-per-day': option_spd,
             'auto-skip-seconds': option_ass,
         }
-        duration = estimate_gource_video_duration(data, gource_options=gource_options)
+        try:
+            log_stats = project.get_log_stats(**self.get_project_date_options(project, request))
+            duration = project.get_duration_calibration().apply(log_stats.estimate_duration(gource_options))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         td_duration = str(timedelta(seconds=int(duration)))
         response = {
             "duration": duration,
@@ -1543,6 +1570,126 @@ class ProjectDurationUtility(views.APIView):
         }
         return Response(response)
 
+    def get_project_duration_options(self, project):
+        """
+        Return (`seconds-per-day`, `auto-skip-seconds`) values from project options.
+        """
+        duration_options = project.get_duration_options()
+        return duration_options['seconds-per-day'], duration_options['auto-skip-seconds']
+
+    def get_project_date_options(self, project, request):
+        """
+        Return (`start_date`, `stop_date`) keyword arguments for `get_log_stats()`
+        from project options (or URL param overrides).
+        """
+        PROJECT_DATE_OPTIONS = ['start-date', 'stop-date']
+        date_options = {option.name: option.value
+                        for option in project.options.filter(name__in=PROJECT_DATE_OPTIONS)}
+        for name in PROJECT_DATE_OPTIONS:
+            if name in request.GET:
+                date_options[name] = request.GET[name]
+        return {
+            'start_date': date_options.get('start-date') or None,
+            'stop_date': date_options.get('stop-date') or None,
+        }
+
+
+class ProjectDurationBatchUtility(ProjectDurationUtility):
+    """
+    Utility to estimate the generated Project video duration for many
+    combinations of settings in a single request.
+
+    Use GET with comma-separated URL parameters to estimate every combination
+    (grid) of values (omitted options use the current project settings):
+
+        ?seconds-per-day=0.1,0.5,1&auto-skip-seconds=1,3
+
+    Or POST a JSON list of option pairs:
+
+        {"options": [{"seconds-per-day": 0.5, "auto-skip-seconds": 1}, ...]}
+
+    Returns list of estimates (in order):
+
+        {"results": [{"seconds-per-day": 0.1, "auto-skip-seconds": 1.0, "duration": 12.3, "duration_str": "0:00:12"}, ...]}
+    """
+    MAX_ESTIMATES = 1000
+
+    def get(self, request, *args, **kwargs):
+        project, response = self._get_project(request)
+        if response is not None:
+            return response
+        option_spd, option_ass = self.get_project_duration_options(project)
+        try:
+            spd_values = self._parse_values(request.GET.get('seconds-per-day', None), option_spd)
+            ass_values = self._parse_values(request.GET.get('auto-skip-seconds', None), option_ass)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        option_pairs = [(spd, ass) for spd in spd_values for ass in ass_values]
+        return self._estimate(project, option_pairs)
+
+    def post(self, request, *args, **kwargs):
+        project, response = self._get_project(request)
+        if response is not None:
+            return response
+        option_spd, option_ass = self.get_project_duration_options(project)
+        options_list = request.data.get('options', None)
+        if not isinstance(options_list, list):
+            return Response({"options": "Must provide a list of options."}, status=status.HTTP_400_BAD_REQUEST)
+        option_pairs = []
+        try:
+            for options in options_list:
+                if not isinstance(options, dict):
+                    raise ValueError(f"Invalid options: {options}")
+                option_pairs.append((
+                    self._parse_value(options.get('seconds-per-day', option_spd)),
+                    self._parse_value(options.get('auto-skip-seconds', option_ass)),
+                ))
+        except ValueError as e:
+            return Response({"options": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._estimate(project, option_pairs)
+
+    def _get_project(self, request):
+        project = get_object_or_404(self.queryset.filter_permissions(request.user), **{'id': self.kwargs['project_id']})
+        if not bool(project.project_log):
+            return project, Response({"detail": "Project has no project log available for estimation."}, status=status.HTTP_400_BAD_REQUEST)
+        return project, None
+
+    def _parse_value(self, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid option value: {value}")
+        if value <= 0:
+            raise ValueError(f"Option value must be greater than 0: {value}")
+        return value
+
+    def _parse_values(self, values, default):
+        if values is None or not values.strip():
+            return [default]
+        return [self._parse_value(value) for value in values.split(',')]
+
+    def _estimate(self, project, option_pairs):
+        if len(option_pairs) > self.MAX_ESTIMATES:
+            return Response({"detail": f"Too many option combinations (max={self.MAX_ESTIMATES})."}, status=status.HTTP_400_BAD_REQUEST)
+        gource_options_list = [
+            {'seconds-per-day': spd, 'auto-skip-seconds': ass}
+            for spd, ass in option_pairs
+        ]
+        try:
+            log_stats = project.get_log_stats(**self.get_project_date_options(project, self.request))
+            calibration = project.get_duration_calibration()
+            durations = [calibration.apply(duration) for duration in log_stats.estimate_durations(gource_options_list)]
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        results = []
+        for gource_options, duration in zip(gource_options_list, durations):
+            results.append({
+                **gource_options,
+                "duration": duration,
+                "duration_str": str(timedelta(seconds=int(duration))),
+            })
+        return Response({"results": results})
+
 
 class UserPlaylistsList(generics.ListCreateAPIView):
     """
@@ -15,6 +15,23 @@ VIDEO_OPTIONS = [
     ('3840x2160', '3840 x 2160'),   # 4K
 ]
 
+# FFmpeg (libx264) encoder profiles, trading encoding speed against file size
+# - `threads`: 0 lets FFmpeg decide, `keyint`: seconds between keyframes
+# - Override values using `ENCODER_PROFILES` setting
+ENCODER_PROFILE_CHOICES = [
+    ('draft', 'Draft'),         # Fast encoding, larger/lower quality
+    ('standard', 'Standard'),
+    ('archival', 'Archival'),   # Slow encoding, higher quality
+]
+ENCODER_PROFILES = {
+    'draft':    {'preset': 'ultrafast', 'crf': 28, 'threads': 0, 'tune': 'animation', 'keyint': 10},
+    'standard': {'preset': 'medium',    'crf': 23, 'threads': 0, 'tune': 'animation', 'keyint': 10},
+    'archival': {'preset': 'slow',      'crf': 18, 'threads': 0, 'tune': 'animation', 'keyint': 10},
+}
+DEFAULT_ENCODER_PROFILE = 'standard'
+# Name of `ProjectBuildOption` recording encoder profile of build
+ENCODER_PROFILE_OPTION = 'encoder-profile'
+
 # Default fonts to match normal text size from 720p
 # - Applied to video by default unless 'font-scale' set
 VIDEO_FONT_DEFAULTS = {
@@ -0,0 +1,275 @@
+"""
+Bulk import of projects from a manifest (see `import_projects()`).
+
+A manifest is a list of project entries:
+
+    [
+        {
+            "project_url": "https://github.com/acaudwell/Gource",   # Required
+            "name": "Gource",                   # Default: last URL path segment
+            "project_branch": "master",         # Default: "master" ("default" for hg)
+            "project_vcs": "git",               # "git" (default) or "hg"
+            "project_slug": "gource",           # Optional
+            "is_public": true,                  # Default: true
+            "encoder_profile": "standard",      # "draft", "standard" (default) or "archival"
+            "load_captions_from_tags": false,   # Default: false
+            "options": {"seconds-per-day": 0.5} # Gource options (merged with defaults)
+        },
+        ...
+    ]
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import logging
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .constants import DEFAULT_ENCODER_PROFILE, ENCODER_PROFILES, GOURCE_OPTIONS
+from .models import Project, ProjectCaption, ProjectOption
+from .utils import download_git_snapshot, test_http_url, validate_project_url
+
+# Default number of concurrent log downloads
+IMPORT_MAX_WORKERS = 4
+
+
+def load_project_manifest(data):
+    """
+    Return list of manifest entries from decoded JSON `data`
+    (list of entries, or object with "projects" list).
+
+    Raises `ValueError` if data is not a valid manifest.
+    """
+    if isinstance(data, dict):
+        data = data.get('projects')
+    if not isinstance(data, list):
+        raise ValueError("Manifest must be a list of projects")
+    return data
+
+
+def parse_manifest_entry(entry):
+    """
+    Validate manifest `entry` and return normalized copy (with `options`
+    converted to list of (name, value, value_type)).
+
+    Raises `ValueError` if entry is invalid.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError("Entry must be an object")
+    project_url = str(entry.get('project_url') or '').strip()
+    if not project_url:
+        raise ValueError("Missing required field: project_url")
+    try:
+        validate_project_url(project_url)
+    except ValueError as e:
+        raise ValueError(f"Failed to validate project URL: {str(e)}")
+    project_vcs = entry.get('project_vcs', 'git')
+    if project_vcs not in [ch[0] for ch in Project.VCS_CHOICES]:
+        raise ValueError(f"Unsupported VCS option: {project_vcs}")
+    project_branch = str(entry.get('project_branch') or ('default' if project_vcs == 'hg' else 'master'))
+    encoder_profile = entry.get('encoder_profile') or DEFAULT_ENCODER_PROFILE
+    if encoder_profile not in ENCODER_PROFILES:
+        raise ValueError(f"Invalid encoder profile: {encoder_profile}")
+
+    options = []
+    for name, value in (entry.get('options') or {}).items():
+        if name not in GOURCE_OPTIONS:
+            raise ValueError(f"Invalid Gource option '{name}'")
+        gource_opt = GOURCE_OPTIONS[name]
+        try:
+            gource_opt['parser'](value)
+        except Exception:
+            raise ValueError(f"Gource option error: {name} => {value}")
+        options.append((name, str(value), gource_opt['type']))
+
+    return {
+        'name': str(entry.get('name') or os.path.basename(project_url.rstrip('/'))),
+        'project_url': project_url,
+        'project_vcs': project_vcs,
+        'project_branch': project_branch,
+        'project_slug': entry.get('project_slug') or None,
+        'is_public': bool(entry.get('is_public', True)),
+        'encoder_profile': encoder_profile,
+        'load_captions_from_tags': bool(entry.get('load_captions_from_tags', False)),
+        'options': options,
+    }
+
+
+def _download_project_log(project_url, project_branch, project_vcs):
+    # Runs in worker thread (no database access)
+    start_time = time.monotonic()
+    test_http_url(project_url)
+    snapshot = download_git_snapshot(project_url, branch=project_branch, vcs=project_vcs)
+    if not snapshot.log_data:
+        raise ValueError("VCS log is empty")
+    return snapshot, time.monotonic() - start_time
+
+
+def import_projects(manifest, *, user=None, fetch_logs=True, queue_fetches=False,
+                    max_workers=IMPORT_MAX_WORKERS, progress=None):
+    """
+    Create projects from `manifest` entries (see module docstring).
+
+    Projects and their options are created using `bulk_create`.  Entries
+    matching an existing project (same URL and branch) are skipped.
+
+    Logs are then either downloaded using a pool of `max_workers` threads
+    (`fetch_logs`), or queued for background download (`queue_fetches`,
+    see `Project.queue_fetch()`).
+
+    `progress(result)` is called as each entry is finished.
+
+    Returns list of results (one per entry, in manifest order):
+
+        {"index", "name", "project_url", "project_id", "status", "error", "fetch_id", "duration"}
+
+    with `status` one of "invalid", "exists", "created", "queued", "fetched" or "errored".
+    """
+    results = []
+    pending = []    # [(result, entry, project)]
+    seen = {}       # {(project_url, project_branch): result}
+    seen_slugs = set()
+    duplicates = [] # [(result, original_result)]
+
+    def _finish(result):
+        if progress is not None:
+            progress(result)
+
+    ## 1 - Validate entries
+    for index, raw_entry in enumerate(manifest):
+        result = {"index": index, "name": None, "project_url": None, "project_id": None,
+                  "status": None, "error": None, "fetch_id": None, "duration": None}
+        results.append(result)
+        try:
+            entry = parse_manifest_entry(raw_entry)
+            result['name'] = entry['name']
+            result['project_url'] = entry['project_url']
+            source_key = (entry['project_url'], entry['project_branch'])
+            if source_key in seen:
+                # Repeated in manifest (finished along with first entry)
+                result['status'] = 'exists'
+                duplicates.append((result, seen[source_key]))
+                continue
+            existing = Project.objects.filter(project_url=entry['project_url'],
+                                              project_branch=entry['project_branch']).first()
+            if existing is not None:
+                result['status'] = 'exists'
+                result['project_id'] = existing.id
+                _finish(result)
+                continue
+            project = Project(
+                name=entry['name'],
+                project_url=entry['project_url'],
+                project_url_active=True,
+                project_vcs=entry['project_vcs'],
+                project_branch=entry['project_branch'],
+                project_slug=entry['project_slug'],
+                is_public=entry['is_public'],
+                encoder_profile=entry['encoder_profile'],
+                created_by=user if user and user.is_authenticated else None
+            )
+            project.full_clean()
+            if project.project_slug is not None:
+                if project.project_slug in seen_slugs:
+                    raise ValueError(f"Duplicate project_slug in manifest: {project.project_slug}")
+                seen_slugs.add(project.project_slug)
+            seen[source_key] = result
+        except (ValueError, ValidationError) as e:
+            result['status'] = 'invalid'
+            result['error'] = '; '.join(e.messages) if isinstance(e, ValidationError) else str(e)
+            _finish(result)
+            continue
+        pending.append((result, entry, project))
+
+    if not pending:
+        for result, _ in duplicates:
+            _finish(result)
+        return results
+
+    ## 2 - Create projects and options in bulk
+    # NOTE: `bulk_create` does not send `post_save`, so default options are added here
+    # NOTE: Primary keys are re-queried, as not every database backend sets them on `bulk_create`
+    try:
+        with transaction.atomic():
+            Project.objects.bulk_create([project for _, _, project in pending])
+            created = {
+                (project.project_url, project.project_branch): project
+                for project in Project.objects.filter(project_url__in=[entry['project_url'] for _, entry, _ in pending])
+            }
+            new_options = []
+            for index, (result, entry, _) in enumerate(pending):
+                project = created[(entry['project_url'], entry['project_branch'])]
+                options = {option.name: option for option in ProjectOption.get_defaults(project)}
+                for name, value, value_type in entry['options']:
+                    options[name] = ProjectOption(project=project, name=name, value=value, value_type=value_type)
+                new_options.extend(options.values())
+                pending[index] = (result, entry, project)
+            ProjectOption.objects.bulk_create(new_options)
+    except IntegrityError as e:
+        # Conflicting project created concurrently (e.g. same slug or URL)
+        logging.exception("Failed to import projects")
+        for result, _, _ in pending:
+            result['status'] = 'errored'
+            result['error'] = str(e)
+            _finish(result)
+        for result, _ in duplicates:
+            result['status'] = 'errored'
+            result['error'] = str(e)
+            _finish(result)
+        return results
+    for result, _, project in pending:
+        result['project_id'] = project.id
+        result['status'] = 'created'
+    logging.info("Imported %s projects (%s options)", len(pending), len(new_options))
+    for result, original_result in duplicates:
+        result['project_id'] = original_result['project_id']
+        _finish(result)
+
+    ## 3 - Download project logs
+    if queue_fetches:
+        for result, entry, project in pending:
+            fetch = project.queue_fetch(load_captions=entry['load_captions_from_tags'], user=user)
+            result['status'] = 'queued'
+            result['fetch_id'] = fetch.id
+            _finish(result)
+    elif fetch_logs:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_download_project_log, project.project_url, project.project_branch, project.project_vcs): (result, entry, project)
+                for result, entry, project in pending
+            }
+            for future in as_completed(futures):
+                result, entry, project = futures[future]
+                try:
+                    snapshot, duration = future.result()
+                    _save_project_snapshot(project, snapshot, load_captions=entry['load_captions_from_tags'])
+                    result['status'] = 'fetched'
+                    result['duration'] = duration
+                except Exception as e:
+                    logging.exception("Failed to fetch project log: %s", project.project_url)
+                    result['status'] = 'errored'
+                    result['error'] = str(e)
+                _finish(result)
+    else:
+        for result, _, _ in pending:
+            _finish(result)
+
+    return results
+
+
+def _save_project_snapshot(project, snapshot, load_captions=False):
+    project.project_log_commit_hash = snapshot.commit_hash
+    project.project_log_commit_preview = snapshot.commit_subject
+    # Get time/author from last entry
+    latest_commit = snapshot.log_data.splitlines()[-1].split('|')
+    project.project_log_commit_time = datetime.fromtimestamp(int(latest_commit[0]), tz=timezone.utc)
+    project.save_project_log(snapshot.log_data, log_stats=snapshot.log_stats)
+
+    # Load ProjectCaptions from VCS tags
+    if load_captions and snapshot.tags:
+        ProjectCaption.objects.bulk_create(
+            [ProjectCaption(project=project, timestamp=timestamp, text=tag_name) for timestamp, tag_name in snapshot.tags],
+            ignore_conflicts=True
+        )
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gource_studio.core.constants import DEFAULT_ENCODER_PROFILE, ENCODER_PROFILES, VIDEO_OPTIONS
+from gource_studio.core.utils import (
+    GOURCE_PIPE_FORMATS,
+    copy_ppm_frames,
+    get_encoder_profile,
+    get_ffmpeg,
+    get_ffmpeg_encoder_args,
+    get_ffmpeg_pipe_input_args,
+)
+
+
+class Command(BaseCommand):
+    help = ("Compare frames per second of FFmpeg encoding Gource-style PPM streams "
+            "as PPM images vs. raw video (see `GOURCE_PIPE_FORMAT`).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='*', default=[size for size, _ in VIDEO_OPTIONS],
+                            help="Video sizes to test (default: all `VIDEO_OPTIONS`)")
+        parser.add_argument('--frames', type=int, default=300, help="Frames per run (default: 300)")
+        parser.add_argument('--framerate', type=int, default=60, help="Output framerate (default: 60)")
+        parser.add_argument('--profile', choices=list(ENCODER_PROFILES), default=DEFAULT_ENCODER_PROFILE,
+                            help=f"Encoder profile (default: {DEFAULT_ENCODER_PROFILE})")
+        parser.add_argument('--no-encode', action='store_true',
+                            help="Skip H.264 encoding (measure frame input only)")
+
+    def handle(self, *args, **options):
+        valid_sizes = [size for size, _ in VIDEO_OPTIONS]
+        for size in options['sizes']:
+            if size not in valid_sizes:
+                raise CommandError(f"Invalid video size: {size}")
+        try:
+            ffmpeg = get_ffmpeg()
+        except Exception as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'Size':<12}" + "".join(f"{name + ' (fps)':>18}" for name in GOURCE_PIPE_FORMATS) + "  Fastest")
+        fastest = {}
+        for size in options['sizes']:
+            results = {}
+            for pipe_format in GOURCE_PIPE_FORMATS:
+                elapsed = self._run(ffmpeg, pipe_format, size, options['frames'], options['framerate'],
+                                    encode=not options['no_encode'], encoder_profile=options['profile'])
+                results[pipe_format] = options['frames'] / elapsed
+            fastest[size] = max(results, key=results.get)
+            self.stdout.write(f"{size:<12}" + "".join(f"{results[name]:>18.1f}" for name in GOURCE_PIPE_FORMATS)
+                              + f"  {fastest[size]}")
+        self.stdout.write(f"\nGOURCE_PIPE_FORMAT = {fastest!r}")
+
+    def _run(self, ffmpeg, pipe_format, video_size, frames, framerate, encode=True, encoder_profile=None):
+        # Return seconds taken by FFmpeg to encode `frames` generated frames
+        width, height = [int(n) for n in video_size.split('x')]
+        frames_read, frames_write = os.pipe()
+
+        cmd = [ffmpeg, '-y', '-loglevel', 'error'] \
+            + get_ffmpeg_pipe_input_args(pipe_format, video_size, framerate, '-')
+        if encode:
+            cmd += get_ffmpeg_encoder_args(get_encoder_profile(encoder_profile), framerate)
+        else:
+            cmd += ['-vcodec', 'rawvideo']
+        cmd += ['-f', 'null', '-']
+
+        start_time = time.monotonic()
+        writer = threading.Thread(target=self._write_frames, args=(frames_write, width, height, frames), daemon=True)
+        writer.start()
+        if pipe_format == 'rawvideo':
+            p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+            with os.fdopen(frames_read, 'rb') as src:
+                copy_ppm_frames(src, p.stdin, width, height)
+            p.stdin.close()
+        else:
+            p = subprocess.Popen(cmd, stdin=frames_read, stderr=subprocess.PIPE)
+            os.close(frames_read)
+        stderr = p.stderr.read()    # NOTE: little output with "-loglevel error"
+        p.wait()
+        elapsed = time.monotonic() - start_time
+        writer.join()
+        if p.returncode:
+            raise CommandError(f"[{p.returncode}] FFmpeg error ({pipe_format}, {video_size}): {stderr.decode('utf-8')}")
+        return elapsed
+
+    @staticmethod
+    def _write_frames(fd, width, height, frames):
+        # Write PPM stream (like Gource `--output-ppm-stream`) of scrolling gradient frames
+        header = f"P6\n{width} {height}\n255\n".encode('ascii')
+        row = bytes(n % 256 for n in range(width * 3 * 2))
+        with os.fdopen(fd, 'wb') as f:
+            try:
+                for index in range(frames):
+                    offset = (index * 3) % (width * 3)
+                    f.write(header)
+                    f.write(row[offset:offset + width * 3] * height)
+            except BrokenPipeError:
+                pass
@@ -0,0 +1,61 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from gource_studio.core.storage import blob_storage, get_content_addressed_fields
+
+
+class Command(BaseCommand):
+    help = "Remove stored content-addressed files (blobs) no longer used by any build."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List unused blobs without removing them")
+        min_age = getattr(settings, 'BLOB_MIN_AGE', 60*60)
+        parser.add_argument('--min-age', type=int, default=min_age,
+                            help=f"Only remove blobs not used for this many seconds (default: {min_age})")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        # Recently written or shared blobs may not be referenced yet (build being created)
+        cutoff = time.time() - options['min_age']
+        # Collect all referenced blob names
+        referenced = set()
+        for model, field in get_content_addressed_fields():
+            referenced.update(
+                model._default_manager.exclude(**{field.name: ''})
+                                      .exclude(**{f'{field.name}__isnull': True})
+                                      .values_list(field.name, flat=True)
+            )
+
+        blobs_path = blob_storage.path(blob_storage.BLOBS_DIR)
+        if not os.path.isdir(blobs_path):
+            print("No stored blobs found.")
+            return
+        removed = 0
+        removed_size = 0
+        for dirpath, dirnames, filenames in os.walk(blobs_path):
+            # Skip derived sidecar directories (removed along with their blob)
+            dirnames[:] = [d for d in dirnames if not d.endswith('.cols')]
+            for filename in filenames:
+                if filename.startswith('.tmp-') or filename.endswith(('.idx', '.sha256')):
+                    # Skip partially written blobs and derived index/digest files
+                    continue
+                file_path = os.path.join(dirpath, filename)
+                name = os.path.relpath(file_path, blob_storage.path('')).replace(os.sep, '/')
+                if name in referenced or blob_storage.get_last_used(name) > cutoff:
+                    continue
+                removed += 1
+                removed_size += os.path.getsize(file_path)
+                print(f"{'Unused' if dry_run else 'Removing'}: {name}")
+                if not dry_run:
+                    os.remove(file_path)
+                    shutil.rmtree(f'{file_path}.cols', ignore_errors=True)
+                    for sidecar_path in [f'{file_path}.idx', f'{file_path}.sha256']:
+                        if os.path.isfile(sidecar_path):
+                            os.remove(sidecar_path)
+
+        action = "Found" if dry_run else "Removed"
+        print(f"{action} {removed} unused blob(s) ({removed_size} bytes).")
@@ -0,0 +1,60 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from gource_studio.core.importer import IMPORT_MAX_WORKERS, import_projects, load_project_manifest
+
+
+class Command(BaseCommand):
+    help = "Create projects in bulk from a JSON manifest (see `gource_studio.core.importer`)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help="Path to JSON manifest file ('-' for stdin)")
+        parser.add_argument('--workers', type=int, default=IMPORT_MAX_WORKERS,
+                            help=f"Number of concurrent log downloads (default: {IMPORT_MAX_WORKERS})")
+        parser.add_argument('--user', help="Username to set as project creator")
+        parser.add_argument('--no-fetch', action='store_true', help="Create projects without downloading logs")
+        parser.add_argument('--queue', action='store_true', help="Queue log downloads for background workers")
+
+    def handle(self, *args, **options):
+        try:
+            if options['manifest'] == '-':
+                manifest = load_project_manifest(json.load(sys.stdin))
+            else:
+                with open(options['manifest'], 'r') as f:
+                    manifest = load_project_manifest(json.load(f))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Invalid manifest: {e}")
+
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user: {options['user']}")
+
+        total = len(manifest)
+        finished = 0
+
+        def progress(result):
+            nonlocal finished
+            finished += 1
+            message = f"[{finished}/{total}] {result['name'] or '#' + str(result['index'])}: {result['status']}"
+            if result['duration'] is not None:
+                message += f" ({result['duration']:.1f} sec)"
+            if result['error']:
+                message += f" - {result['error']}"
+            self.stdout.write(message)
+
+        results = import_projects(manifest, user=user,
+                                  fetch_logs=not options['no_fetch'],
+                                  queue_fetches=options['queue'],
+                                  max_workers=options['workers'],
+                                  progress=progress)
+
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        self.stdout.write("Summary: " + ", ".join(f"{count} {name}" for name, count in sorted(counts.items())))
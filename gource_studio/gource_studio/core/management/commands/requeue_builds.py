@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gource_studio.core.models import ProjectBuild
+
+
+class Command(BaseCommand):
+    help = "Re-queue interrupted or errored builds (resuming from rendered segments, see `BUILD_WORK_DIR`)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('build_ids', nargs='*', type=int, help="IDs of builds to re-queue")
+        parser.add_argument('--running', action='store_true',
+                            help="Re-queue all builds in \"running\" state (e.g. after all workers were stopped)")
+
+    def handle(self, *args, **options):
+        if not options['build_ids'] and not options['running']:
+            raise CommandError("Provide build IDs or --running")
+
+        builds = ProjectBuild.objects.none()
+        if options['build_ids']:
+            builds = ProjectBuild.objects.filter(id__in=options['build_ids'])
+            missing = set(options['build_ids']) - set(builds.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f"Unknown build IDs: {', '.join(str(build_id) for build_id in sorted(missing))}")
+        if options['running']:
+            builds = builds | ProjectBuild.objects.filter(status='running')
+
+        for build in builds.order_by('id'):
+            if build.requeue_build():
+                self.stdout.write(f"Re-queued build {build.id} (project {build.project_id})")
+            else:
+                self.stdout.write(f"Skipped build {build.id}: status is \"{build.status}\"")
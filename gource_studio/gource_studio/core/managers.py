@@ -1,5 +1,13 @@
+from datetime import timedelta
+import hashlib
+import os
+
+from django.conf import settings
 from django.db import models
 from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .utils import DurationCalibration, GourceLogDigest, GourceLogStats, get_gource_log_digest, get_log_digest_path
 
 
 class ProjectQuerySet(models.QuerySet):
@@ -27,12 +35,126 @@ class ProjectQuerySet(models.QuerySet):
         from .models import ProjectBuild
         return self.prefetch_related(
             Prefetch('builds', to_attr='_cached_latest_build',
-                     queryset=ProjectBuild.objects.filter(status='completed')\
+                     queryset=ProjectBuild.objects.filter(status='completed', is_draft=False)\
                                                   .exclude(content='')\
                                                   .order_by('-created_at'))
         )
 
 
+class ProjectBuildQuerySet(models.QuerySet):
+    # Number of recent builds used to calibrate estimates
+    CALIBRATION_SAMPLES = 100
+
+    def calibration_samples(self):
+        """
+        Filter to recently completed (full) builds with both estimated and
+        actual video durations.
+        """
+        return self.filter(status='completed', is_full_build=True, is_draft=False,
+                           estimated_duration__isnull=False, duration__gt=0)\
+                   .order_by('-id')[:self.CALIBRATION_SAMPLES]
+
+    def expired_drafts(self, max_age=None):
+        """
+        Filter to finished draft builds created more than `max_age` seconds
+        ago (default: `DRAFT_BUILD_MAX_AGE` setting).
+        """
+        if max_age is None:
+            max_age = getattr(settings, 'DRAFT_BUILD_MAX_AGE', 24*60*60)
+        return self.filter(is_draft=True, status__in=self.model.FINISHED_STATUSES,
+                           created_at__lt=timezone.now() - timedelta(seconds=max_age))
+
+    def find_log_blob(self, sha256):
+        """
+        Return name of stored (shared) build log whose contents have SHA-256
+        hash `sha256` (see `LogSummary`), or None if not stored yet.
+
+        Allows referencing a known log without reading it again (verified
+        using the digest stored next to the log, see `GourceLogDigest`).
+        """
+        storage = self.model._meta.get_field('project_log').storage
+        names = self.filter(project_log_summary__sha256=sha256).exclude(project_log='')\
+                    .order_by('-id').values_list('project_log', flat=True)[:5]
+        for name in names:
+            log_path = storage.path(name)
+            try:
+                log_digest = GourceLogDigest.load(get_log_digest_path(log_path))
+            except (OSError, ValueError, KeyError):
+                continue
+            if log_digest.sha256 == sha256 and log_digest.matches(log_path):
+                return name
+        return None
+
+    def fit_duration_calibration(self):
+        """
+        Return `DurationCalibration` fitted from builds (or None if too few).
+        """
+        return DurationCalibration.fit(self.calibration_samples().values_list('estimated_duration', 'duration'))
+
+    def get_build_time_ratio(self):
+        """
+        Return average build (running) time per second of video for recently
+        completed (full, non-incremental) builds, or None if not available.
+        """
+        # NOTE: Incremental builds only render new log entries, so their time
+        #       does not scale with the (full) video duration
+        builds = self.filter(status='completed', is_full_build=True, is_draft=False, duration__gt=0,
+                             base_build__isnull=True, running_at__isnull=False, completed_at__isnull=False)\
+                     .order_by('-id')[:self.CALIBRATION_SAMPLES]
+        total_time = 0.0
+        total_duration = 0
+        for duration, running_at, completed_at in builds.values_list('duration', 'running_at', 'completed_at'):
+            total_time += (completed_at - running_at).total_seconds()
+            total_duration += duration
+        if not total_duration or total_time <= 0:
+            return None
+        return total_time / total_duration
+
+
 class ProjectManager(models.Manager):
     def get_queryset(self):
         return ProjectQuerySet(model=self.model, using=self._db)
+
+
+class LogSummaryManager(models.Manager):
+
+    def get_or_create_for_log(self, source, log_stats=None, digest=None):
+        """
+        Return `LogSummary` for Gource log `source` (contents or `pathlib.Path`).
+
+        Summaries always describe the uncompressed log contents.  A known
+        `digest` (SHA-256, size) of a log path is used instead of rehashing it.
+
+        Log is only parsed if no summary exists yet for its SHA-256 hash
+        and no precomputed `log_stats` (`GourceLogStats`) is provided.
+        Raises `ValueError` if log could not be parsed.
+        """
+        if isinstance(source, os.PathLike):
+            sha256, size = digest if digest is not None else get_gource_log_digest(source)
+        else:
+            if isinstance(source, bytes):
+                source = source.decode('utf-8')
+            content = source.encode('utf-8')
+            sha256 = hashlib.sha256(content).hexdigest()
+            size = len(content)
+        summary = self.filter(sha256=sha256).first()
+        if summary is not None:
+            return summary
+
+        if log_stats is None:
+            log_stats = GourceLogStats.from_log(source)
+        log_stats.summary()     # Validate log
+        summary, _ = self.get_or_create(sha256=sha256, defaults={'size': size, 'stats': log_stats.to_dict()})
+        return summary
+
+    def unused(self, min_age=24*60*60):
+        """
+        Filter to summaries not used by any project or build log, created
+        more than `min_age` seconds ago (newer ones may be about to be used).
+        """
+        from .models import Project, ProjectBuild
+        return self.filter(created_at__lt=timezone.now() - timedelta(seconds=min_age))\
+                   .exclude(id__in=Project.objects.filter(project_log_summary__isnull=False)
+                                                  .values('project_log_summary'))\
+                   .exclude(id__in=ProjectBuild.objects.filter(project_log_summary__isnull=False)
+                                                       .values('project_log_summary'))
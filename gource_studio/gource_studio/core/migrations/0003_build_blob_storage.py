@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:58
+
+from django.db import migrations, models
+import gource_studio.core.models
+import gource_studio.core.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_log_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projectbuild',
+            name='build_audio',
+            field=models.FileField(blank=True, null=True, storage=gource_studio.core.storage.get_blob_storage, upload_to=gource_studio.core.models.get_build_audio_path),
+        ),
+        migrations.AlterField(
+            model_name='projectbuild',
+            name='build_background',
+            field=models.ImageField(blank=True, null=True, storage=gource_studio.core.storage.get_blob_storage, upload_to=gource_studio.core.models.get_build_background_path),
+        ),
+        migrations.AlterField(
+            model_name='projectbuild',
+            name='build_logo',
+            field=models.ImageField(blank=True, null=True, storage=gource_studio.core.storage.get_blob_storage, upload_to=gource_studio.core.models.get_build_logo_path),
+        ),
+        migrations.AlterField(
+            model_name='projectbuild',
+            name='project_log',
+            field=models.FileField(blank=True, null=True, storage=gource_studio.core.storage.get_blob_storage, upload_to=gource_studio.core.models.get_build_project_log_path),
+        ),
+    ]
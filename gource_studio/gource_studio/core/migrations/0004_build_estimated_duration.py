@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_build_blob_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectbuild',
+            name='estimated_duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
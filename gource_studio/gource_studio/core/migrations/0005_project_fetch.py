@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0004_build_estimated_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectFetch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('errored', 'Errored')], default='queued', max_length=16)),
+                ('project_url', models.TextField()),
+                ('project_branch', models.CharField(default='master', max_length=256)),
+                ('load_captions', models.BooleanField(default=False)),
+                ('queue_build', models.BooleanField(default=False)),
+                ('commit_hash', models.CharField(blank=True, max_length=64, null=True)),
+                ('error_description', models.TextField(blank=True, null=True)),
+                ('queued_at', models.DateTimeField(null=True)),
+                ('running_at', models.DateTimeField(null=True)),
+                ('completed_at', models.DateTimeField(null=True)),
+                ('errored_at', models.DateTimeField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('build', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.projectbuild')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fetches', to='core.project')),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_project_fetch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectbuild',
+            name='base_build',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.projectbuild'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_projectbuild_base_build'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='encoder_profile',
+            field=models.CharField(choices=[('draft', 'Draft'), ('standard', 'Standard'), ('archival', 'Archival')], default='standard', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='projectbuild',
+            name='encoder_profile',
+            field=models.CharField(choices=[('draft', 'Draft'), ('standard', 'Standard'), ('archival', 'Archival')], default='standard', max_length=16),
+        ),
+    ]
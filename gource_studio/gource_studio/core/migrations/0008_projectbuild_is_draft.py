@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_encoder_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectbuild',
+            name='is_draft',
+            field=models.BooleanField(default=False),
+        ),
+    ]
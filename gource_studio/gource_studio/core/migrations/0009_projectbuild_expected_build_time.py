@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_projectbuild_is_draft'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectbuild',
+            name='expected_build_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_projectbuild_expected_build_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectbuild',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,11 +1,14 @@
 from io import BytesIO
+import logging
 import math
 import os
+from pathlib import Path
+import shutil
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser, Group as AuthGroup
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.core.validators import validate_slug, RegexValidator
 from django.db import models
 from django.db.models import F
@@ -16,13 +19,35 @@ from django.utils.functional import SimpleLazyObject
 from django.utils.text import slugify
 from PIL import Image
 
-from .constants import VIDEO_OPTIONS
+from .constants import (
+    DEFAULT_ENCODER_PROFILE,
+    ENCODER_PROFILE_CHOICES,
+    ENCODER_PROFILE_OPTION,
+    PROJECT_OPTION_DEFAULTS,
+    VIDEO_OPTIONS,
+)
 #from .managers import ProjectManager
-from .managers import ProjectQuerySet
-from .tasks import generate_gource_build
+from .managers import LogSummaryManager, ProjectBuildQuerySet, ProjectQuerySet
+from .storage import ContentAddressedStorage, get_blob_storage
+from .tasks import fetch_project_log, generate_gource_build
 from .utils import (
-    analyze_gource_log,
+    GOURCE_LOG_SLICE_OPTIONS,
+    DurationCalibration,
+    GourceLogColumns,
+    GourceLogDigest,
+    GourceLogIndex,
+    GourceLogStats,
+    append_gource_log,
+    append_gource_log_columns,
+    compress_gource_log,
+    get_log_columns_path,
+    get_gource_log_digest,
+    get_log_digest_path,
+    get_log_index_path,
+    iter_gource_log,
+    parse_gource_date_option,
     resolve_project_avatars,
+    write_gource_log_columns,
 )
 
 
@@ -39,11 +64,28 @@ def get_project_build_audio_path(instance, filename):
     return f'projects/{instance.pk}/audio{ext}'
 
 def get_project_project_log_path(instance, filename):
-    return f'projects/{instance.pk}/gource.log'
+    # Keep '.gz' suffix of compressed logs
+    ext = '.gz' if filename.endswith('.gz') else ''
+    return f'projects/{instance.pk}/gource.log{ext}'
 
 ## TODO: Use custom OverwriteStorage() class
 ## https://stackoverflow.com/a/9523400
 
+def copy_field_file(source, dest, name=None):
+    """
+    Copy contents of `source` FieldFile into `dest` (without saving model).
+
+    Content-addressed files are shared by reference instead of copied.
+    """
+    if isinstance(source.storage, ContentAddressedStorage) \
+            and isinstance(dest.storage, ContentAddressedStorage) \
+            and source.storage.exists(source.name):
+        source.storage.touch(source.name)
+        dest.name = source.name
+        return
+    with open(source.path, 'rb') as _file:
+        dest.save(name if name else os.path.basename(source.name), File(_file), save=False)
+
 class BaseProjectMixin:
     # Common class for project/build details
 
@@ -53,10 +95,220 @@ class BaseProjectMixin:
 
         Returns num commits, date range, users list, ...
         """
+        return self.get_log_summary().summary()
+
+    def get_log_summary(self):
+        """
+        Return `LogSummary` for current Gource log.
+
+        The cached summary is reused as long as it matches the log on disk
+        (see `get_log_digest()`), otherwise it is (re)computed and saved.
+        """
         if not self.project_log or not os.path.isfile(self.project_log.path):
             raise RuntimeError("No Gource log found for this project")
-        with open(self.project_log.path, 'r') as _file:
-            return analyze_gource_log(_file.read())
+        summary = self.project_log_summary
+        log_digest = self.get_log_digest()
+        if summary is None or summary.sha256 != log_digest.sha256:
+            summary = LogSummary.objects.get_or_create_for_log(Path(self.project_log.path),
+                                                               digest=(log_digest.sha256, log_digest.size))
+            self.project_log_summary = summary
+            self.save(update_fields=['project_log_summary'])
+        return summary
+
+    def get_log_digest(self):
+        """
+        Return `GourceLogDigest` (SHA-256 and size of contents) of current Gource log.
+
+        The digest is stored next to the log file and is recomputed if the
+        log file was changed since (size or modification time).
+        """
+        log_path = self.project_log.path
+        digest_path = get_log_digest_path(log_path)
+        if os.path.isfile(digest_path):
+            try:
+                log_digest = GourceLogDigest.load(digest_path)
+                if log_digest.matches(log_path):
+                    return log_digest
+            except Exception:
+                logging.exception("Failed to load log digest: %s", digest_path)
+        log_digest = GourceLogDigest.from_log(log_path)
+        try:
+            log_digest.save(digest_path)
+        except OSError:
+            logging.exception("Failed to save log digest: %s", digest_path)
+        return log_digest
+
+    def _save_log_digest(self, log_digest):
+        # Record `log_digest`, known to match current log file
+        log_path = self.project_log.path
+        log_digest.file_stamp = GourceLogDigest.get_file_stamp(log_path)
+        try:
+            log_digest.save(get_log_digest_path(log_path))
+        except OSError:
+            logging.exception("Failed to save log digest: %s", log_path)
+
+    def get_log_columns(self):
+        """
+        Return `GourceLogColumns` (memory-mapped columnar copy) of current Gource log.
+
+        The sidecar is stored next to the log file and is (re)built if missing
+        or out of date.  Caller should `close()` the returned instance.
+        """
+        summary = self.get_log_summary()
+        columns_path = get_log_columns_path(self.project_log.path)
+        if os.path.isdir(columns_path):
+            try:
+                columns = GourceLogColumns(columns_path)
+                if columns.sha256 == summary.sha256:
+                    return columns
+                columns.close()
+            except Exception:
+                logging.exception("Failed to load log columns: %s", columns_path)
+        return write_gource_log_columns(Path(self.project_log.path), columns_path, sha256=summary.sha256)
+
+    def get_log_index(self):
+        """
+        Return `GourceLogIndex` (sparse timestamp -> offset index) of current Gource log.
+
+        The index is stored next to the log file and is (re)built if missing
+        or out of date.
+        """
+        summary = self.get_log_summary()
+        index_path = get_log_index_path(self.project_log.path)
+        if os.path.isfile(index_path):
+            try:
+                log_index = GourceLogIndex.load(index_path)
+                if log_index.sha256 == summary.sha256:
+                    return log_index
+            except Exception:
+                logging.exception("Failed to load log index: %s", index_path)
+        log_index = GourceLogIndex.from_log(self.project_log.path, sha256=summary.sha256)
+        try:
+            log_index.save(index_path)
+        except OSError:
+            logging.exception("Failed to save log index: %s", index_path)
+        return log_index
+
+    def get_log_stats(self, start_date=None, stop_date=None):
+        """
+        Return `GourceLogStats` for current Gource log.
+
+        If `start_date` and/or `stop_date` are given (Gource option format,
+        "YYYY-MM-DD [HH:mm:ss]" in UTC), only entries in that range are
+        included, read from the columnar copy of the log (see `get_log_columns()`).
+        """
+        start_time = parse_gource_date_option(start_date) if start_date else None
+        stop_time = parse_gource_date_option(stop_date) if stop_date else None
+        if start_date and start_time is None:
+            raise ValueError(f"Invalid start date: {start_date}")
+        if stop_date and stop_time is None:
+            raise ValueError(f"Invalid stop date: {stop_date}")
+        if start_time is None and stop_time is None:
+            return self.get_log_summary().get_stats()
+        with self.get_log_columns() as columns:
+            return columns.get_stats(start_time, stop_time)
+
+    def get_duration_options(self):
+        """
+        Return Gource options affecting video duration, using the same
+        defaults as `generate_gource_video()` for omitted values.
+        """
+        DURATION_OPTIONS = ['seconds-per-day', 'auto-skip-seconds', 'start-date', 'stop-date']
+        duration_options = {
+            'seconds-per-day': 0.5,
+            'auto-skip-seconds': 3.0,   # Gource default
+        }
+        for option in self.options.filter(name__in=DURATION_OPTIONS):
+            if option.name in ['start-date', 'stop-date']:
+                if option.value:
+                    duration_options[option.name] = option.value
+                continue
+            try:
+                duration_options[option.name] = float(option.value)
+            except (TypeError, ValueError):
+                pass
+        return duration_options
+
+    def estimate_video_duration(self, calibrated=True):
+        """
+        Return estimated video duration (in seconds) using current Gource options.
+
+        Unless `calibrated=False`, the estimate is corrected using the
+        results of past builds (see `get_duration_calibration()`).
+        """
+        duration_options = self.get_duration_options()
+        log_stats = self.get_log_stats(duration_options.pop('start-date', None),
+                                       duration_options.pop('stop-date', None))
+        duration = log_stats.estimate_duration(duration_options)
+        if calibrated:
+            duration = self.get_duration_calibration().apply(duration)
+        return duration
+
+    def append_project_log(self, log_delta):
+        """
+        Append new entries in `log_delta` to the end of current Gource log.
+
+        The cached `LogSummary`, digest and columns sidecar are updated using
+        only the new entries.  Raises `ValueError` if `log_delta` is invalid.
+
+        Callers should lock the project (`select_for_update()`) to prevent
+        concurrent updates.
+        """
+        summary = self.get_log_summary()
+        if isinstance(log_delta, bytes):
+            log_delta = log_delta.decode('utf-8')
+        delta_entries = list(iter_gource_log(log_delta))
+        if not delta_entries:
+            return summary
+        log_stats = GourceLogStats.from_dict(summary.stats).update(delta_entries)
+
+        log_path = Path(self.project_log.path)
+        log_digest = append_gource_log(log_path, log_delta.encode('utf-8'))
+        sha256 = log_digest.sha256
+        new_summary, _ = LogSummary.objects.get_or_create(sha256=sha256,
+                                                          defaults={'size': log_digest.size, 'stats': log_stats.to_dict()})
+
+        # Update columns sidecar (if current)
+        columns_path = get_log_columns_path(log_path)
+        if os.path.isdir(columns_path):
+            try:
+                with GourceLogColumns(columns_path) as columns:
+                    is_current = columns.sha256 == summary.sha256
+                if is_current:
+                    append_gource_log_columns(columns_path, delta_entries, sha256=sha256)
+                else:
+                    shutil.rmtree(columns_path, ignore_errors=True)
+            except Exception:
+                logging.exception("Failed to update log columns: %s", columns_path)
+                shutil.rmtree(columns_path, ignore_errors=True)
+
+        self._save_log_digest(log_digest)
+        self.project_log_summary = new_summary
+        self.save(update_fields=['project_log_summary'])
+        return new_summary
+
+    def save_project_log(self, log_data, summary=None, log_stats=None):
+        """
+        Replace current Gource log with `log_data` and update its `LogSummary`.
+
+        A precomputed `summary` or `log_stats` (of the same contents) may be
+        provided.
+        """
+        if summary is None:
+            summary = LogSummary.objects.get_or_create_for_log(log_data, log_stats=log_stats)
+        if self.project_log:
+            shutil.rmtree(get_log_columns_path(self.project_log.path), ignore_errors=True)
+            for sidecar_path in [get_log_index_path(self.project_log.path), get_log_digest_path(self.project_log.path)]:
+                if os.path.isfile(sidecar_path):
+                    os.remove(sidecar_path)
+            self.project_log.delete(save=False)
+        if isinstance(log_data, str):
+            log_data = log_data.encode('utf-8')
+        # Stored compressed (see `open_gource_log()`)
+        self.project_log.save('gource.log.gz', ContentFile(compress_gource_log(log_data)), save=False)
+        self._save_log_digest(GourceLogDigest.from_data(log_data))
+        self.project_log_summary = summary
+        self.save()
 
     def resolve_avatars(self):
         """
@@ -81,6 +333,42 @@ class BaseProjectMixin:
         return caption_lines
 
 
+class LogSummary(models.Model):
+    """
+    Cached analysis of a Gource log, keyed by SHA-256 of log contents.
+
+    Shared by projects and builds using identical logs.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    # Size of (uncompressed) log contents in bytes
+    size = models.BigIntegerField()
+    # Serialized `GourceLogStats`
+    stats = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = LogSummaryManager()
+
+    def __str__(self):
+        return self.sha256
+
+    def get_stats(self):
+        if not hasattr(self, '_cached_stats'):
+            self._cached_stats = GourceLogStats.from_dict(self.stats)
+        return self._cached_stats
+
+    def summary(self):
+        "Return analysis of log (see `analyze_gource_log()`)."
+        return self.get_stats().summary()
+
+    def estimate_duration(self, gource_options=None):
+        "Return estimated video duration (see `estimate_gource_video_duration()`)."
+        return self.get_stats().estimate_duration(gource_options)
+
+    def estimate_durations(self, gource_options_list):
+        "Return estimated video durations for each of `gource_options_list`."
+        return self.get_stats().estimate_durations(gource_options_list)
+
+
 class Project(BaseProjectMixin, models.Model):
     """
     Base configuration for Gource project.
@@ -106,6 +394,7 @@ class Project(BaseProjectMixin, models.Model):
 
     # Latest version of project Gource log (used for setting analysis)
     project_log = models.FileField(upload_to=get_project_project_log_path, blank=True, null=True)
+    project_log_summary = models.ForeignKey(LogSummary, related_name='+', on_delete=models.SET_NULL, blank=True, null=True)
     project_log_updated_at = models.DateTimeField(blank=True, null=True)
     # - Latest commit info cache
     project_log_commit_hash = models.CharField(max_length=64, blank=True, null=True)
@@ -114,6 +403,7 @@ class Project(BaseProjectMixin, models.Model):
 
     # Output video size (16:9 aspect ratio only)
     video_size = models.CharField(max_length=16, default="1280x720", choices=VIDEO_OPTIONS)
+    encoder_profile = models.CharField(max_length=16, default=DEFAULT_ENCODER_PROFILE, choices=ENCODER_PROFILE_CHOICES)
     # Optional name to display in video
     build_title = models.CharField(max_length=256, default="", blank=True)
     # Optional logo/background to display in video
@@ -136,6 +426,18 @@ class Project(BaseProjectMixin, models.Model):
 
     objects = ProjectQuerySet.as_manager()
 
+    def get_duration_calibration(self):
+        """
+        Return `DurationCalibration` to correct video duration estimates.
+
+        Fitted from this project's past builds if there are enough of them,
+        otherwise from the builds of all projects.
+        """
+        calibration = ProjectBuild.objects.filter(project=self).fit_duration_calibration()
+        if calibration is None:
+            calibration = ProjectBuild.objects.fit_duration_calibration()
+        return calibration if calibration is not None else DurationCalibration()
+
     class Meta:
         ordering = ('id',)
 
@@ -166,11 +468,15 @@ class Project(BaseProjectMixin, models.Model):
     def get_latest_build(self):
         if hasattr(self, '_cached_latest_build'):
             return self._cached_latest_build[0] if len(self._cached_latest_build) else None
-        return self.builds.exclude(content='').order_by('-created_at').first()
+        return self.builds.filter(is_draft=False).exclude(content='').order_by('-created_at').first()
+
+    @property
+    def latest_draft_build(self):
+        return self.builds.filter(is_draft=True).exclude(content='').order_by('-created_at').first()
 
     @property
     def has_build_waiting(self):
-        return self.builds.filter(status__in=['pending', 'queued', 'running']).exists()
+        return self.builds.filter(is_draft=False, status__in=['pending', 'queued', 'running']).exists()
 
     def set_project_changed(self, changed=True):
         if self.is_project_changed is bool(changed):
@@ -281,7 +587,40 @@ class Project(BaseProjectMixin, models.Model):
 
         return ValueError(f"Invalid 'action' given: {action}")
 
-    def create_build(self, *, defer_queue=False):
+    def queue_fetch(self, *, load_captions=False, queue_build=False, user=None, defer_queue=False):
+        """
+        Queue download of the project's VCS log by background Celery
+        instance (see `tasks.fetch_project_log`).
+
+        Optionally, captions are loaded from VCS tags (`load_captions`)
+        and a new build is queued (`queue_build`) once log is updated.
+        With `defer_queue`, the caller must send the task itself (e.g.
+        after committing a transaction).
+
+        Returns new ProjectFetch instance
+        """
+        if not self.project_url:
+            raise RuntimeError("Project does not have a valid 'project_url'")
+        fetch = ProjectFetch.objects.create(
+            project=self,
+            project_url=self.project_url,
+            project_branch=self.project_branch,
+            load_captions=load_captions,
+            queue_build=queue_build,
+            created_by=user if user and user.is_authenticated else None,
+            queued_at=timezone.now()
+        )
+        # Send to background worker
+        if not defer_queue:
+            fetch_project_log.delay(fetch.id)
+        return fetch
+
+    @property
+    def pending_fetch(self):
+        "Return queued/running ProjectFetch (or None)"
+        return self.fetches.filter(status__in=['queued', 'running']).order_by('-id').first()
+
+    def create_build(self, *, defer_queue=False, incremental=False, draft=False):
         """
         Create a new ProjectBuild instance from this Project.
 
@@ -291,10 +630,27 @@ class Project(BaseProjectMixin, models.Model):
 
             create_build(defer_queue=True)
 
+        With `incremental`, the build extends the video of the latest
+        compatible build (see `ProjectBuild.find_incremental_base()`),
+        rendering only log entries added since then.
+
+        With `draft`, a quick preview is rendered instead: smallest video size,
+        lower framerate (`DRAFT_BUILD_FRAMERATE`), "draft" encoder profile and
+        no background audio.  Draft builds are processed by their own queue
+        (`DRAFT_BUILD_QUEUE`), never become the project's `latest_build`, and
+        are removed automatically (see `ProjectBuild.objects.expired_drafts()`).
+
         Returns new ProjectBuiild instance
         """
         if not bool(self.project_log):
             raise RuntimeError("Project does not have a valid 'project_log'")
+        log_summary = self.get_log_summary()
+        video_size = VIDEO_OPTIONS[0][0] if draft else self.video_size
+
+        if draft:
+            # Replace previous (finished) draft of project
+            for old_draft in self.builds.filter(is_draft=True, status__in=ProjectBuild.FINISHED_STATUSES):
+                old_draft.delete()
 
         # Create new build (immediately in "queued" state)
         build = ProjectBuild.objects.create(
@@ -303,28 +659,36 @@ class Project(BaseProjectMixin, models.Model):
             project_log_commit_hash=self.project_log_commit_hash,
             project_log_commit_time=self.project_log_commit_time,
             project_log_commit_preview=self.project_log_commit_preview,
-            video_size=self.video_size,
+            project_log_summary=log_summary,
+            video_size=video_size,
+            encoder_profile='draft' if draft else self.encoder_profile,
+            is_draft=draft,
             status='queued' if not defer_queue else 'pending',
             queued_at=timezone.now() if not defer_queue else None
         )
 
         # Copy snapshot of `project_log` file
-        with open(self.project_log.path, 'rb') as _file:
-            build.project_log.save('gource.log', ContentFile(_file.read()))
+        # - Reuse stored copy of identical log (if any), without reading it
+        log_blob = ProjectBuild.objects.find_log_blob(log_summary.sha256)
+        if log_blob:
+            build.project_log.storage.touch(log_blob)
+            build.project_log.name = log_blob
+        else:
+            copy_field_file(self.project_log, build.project_log)
+        if not os.path.isfile(get_log_digest_path(build.project_log.path)):
+            build._save_log_digest(GourceLogDigest(log_summary.sha256, log_summary.size))
         # Copy other optional artifacts
-        if self.build_audio:
+        if self.build_audio and not draft:
             # Background audio
             build.build_audio_name = self.build_audio_name
-            with open(self.build_audio.path, 'rb') as _file:
-                build.build_audio.save(os.path.basename(self.build_audio.name),
-                                       ContentFile(_file.read()))
+            copy_field_file(self.build_audio, build.build_audio)
         if self.build_logo:
             # Project logo
             if self.build_logo_resize:
                 img = Image.open(self.build_logo.path)
                 # Resize image to scale with video size
                 # FIXME: gource_studio.core.utils.rescale_image()
-                width, height = [int(n) for n in self.video_size.split('x')]
+                width, height = [int(n) for n in video_size.split('x')]
                 new_width = int(math.ceil(height/8))    # 12.5% of height (bottom corner)
                 wpercent = (new_width / float(img.width))
                 new_height = int((float(img.height) * float(wpercent)))
@@ -336,18 +700,16 @@ class Project(BaseProjectMixin, models.Model):
                 new_img.save(tmp, img.format)
                 tmp.seek(0)
                 build.build_logo.save(os.path.basename(self.build_logo.name),
-                                      ContentFile(tmp.read()))
+                                      ContentFile(tmp.read()), save=False)
             else:
-                with open(self.build_logo.path, 'rb') as _file:
-                    build.build_logo.save(os.path.basename(self.build_logo.name),
-                                          ContentFile(_file.read()))
+                copy_field_file(self.build_logo, build.build_logo)
         if self.build_background:
             # Project background
             if self.build_background_resize:
                 img = Image.open(self.build_background.path)
                 # Resize image to fill video size (NOTE: may stretch)
                 # FIXME: gource_studio.core.utils.rescale_image()
-                width, height = [int(n) for n in self.video_size.split('x')]
+                width, height = [int(n) for n in video_size.split('x')]
                 if hasattr(Image, "Resampling"):
                     new_img = img.resize((width, height), Image.Resampling.LANCZOS)
                 else:
@@ -356,11 +718,10 @@ class Project(BaseProjectMixin, models.Model):
                 new_img.save(tmp, img.format)
                 tmp.seek(0)
                 build.build_background.save(os.path.basename(self.build_background.name),
-                                            ContentFile(tmp.read()))
+                                            ContentFile(tmp.read()), save=False)
             else:
-                with open(self.build_background.path, 'rb') as _file:
-                    build.build_background.save(os.path.basename(self.build_background.name),
-                                                ContentFile(_file.read()))
+                copy_field_file(self.build_background, build.build_background)
+        build.save()
 
         # Copy over build options for archival
         build_options = []
@@ -373,8 +734,11 @@ class Project(BaseProjectMixin, models.Model):
                     value_type=option.value_type
                 )
             )
-        if build_options:
-            ProjectBuildOption.objects.bulk_create(build_options)
+        # - Encoder profile (not a Gource option, recorded for reference)
+        build_options.append(
+            ProjectBuildOption(build=build, name=ENCODER_PROFILE_OPTION, value=build.encoder_profile, value_type='str')
+        )
+        ProjectBuildOption.objects.bulk_create(build_options)
 
         # Copy over captions for archival
         build_captions = []
@@ -395,9 +759,14 @@ class Project(BaseProjectMixin, models.Model):
                 captions_data = "\n".join(captions_list)
                 build.project_captions.save('captions.txt', ContentFile(captions_data))
 
+        if incremental and not draft:
+            build.base_build = build.find_incremental_base()
+            if build.base_build is not None:
+                build.save(update_fields=['base_build'])
+
         # Send to background worker
         if not defer_queue:
-            generate_gource_build.delay(build.id)
+            build.send_to_worker()
 
         return build
 
@@ -423,6 +792,14 @@ class ProjectOption(models.Model):
     def __str__(self):
         return '{0}={1}'.format(self.name, self.value)
 
+    @classmethod
+    def get_defaults(cls, project):
+        "Return list of (unsaved) default options for `project` (see `PROJECT_OPTION_DEFAULTS`)"
+        return [
+            cls(project=project, name=name, value=value, value_type=value_type)
+            for name, value, value_type in PROJECT_OPTION_DEFAULTS
+        ]
+
     def to_dict(self):
         return {
             "name": self.name,
@@ -441,7 +818,8 @@ def get_video_thumbnail_path(instance, filename):
     return f'projects/{instance.project_id}/builds/{instance.pk}/thumb.jpg'
 
 def get_build_project_log_path(instance, filename):
-    return f'projects/{instance.project_id}/builds/{instance.pk}/gource.log'
+    ext = '.gz' if filename.endswith('.gz') else ''
+    return f'projects/{instance.project_id}/builds/{instance.pk}/gource.log{ext}'
 
 def get_build_project_captions_path(instance, filename):
     return f'projects/{instance.project_id}/builds/{instance.pk}/captions.txt'
@@ -478,30 +856,39 @@ class ProjectBuild(BaseProjectMixin, models.Model):
         ('completed', 'Completed'),
         ('errored', 'Errored')
     ]
+    # Statuses of builds no longer processed by a worker
+    FINISHED_STATUSES = ['canceled', 'aborted', 'completed', 'errored']
 
     project = models.ForeignKey(Project, related_name='builds', on_delete=models.CASCADE)
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='pending')
 
     project_branch = models.CharField(max_length=256, default='master')
-    project_log = models.FileField(upload_to=get_build_project_log_path, blank=True, null=True)
+    # - Snapshot files are shared between builds (stored once per content)
+    project_log = models.FileField(upload_to=get_build_project_log_path, storage=get_blob_storage, blank=True, null=True)
+    project_log_summary = models.ForeignKey(LogSummary, related_name='+', on_delete=models.SET_NULL, blank=True, null=True)
     # - Latest commit info cache
     project_log_commit_hash = models.CharField(max_length=64, blank=True, null=True)
     project_log_commit_time = models.DateTimeField(blank=True, null=True)
     project_log_commit_preview = models.CharField(max_length=128, blank=True, null=True)
     # Captions file
     project_captions = models.FileField(upload_to=get_build_project_captions_path, blank=True, null=True)
-    build_logo = models.ImageField(upload_to=get_build_logo_path, blank=True, null=True)
-    build_background = models.ImageField(upload_to=get_build_background_path, blank=True, null=True)
+    build_logo = models.ImageField(upload_to=get_build_logo_path, storage=get_blob_storage, blank=True, null=True)
+    build_background = models.ImageField(upload_to=get_build_background_path, storage=get_blob_storage, blank=True, null=True)
     # Optional background music (MP3)
-    build_audio = models.FileField(upload_to=get_build_audio_path, blank=True, null=True)
+    build_audio = models.FileField(upload_to=get_build_audio_path, storage=get_blob_storage, blank=True, null=True)
     build_audio_name = models.CharField(max_length=256, null=True, blank=True)
 
     # Video/thumbnail data
     video_size = models.CharField(max_length=16, default="1280x720", choices=VIDEO_OPTIONS)
+    encoder_profile = models.CharField(max_length=16, default=DEFAULT_ENCODER_PROFILE, choices=ENCODER_PROFILE_CHOICES)
     content = models.FileField(upload_to=get_video_build_path, blank=True, null=True)
     screenshot = models.ImageField(upload_to=get_video_screenshot_path, blank=True, null=True)
     thumbnail = models.ImageField(upload_to=get_video_thumbnail_path, blank=True, null=True)
     duration = models.PositiveIntegerField(null=True)
+    # Uncalibrated duration estimate (to calibrate future estimates against `duration`)
+    estimated_duration = models.FloatField(null=True, blank=True)
+    # Predicted build time (seconds) when build started (see `get_expected_build_duration()`)
+    expected_build_time = models.FloatField(null=True, blank=True)
     size = models.PositiveIntegerField(null=True)   # Cached copy of `.content_size`
 
     # Timestamps
@@ -510,10 +897,16 @@ class ProjectBuild(BaseProjectMixin, models.Model):
     aborted_at = models.DateTimeField(null=True)
     completed_at = models.DateTimeField(null=True)
     errored_at = models.DateTimeField(null=True)
+    # - Processing attempts since queued (see `BUILD_MAX_ATTEMPTS`)
+    attempts = models.PositiveIntegerField(default=0)
 
     ## Build fields
     # Indicates if build required new video capture (or just audio remixing)
     is_full_build = models.BooleanField(default=True)
+    # Quick low resolution preview (see `Project.create_build(draft=True)`)
+    is_draft = models.BooleanField(default=False)
+    # Earlier build whose video is extended (only new log entries rendered)
+    base_build = models.ForeignKey('self', related_name='+', on_delete=models.SET_NULL, blank=True, null=True)
     current_build_stage = models.CharField(max_length=64, blank=True, null=True)
     current_build_message = models.CharField(max_length=512, blank=True, null=True)
     # Process output logging
@@ -525,6 +918,8 @@ class ProjectBuild(BaseProjectMixin, models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectBuildQuerySet.as_manager()
+
     class Meta:
         ordering = ('id',)
 
@@ -625,6 +1020,18 @@ class ProjectBuild(BaseProjectMixin, models.Model):
         else:
             raise ValueError("Cannot mark build completed from \"%s\" status", self.status)
 
+    def mark_requeued(self):
+        "Return interrupted (running) or errored build to queue"
+        if self.status in ['running', 'errored']:
+            self.status = 'queued'
+            self.queued_at = timezone.now()
+            self.errored_at = None
+            self.error_description = None
+            self.attempts = 0
+            self.save(update_fields=['status', 'queued_at', 'errored_at', 'error_description', 'attempts'])
+        else:
+            raise ValueError("Cannot re-queue build from \"%s\" status", self.status)
+
     def mark_errored(self, error_description=None):
         "Mark build as errored"
         # NOTE: no state check; can always transition to error state
@@ -677,6 +1084,26 @@ class ProjectBuild(BaseProjectMixin, models.Model):
             qs = qs.exclude(content='')
         return qs.order_by('-id').first()
 
+    def get_duration_calibration(self):
+        "Return `DurationCalibration` of project (see `Project.get_duration_calibration()`)."
+        return self.project.get_duration_calibration()
+
+    def get_expected_build_duration(self):
+        """
+        Predict total runtime (in seconds) of this build.
+
+        Based on the calibrated video duration estimate and the build time
+        per second of video of past builds.  Returns None if unknown.
+        """
+        if not self.estimated_duration or not self.is_full_build:
+            return None
+        time_ratio = ProjectBuild.objects.filter(project_id=self.project_id).get_build_time_ratio()
+        if time_ratio is None:
+            time_ratio = ProjectBuild.objects.get_build_time_ratio()
+        if time_ratio is None:
+            return None
+        return self.get_duration_calibration().apply(self.estimated_duration) * time_ratio
+
     def get_build_stage_percent(self):
         """
         Provide a guess (0-100%) of how far along the build is.
@@ -689,13 +1116,15 @@ class ProjectBuild(BaseProjectMixin, models.Model):
             return 10   # Controversial, I know
         elif self.running_at:
             # Running - here's where we do work
-            # 1. If there is a previously successful build, use that duration
-            #    as the anticipated amount.  Unless they tweaked settings, it
-            #    should be at least close.
-            prev_build_time = None
-            prev_successful_build = self.get_previous_build(success=True)
-            if prev_successful_build:
-                prev_build_time = prev_successful_build.get_build_duration()
+            # 1. Use build time predicted from estimated video duration (when
+            #    build started), or if there is a previously successful build,
+            #    use that duration as the anticipated amount.  Unless they
+            #    tweaked settings, it should be at least close.
+            prev_build_time = self.expected_build_time
+            if not prev_build_time:
+                prev_successful_build = self.get_previous_build(success=True)
+                if prev_successful_build:
+                    prev_build_time = prev_successful_build.get_build_duration()
             if prev_build_time:
                 cur_duration = (timezone.now()-self.running_at).total_seconds()
                 if cur_duration < 0:
@@ -726,9 +1155,86 @@ class ProjectBuild(BaseProjectMixin, models.Model):
         if self.status != 'pending':
             return False
         self.mark_queued()
-        generate_gource_build.delay(self.id)
+        self.send_to_worker()
         return True
 
+    def requeue_build(self):
+        """
+        Queue an interrupted (running) or errored build for processing again.
+
+        Video segments already rendered in the build work directory are
+        reused (see `get_work_dir()`).
+
+        Returns True if build re-queued successfully; False otherwise
+        """
+        if self.status not in ['running', 'errored']:
+            return False
+        self.mark_requeued()
+        self.send_to_worker()
+        return True
+
+    def send_to_worker(self):
+        """
+        Send build to background Celery worker (draft builds are sent to
+        `DRAFT_BUILD_QUEUE`, if set).
+        """
+        queue = getattr(settings, 'DRAFT_BUILD_QUEUE', None) if self.is_draft else None
+        if queue:
+            generate_gource_build.apply_async((self.id,), queue=queue)
+        else:
+            generate_gource_build.delay(self.id)
+
+    def find_incremental_base(self):
+        """
+        Return latest completed build of the same project whose video this
+        build can extend (rendering only new log entries), or None.
+
+        The earlier build must use the same video size, options, captions,
+        logo and background, and its log must be the start of this build's log.
+        """
+        options = {(option.name, option.value) for option in self.options.all()}
+        if any(name in GOURCE_LOG_SLICE_OPTIONS for name, _ in options):
+            return None
+        base = ProjectBuild.objects.filter(project_id=self.project_id, status='completed', is_draft=False,
+                                           video_size=self.video_size, id__lt=self.id) \
+                                   .exclude(content='').exclude(content__isnull=True) \
+                                   .order_by('-id').first()
+        if base is None or not base.content or not os.path.isfile(base.content.path):
+            return None
+        if {(option.name, option.value) for option in base.options.all()} != options:
+            return None
+        for field in ('build_logo', 'build_background'):
+            if os.path.basename(getattr(base, field).name or '') != os.path.basename(getattr(self, field).name or ''):
+                return None
+        if sorted(base.captions.values_list('timestamp', 'text')) != sorted(self.captions.values_list('timestamp', 'text')):
+            return None
+        try:
+            base_summary = base.get_log_summary()
+            log_summary = self.get_log_summary()
+        except RuntimeError:
+            return None
+        if log_summary.size <= base_summary.size:
+            return None
+        if get_gource_log_digest(self.project_log.path, max_size=base_summary.size) != (base_summary.sha256, base_summary.size):
+            return None
+        return base
+
+    def get_work_dir(self):
+        """
+        Return path of persistent render work directory (see `BUILD_WORK_DIR`),
+        or None if disabled.
+        """
+        work_dir = getattr(settings, 'BUILD_WORK_DIR', None)
+        if not work_dir or self.pk is None:
+            return None
+        return Path(work_dir) / str(self.pk)
+
+    def remove_work_dir(self):
+        "Remove render work directory (if any)"
+        work_dir = self.get_work_dir()
+        if work_dir is not None and os.path.isdir(work_dir):
+            shutil.rmtree(work_dir, ignore_errors=True)
+
     def clone_build(self, *, remix_audio=False, defer_queue=False):
         """
         Create a new ProjectBuild instance from this ProjectBuild.
@@ -764,15 +1270,17 @@ class ProjectBuild(BaseProjectMixin, models.Model):
             project_log_commit_hash=self.project_log_commit_hash,
             project_log_commit_time=self.project_log_commit_time,
             project_log_commit_preview=self.project_log_commit_preview,
+            project_log_summary=self.project_log_summary,
             video_size=self.video_size,
+            encoder_profile=self.encoder_profile,
+            is_draft=self.is_draft,
             status='queued' if not defer_queue else 'pending',
             is_full_build=remix_audio is False,
             queued_at=timezone.now() if not defer_queue else None
         )
 
-       # Copy snapshot of `project_log` file
-        with open(self.project_log.path, 'rb') as _file:
-            build.project_log.save('gource.log', ContentFile(_file.read()))
+        # Copy snapshot of `project_log` file
+        copy_field_file(self.project_log, build.project_log)
         # Copy other optional artifacts
         # Background audio
         if remix_audio is not False:
@@ -780,25 +1288,18 @@ class ProjectBuild(BaseProjectMixin, models.Model):
             # Use newly provided audio
             if isinstance(remix_audio, FieldFile):
                 build.build_audio_name = os.path.basename(remix_audio.name)
-                with open(remix_audio.path, 'rb') as _file:
-                    build.build_audio.save(os.path.basename(remix_audio.name),
-                                           ContentFile(_file.read()))
+                copy_field_file(remix_audio, build.build_audio)
         elif self.build_audio:
             # Copy from build
             build.build_audio_name = self.build_audio_name
-            with open(self.build_audio.path, 'rb') as _file:
-                build.build_audio.save(os.path.basename(self.build_audio.name),
-                                       ContentFile(_file.read()))
+            copy_field_file(self.build_audio, build.build_audio)
         if self.build_logo:
             # Project logo
-            with open(self.build_logo.path, 'rb') as _file:
-                build.build_logo.save(os.path.basename(self.build_logo.name),
-                                      ContentFile(_file.read()))
+            copy_field_file(self.build_logo, build.build_logo)
         if self.build_background:
             # Project background
-            with open(self.build_background.path, 'rb') as _file:
-                build.build_background.save(os.path.basename(self.build_background.name),
-                                            ContentFile(_file.read()))
+            copy_field_file(self.build_background, build.build_background)
+        build.save()
 
         # Copy over build options for archival
         build_options = []
@@ -841,7 +1342,7 @@ class ProjectBuild(BaseProjectMixin, models.Model):
 
         # Send to background worker
         if not defer_queue:
-            generate_gource_build.delay(build.id)
+            build.send_to_worker()
 
         return build
 
@@ -876,6 +1377,96 @@ class ProjectBuildOption(models.Model):
         }
 
 
+class ProjectFetch(models.Model):
+    """
+    Background download of a project's VCS log (see `tasks.fetch_project_log`).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('errored', 'Errored')
+    ]
+
+    project = models.ForeignKey(Project, related_name='fetches', on_delete=models.CASCADE)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='queued')
+
+    # Source (copied from project when queued)
+    project_url = models.TextField()
+    project_branch = models.CharField(max_length=256, default='master')
+    # Follow-up actions after log is updated
+    load_captions = models.BooleanField(default=False)
+    queue_build = models.BooleanField(default=False)
+    build = models.ForeignKey(ProjectBuild, related_name='+', on_delete=models.SET_NULL, blank=True, null=True)
+    # Latest commit fetched
+    commit_hash = models.CharField(max_length=64, blank=True, null=True)
+    # Brief description of error for user display
+    error_description = models.TextField(blank=True, null=True)
+
+    # Timestamps
+    queued_at = models.DateTimeField(null=True)
+    running_at = models.DateTimeField(null=True)
+    completed_at = models.DateTimeField(null=True)
+    errored_at = models.DateTimeField(null=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return f"{self.project_url} ({self.status})"
+
+    def get_absolute_url(self):
+        return reverse('api-project-fetch-detail', args=[self.project_id, self.pk])
+
+    @property
+    def is_finished(self):
+        return self.status in ['completed', 'errored']
+
+    @property
+    def duration(self):
+        "Return running time (seconds) of fetch, or None if not started"
+        if not self.running_at:
+            return None
+        finished_at = self.completed_at or self.errored_at or timezone.now()
+        return (finished_at - self.running_at).total_seconds()
+
+    ## Status transition methods
+
+    def mark_running(self):
+        "Mark fetch running"
+        if self.status == 'queued':
+            self.status = 'running'
+            self.running_at = timezone.now()
+            self.save(update_fields=['status', 'running_at', 'updated_at'])
+        else:
+            raise ValueError("Cannot mark fetch running from \"%s\" status", self.status)
+
+    def mark_completed(self):
+        "Mark fetch as completed"
+        if self.status == 'running':
+            self.status = 'completed'
+            self.completed_at = timezone.now()
+            self.save(update_fields=['status', 'completed_at', 'commit_hash', 'build', 'updated_at'])
+        else:
+            raise ValueError("Cannot mark fetch completed from \"%s\" status", self.status)
+
+    def mark_errored(self, error_description=None):
+        "Mark fetch as errored"
+        update_fields = ['updated_at']
+        if self.status != 'errored':
+            self.status = 'errored'
+            self.errored_at = timezone.now()
+            update_fields += ['status', 'errored_at']
+        if error_description is not None:
+            self.error_description = error_description
+            update_fields.append('error_description')
+        self.save(update_fields=update_fields)
+
+
 class BaseCaption(models.Model):
     """
     Abstract class for Caption entries.
@@ -1,10 +1,15 @@
 import logging
 
-from django.db.models.signals import post_save
+import os
+import shutil
+
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django_cleanup.signals import cleanup_post_delete
 
 from .constants import PROJECT_OPTION_DEFAULTS
-from .models import Project, ProjectOption
+from .models import Project, ProjectBuild, ProjectOption
+from .utils import get_log_columns_path, get_log_digest_path, get_log_index_path
 
 
 @receiver(post_save, sender=Project, dispatch_uid='gource_studio.core.signals.project_post_save_handler')
@@ -13,11 +18,31 @@ def project_post_save_handler(sender, instance, created, **kwargs):
         return
 
     # Upon creation, automatically load default Gource options to project
+    # - NOTE: `Project.objects.bulk_create()` skips this (see `importer.import_projects()`)
     logging.debug("Loading %s default options onto Project ID=%s", len(PROJECT_OPTION_DEFAULTS), instance.pk)
-    for option in PROJECT_OPTION_DEFAULTS:
-        ProjectOption.objects.create(
-            project=instance,
-            name=option[0],
-            value=option[1],
-            value_type=option[2]
-        )
+    ProjectOption.objects.bulk_create(ProjectOption.get_defaults(instance))
+
+
+@receiver(post_delete, sender=ProjectBuild, dispatch_uid='gource_studio.core.signals.project_build_post_delete_handler')
+def project_build_post_delete_handler(sender, instance, **kwargs):
+    # Remove rendered segments kept for resuming build (see `ProjectBuild.get_work_dir()`)
+    instance.remove_work_dir()
+
+
+@receiver(cleanup_post_delete, dispatch_uid='gource_studio.core.signals.project_log_cleanup_handler')
+def project_log_cleanup_handler(sender, file, field_name, file_name, **kwargs):
+    # Remove derived sidecar files along with removed Gource logs
+    if field_name != 'project_log':
+        return
+    if file.storage.exists(file_name):
+        # Shared log still in use (see ContentAddressedStorage)
+        return
+    log_path = file.storage.path(file_name)
+    columns_path = get_log_columns_path(log_path)
+    if os.path.isdir(columns_path):
+        logging.debug("Removing log columns: %s", columns_path)
+        shutil.rmtree(columns_path, ignore_errors=True)
+    for sidecar_path in [get_log_index_path(log_path), get_log_digest_path(log_path)]:
+        if os.path.isfile(sidecar_path):
+            logging.debug("Removing log sidecar: %s", sidecar_path)
+            os.remove(sidecar_path)
@@ -1391,6 +1391,19 @@ App.pages.project.init = function(project_id, page_options) {
             },
             success: function(data, textStatus, xhr) {
                 console.log("SUCCESS: ", data);
+                if (xhr.status === 202) {
+                    // Build is queued once VCS log has been fetched
+                    $('body #queue-project-build-modal .error-message').text('Fetching latest VCS log...');
+                    App.utils.waitForProjectFetch(data.url, {
+                        success: function() {
+                            window.location = "/projects/"+App.pages.project.project_id+"/builds/";
+                        },
+                        error: function(message) {
+                            $('body #queue-project-build-modal .error-message').text(message);
+                        }
+                    });
+                    return;
+                }
                 // Redirect/reload
                 window.location = "/projects/"+App.pages.project.project_id+"/builds/";
             },
@@ -1418,6 +1431,9 @@ App.pages.project.init = function(project_id, page_options) {
         if ($('#queue_project_build_refetch_log').is(':checked')) {
             options.refetch_log = true;
         }
+        if ($('#queue_project_build_draft').is(':checked')) {
+            options = {draft: true};
+        }
         let $ajax = queue_project_build(options);
     });
 
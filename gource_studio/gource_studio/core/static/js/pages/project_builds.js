@@ -30,6 +30,19 @@ App.pages.project_builds.init = function(project_id, page_options) {
             },
             success: function(data, textStatus, xhr) {
                 console.log("SUCCESS: ", data);
+                if (xhr.status === 202) {
+                    // Build is queued once VCS log has been fetched
+                    $('body #queue-project-build-modal .error-message').text('Fetching latest VCS log...');
+                    App.utils.waitForProjectFetch(data.url, {
+                        success: function() {
+                            window.location = "/projects/"+App.pages.project_builds.project_id+"/builds/";
+                        },
+                        error: function(message) {
+                            $('body #queue-project-build-modal .error-message').text(message);
+                        }
+                    });
+                    return;
+                }
                 // Redirect/reload
                 window.location = "/projects/"+App.pages.project_builds.project_id+"/builds/";
             },
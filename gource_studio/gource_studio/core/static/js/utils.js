@@ -48,6 +48,31 @@ App.utils.handleErrorXHR = function(xhr, err) {
     }
 };
 
+// Poll status of background VCS fetch (`202 Accepted` responses) until finished
+App.utils.waitForProjectFetch = function(fetch_url, options) {
+    options = options || {};
+    const interval = options.interval || 2000;
+    const poll = function() {
+        $.ajax({
+            url: fetch_url,
+            method: 'GET',
+            success: function(data, textStatus, xhr) {
+                if (data.status === 'completed') {
+                    if (options.success) { options.success(data); }
+                } else if (data.status === 'errored') {
+                    if (options.error) { options.error(data.error_description || 'VCS fetch failed'); }
+                } else {
+                    setTimeout(poll, interval);
+                }
+            },
+            error: function(xhr, textStatus, err) {
+                if (options.error) { options.error(err); }
+            }
+        });
+    };
+    setTimeout(poll, interval);
+};
+
 
 // Simple way to "deep" cloning JSON object
 App.utils.cloneJSON = function(data) {
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that saves each distinct file content only once.
+
+    Files are stored by their SHA-256 hash (`blobs/<sha[:2]>/<sha><ext>`),
+    ignoring the requested name (except for file extension).  Saving the
+    same content again returns the existing blob name without writing.
+
+    Blobs may be shared by any number of model fields using this storage,
+    so `delete()` only removes the blob once no rows reference it.  Blobs
+    used within the last `BLOB_MIN_AGE` seconds are also kept, as they may
+    be about to be referenced (see `touch()`); `gc_blobs` removes them later.
+    """
+    BLOBS_DIR = 'blobs'
+
+    def get_blob_name(self, sha256, ext=''):
+        "Return storage name of blob with given SHA-256 hash"
+        return f'{self.BLOBS_DIR}/{sha256[:2]}/{sha256}{ext}'
+
+    def get_available_name(self, name, max_length=None):
+        # Final name is determined by content (see `_save`)
+        return name
+
+    def _save(self, name, content):
+        _, ext = os.path.splitext(name)
+        blobs_path = self.path(self.BLOBS_DIR)
+        os.makedirs(blobs_path, exist_ok=True)
+        # Hash content while writing to temporary file
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=blobs_path, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as _file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    _file.write(chunk)
+            blob_name = self.get_blob_name(digest.hexdigest(), ext.lower())
+            blob_path = self.path(blob_name)
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                # Identical content, so concurrent writers may safely replace
+                os.replace(tmp_path, blob_path)
+            else:
+                self.touch(blob_name)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return blob_name
+
+    def touch(self, name):
+        """
+        Record use of blob `name` (as its access time), so it isn't removed
+        while being shared with a new row.
+
+        Modification time is left unchanged, as it is used to detect changes
+        to derived files (e.g. `GourceLogDigest`).
+        """
+        try:
+            os.utime(self.path(name), ns=(time.time_ns(), os.stat(self.path(name)).st_mtime_ns))
+        except FileNotFoundError:
+            pass
+
+    def get_last_used(self, name):
+        "Return time (seconds since epoch) blob `name` was last written or shared."
+        stat = os.stat(self.path(name))
+        return max(stat.st_atime, stat.st_mtime)
+
+    def get_reference_count(self, name):
+        "Return number of model rows referencing stored file `name`"
+        count = 0
+        for model, field in get_content_addressed_fields():
+            count += model._default_manager.filter(**{field.name: name}).count()
+        return count
+
+    def delete(self, name):
+        if name and name.startswith(f'{self.BLOBS_DIR}/'):
+            refs = self.get_reference_count(name)
+            if refs:
+                logging.debug("Keeping blob %s (%s references)", name, refs)
+                return
+            min_age = getattr(settings, 'BLOB_MIN_AGE', 60*60)
+            if self.exists(name) and self.get_last_used(name) > time.time() - min_age:
+                logging.debug("Keeping recently used blob %s (see `gc_blobs`)", name)
+                return
+        super().delete(name)
+
+
+def get_content_addressed_fields():
+    "Return list of (model, field) for all file fields using `ContentAddressedStorage`"
+    fields = []
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage):
+                fields.append((model, field))
+    return fields
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def get_blob_storage():
+    return blob_storage
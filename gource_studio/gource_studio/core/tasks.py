@@ -1,36 +1,47 @@
+from datetime import datetime, timezone
 import logging
 import os
 from pathlib import Path
+import random
 import shutil
 import tempfile
 import time
+from urllib.parse import urlparse
 
 from celery import shared_task
+from django.conf import settings
 from django.core.files import File
 from django.core.files.base import ContentFile
+from django.db import transaction
 
 from .constants import GOURCE_OPTIONS
 from .exceptions import ProjectBuildAbortedError
 from .utils import (
     add_background_audio,   #(video_path, audio_path, loop=True):
-    analyze_gource_log,     #(data):
     download_git_log,       #(url, branch="master"):
+    download_git_snapshot,  #(url, branch="master", cache_timeout=None, vcs="git"):
+    evict_git_mirrors,      #(max_size=None):
     format_duration,        #(seconds):
     generate_gource_video,  #(log_data, seconds_per_day=0.1, framerate=60, avatars=None, default_avatar=None):
+    get_vcs_remote_head,    #(url, branch="master", vcs="git"):
     get_video_duration,     #(video_path):
     get_video_thumbnail,    #(video_path, width=512, secs=None, percent=None):
+    host_slot,              #(host, limit=None, timeout=600):
     remove_background_audio,#(video_path):
     rescale_image,          #(image_path, width=256)
     resolve_project_avatars,#(project, contributers):
     test_http_url,          #(url):
+    try_lock_directory,     #(path):
 )
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
+# NOTE: Acknowledged after completion, so builds interrupted by a worker
+#       restart are redelivered and resume from their work directory
+@shared_task(acks_late=True, reject_on_worker_lost=True)
 def generate_gource_build(build_id):
-    from .models import Project, ProjectBuild, UserAvatar, ProjectUserAvatar
+    from .models import ProjectBuild
 
     try:
         build = ProjectBuild.objects.get(id=build_id)
@@ -38,12 +49,35 @@ def generate_gource_build(build_id):
         logger.error("Invalid build ID: %s", build_id)
         return
 
-    if build.status != 'queued':
-        logger.error("Invalid build status: (ID=%s, status=%s). Expecting \"queued\"...", build.status)
+    # Only one worker may process a build (e.g. if redelivered while still running)
+    work_dir = build.get_work_dir() if not build.content else None
+    with try_lock_directory(work_dir) as acquired:
+        if not acquired:
+            logger.warning("Build is already being processed (ID=%s)", build.id)
+            return
+        build.refresh_from_db()
+        _generate_gource_build(build, work_dir)
+
+
+def _generate_gource_build(build, work_dir=None):
+    if build.status == 'running':
+        # Interrupted (redelivered or re-queued)
+        logger.info("Resuming build (ID=%s)", build.id)
+    elif build.status != 'queued':
+        logger.error("Invalid build status: (ID=%s, status=%s). Expecting \"queued\"...", build.id, build.status)
         return
+    else:
+        # Begin processing
+        build.mark_running()
 
-    # Begin processing
-    build.mark_running()
+    # Give up on builds that keep failing (e.g. worker killed while rendering)
+    build.attempts += 1
+    build.save(update_fields=['attempts'])
+    max_attempts = getattr(settings, 'BUILD_MAX_ATTEMPTS', None)
+    if max_attempts and build.attempts > max_attempts:
+        logger.error("Too many build attempts (ID=%s, attempts=%s)", build.id, build.attempts)
+        build.mark_errored(error_description=f"Build failed after {max_attempts} attempts")
+        return
 
     # If video file already set on build, we are only modifying the audio track (`remix_audio=True`)
     # Depending on the `build_audio` field, we will add or remove audio.
@@ -103,16 +137,24 @@ def generate_gource_build(build_id):
     build.set_build_stage("init", "Preparing project assets")
     start_time = time.monotonic()
 
+    # Record video duration estimate (used to calibrate future estimates)
+    # and predicted build time (used for progress)
+    try:
+        build.estimated_duration = build.estimate_video_duration(calibrated=False)
+        build.expected_build_time = build.get_expected_build_duration()
+        build.save(update_fields=['estimated_duration', 'expected_build_time'])
+    except Exception:
+        logger.exception("Failed to estimate video duration")
+
     tempdir = tempfile.mkdtemp(prefix="gource_")
     print(f"CELERY BUILD TEMPDIR = {tempdir}")
     try:
         tempdir_path = Path(tempdir)
 
-        # Read in project Gource log
-        with open(build.project_log.path, 'r') as _file:
-            log_data = _file.read()
+        # Gource log is streamed from disk (never read fully into memory)
+        log_path = Path(build.project_log.path)
 
-        log_info = analyze_gource_log(log_data)
+        log_info = build.analyze_log()
         contributors = set(log_info['users'])
         # Set up avatars
         avatar_dir = None
@@ -150,12 +192,33 @@ def generate_gource_build(build_id):
         if build.build_background:
             background_file = build.build_background.path
 
+        # Index of log used to pass only selected date range to Gource
+        log_index = None
+        if gource_options.get('start-date') or gource_options.get('stop-date'):
+            log_index = build.get_log_index()
+
+        # Incremental build: only render log entries added since base build
+        base_video = base_log_size = None
+        base_build = build.base_build
+        if base_build is not None and base_build.content and os.path.isfile(base_build.content.path):
+            base_video = base_build.content.path
+            base_log_size = base_build.get_log_summary().size
+            logger.info("Extending video of build %s (log offset: %s)", base_build.id, base_log_size)
+
+        # Background audio is added while encoding video (fade out at estimated end)
+        audio_path = estimated_duration = None
+        if build.build_audio:
+            audio_path = build.build_audio.path
+            if build.estimated_duration:
+                estimated_duration = build.get_duration_calibration().apply(build.estimated_duration)
+
         build.set_build_stage("gource", "Capturing Gource video")
         output_path = Path(tempdir) / f"{int(time.time())}.mp4"
         try:
             final_path = generate_gource_video(
-                log_data,
+                log_path,
                 video_size=build.video_size,
+                framerate=getattr(settings, 'DRAFT_BUILD_FRAMERATE', 30) if build.is_draft else 60,
                 avatars=avatar_dir,
                 captions=captions_path,
                 logo_file=logo_file,
@@ -163,28 +226,22 @@ def generate_gource_build(build_id):
                 gource_options=gource_options,
                 project_build=build,
                 output_path=output_path,
+                log_index=log_index,
+                work_dir=work_dir,
+                base_video=base_video,
+                base_log_size=base_log_size,
+                encoder_profile=build.encoder_profile,
+                background_audio=audio_path,
+                estimated_duration=estimated_duration,
             )
         except ProjectBuildAbortedError:
             logger.info("Project was aborted by user [elapsed: %s]", format_duration(time.monotonic() - start_time))
+            build.remove_work_dir()
             return
 
         logger.info("[+%s] Video capture complete", format_duration(time.monotonic() - start_time))
         build.duration = int(get_video_duration(final_path))
 
-        # Add background audio (optional)
-        # TODO support abort
-        try:
-            if build.build_audio:
-                mixer_start_time = time.monotonic()
-                build.set_build_stage("audio", "Mixing audio")
-                audio_path = build.build_audio.path
-                logger.info("Beginning audio mixing...")
-                output_path = Path(tempdir) / f"{int(time.time())}_audio.mp4"
-                final_path = add_background_audio(final_path, audio_path, loop=True, output_path=output_path)
-                logger.info("[+%s] Audio mixing complete", format_duration(time.monotonic() - mixer_start_time))
-        except:
-            logger.exception("Failed to mix background audio")
-
         # Save video content
         build.size = os.path.getsize(final_path)
         logger.info("Saving video (%s bytes)...", build.size)
@@ -212,9 +269,240 @@ def generate_gource_build(build_id):
         # Finishing steps
         build.mark_completed()
         build.set_build_stage("success", "")
+        # NOTE: Work directory of errored builds is kept (see `ProjectBuild.requeue_build()`)
+        build.remove_work_dir()
 
     except Exception as e:
         build.mark_errored(error_description=str(e))
         logger.exception("Unhandled task error while generating video")
     finally:
         shutil.rmtree(tempdir)
+
+
+# NOTE: Retried while all slots for the host are in use (see `host_slot()`)
+@shared_task(bind=True, max_retries=30)
+def fetch_project_log(self, fetch_id):
+    from .models import ProjectFetch
+
+    try:
+        fetch = ProjectFetch.objects.select_related('project').get(id=fetch_id)
+    except ProjectFetch.DoesNotExist:
+        logger.error("Invalid fetch ID: %s", fetch_id)
+        return
+
+    if fetch.status != 'queued':
+        logger.error("Invalid fetch status: (ID=%s, status=%s). Expecting \"queued\"...", fetch.id, fetch.status)
+        return
+
+    # Limit concurrent fetches from the same host
+    host = urlparse(fetch.project_url).netloc
+    with host_slot(host, limit=getattr(settings, 'PROJECT_REFRESH_HOST_CONCURRENCY', None), timeout=60*60) as acquired:
+        if not acquired:
+            if self.request.retries >= self.max_retries:
+                fetch.mark_errored(error_description=f"Too many concurrent fetches from host: {host}")
+                return
+            raise self.retry(countdown=random.uniform(10, 60))
+        _fetch_project_log(fetch)
+
+
+def _fetch_project_log(fetch):
+    from .models import ProjectCaption
+
+    # Begin processing
+    fetch.mark_running()
+    project = fetch.project
+
+    try:
+        # Download latest VCS branch; generate Gource log
+        test_http_url(fetch.project_url)
+        log_data, log_hash, log_subject, tags_list, log_stats = download_git_snapshot(fetch.project_url, branch=fetch.project_branch,
+                                                                                       vcs=project.project_vcs, refresh=True)
+        if not log_data:
+            raise ValueError("VCS log is empty")
+        project.project_log_commit_hash = log_hash
+        project.project_log_commit_preview = log_subject
+        # Get time/author from last entry
+        latest_commit = log_data.splitlines()[-1].split('|')
+        project.project_log_commit_time = datetime.fromtimestamp(int(latest_commit[0]), tz=timezone.utc)
+        project.save_project_log(log_data, log_stats=log_stats)
+        fetch.commit_hash = log_hash
+        logger.info("Fetched project log (ID=%s, %s bytes)", fetch.id, len(log_data))
+
+        # Load ProjectCaptions from VCS tags
+        if fetch.load_captions:
+            for timestamp, tag_name in tags_list:
+                try:
+                    ProjectCaption.objects.get_or_create(
+                        project=project,
+                        timestamp=timestamp,
+                        text=tag_name
+                    )
+                except Exception:
+                    logger.exception("Failed to load caption")
+
+        # Create new build (immediately in "queued" state)
+        if fetch.queue_build:
+            fetch.build = project.create_build(incremental=getattr(settings, 'PROJECT_REFRESH_INCREMENTAL_BUILD', False))
+            project.set_project_changed(False)
+
+        fetch.mark_completed()
+
+    except Exception as e:
+        fetch.mark_errored(error_description=str(e))
+        logger.exception("Unhandled task error while fetching project log")
+
+
+@shared_task
+def cleanup_draft_builds():
+    """
+    Periodic task (Celery beat) removing expired draft builds (see
+    `DRAFT_BUILD_MAX_AGE`).
+    """
+    from .models import ProjectBuild
+
+    count = 0
+    for build in ProjectBuild.objects.expired_drafts():
+        build.delete()  # NOTE: files removed by `django-cleanup`
+        count += 1
+    if count:
+        logger.info("Removed %s expired draft builds", count)
+    return count
+
+
+@shared_task
+def cleanup_build_work_dirs():
+    """
+    Periodic task (Celery beat) removing work directories of finished (e.g.
+    errored or aborted) and deleted builds, once unchanged for longer than
+    `BUILD_WORK_DIR_MAX_AGE`.
+    """
+    from .models import ProjectBuild
+
+    work_root = getattr(settings, 'BUILD_WORK_DIR', None)
+    if not work_root or not os.path.isdir(work_root):
+        return 0
+    max_age = getattr(settings, 'BUILD_WORK_DIR_MAX_AGE', 7*24*60*60)
+    active_ids = {str(build_id) for build_id in ProjectBuild.objects.exclude(status__in=ProjectBuild.FINISHED_STATUSES)
+                                                                    .values_list('id', flat=True)}
+    count = 0
+    for entry in os.scandir(work_root):
+        if not entry.is_dir() or entry.name in active_ids:
+            continue
+        if time.time() - entry.stat().st_mtime < max_age:
+            continue
+        # Skip if re-queued build is being processed again
+        with try_lock_directory(entry.path) as acquired:
+            if not acquired:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+        count += 1
+    if count:
+        logger.info("Removed %s build work directories", count)
+    return count
+
+
+@shared_task
+def evict_vcs_mirrors():
+    """
+    Periodic task (Celery beat) removing least recently used VCS mirrors
+    while the cache is larger than `VCS_CACHE_MAX_SIZE` (see `evict_git_mirrors()`).
+    """
+    removed = evict_git_mirrors()
+    if removed:
+        logger.info("Removed %s VCS mirrors", len(removed))
+    return len(removed)
+
+
+@shared_task
+def cleanup_log_summaries():
+    """
+    Periodic task (Celery beat) removing log summaries no longer used by
+    any project or build log (e.g. after project logs were updated).
+    """
+    from .models import LogSummary
+
+    count, _ = LogSummary.objects.unused().delete()
+    if count:
+        logger.info("Removed %s unused log summaries", count)
+    return count
+
+
+@shared_task
+def schedule_project_refreshes():
+    """
+    Periodic task (Celery beat) scheduling `refresh_project_log` for each
+    project with an active VCS URL.
+
+    Checks are spread evenly (with random jitter) across the refresh
+    interval, so projects are not all checked at once.
+    """
+    from .models import Project
+
+    interval = getattr(settings, 'PROJECT_REFRESH_INTERVAL', None)
+    if not interval:
+        return 0
+
+    project_ids = list(Project.objects.filter(project_url_active=True)
+                                      .exclude(project_url='')
+                                      .values_list('id', flat=True))
+    random.shuffle(project_ids)
+    spacing = interval / max(len(project_ids), 1)
+    for index, project_id in enumerate(project_ids):
+        refresh_project_log.apply_async((project_id,), countdown=(index + random.random()) * spacing)
+    logger.info("Scheduled refresh of %s projects", len(project_ids))
+    return len(project_ids)
+
+
+# NOTE: Retried while all slots for the host are in use (skipped until next
+#       scheduled refresh after that, see `schedule_project_refreshes`)
+@shared_task(bind=True, max_retries=10)
+def refresh_project_log(self, project_id):
+    """
+    Queue fetch of project log (and optionally a new build) if the remote
+    branch head differs from `project_log_commit_hash`.
+
+    Returns new ProjectFetch ID (or None if skipped).
+    """
+    from .models import Project
+
+    try:
+        project = Project.objects.get(id=project_id)
+    except Project.DoesNotExist:
+        logger.error("Invalid project ID: %s", project_id)
+        return None
+
+    if not project.project_url_active or not project.project_url:
+        return None
+    if project.pending_fetch:
+        logger.info("Skipping refresh of project (ID=%s): fetch already pending", project.id)
+        return None
+
+    # Check remote head (limit concurrent requests to the same host)
+    host = urlparse(project.project_url).netloc
+    with host_slot(host, limit=getattr(settings, 'PROJECT_REFRESH_HOST_CONCURRENCY', None)) as acquired:
+        if not acquired:
+            if self.request.retries >= self.max_retries:
+                logger.warning("Skipping refresh of project (ID=%s): too many concurrent requests to %s", project.id, host)
+                return None
+            raise self.retry(countdown=random.uniform(10, 60))
+        commit_hash = get_vcs_remote_head(project.project_url, branch=project.project_branch, vcs=project.project_vcs)
+
+    if commit_hash is None:
+        logger.warning("Remote branch not found for project (ID=%s): %s", project.id, project.project_branch)
+        return None
+    if commit_hash == project.project_log_commit_hash:
+        return None
+
+    with transaction.atomic():
+        # Lock project, so concurrent refreshes don't both queue a fetch
+        project = Project.objects.select_for_update().get(id=project.id)
+        if project.pending_fetch:
+            logger.info("Skipping refresh of project (ID=%s): fetch already pending", project.id)
+            return None
+        queue_build = getattr(settings, 'PROJECT_REFRESH_AUTO_BUILD', False) \
+                        and not project.has_build_waiting
+        fetch = project.queue_fetch(queue_build=queue_build, defer_queue=True)
+    # Queued once committed (visible to worker)
+    fetch_project_log.delay(fetch.id)
+    logger.info("Queued refresh of project (ID=%s, fetch ID=%s)", project.id, fetch.id)
+    return fetch.id
@@ -1,23 +1,43 @@
-from datetime import datetime, timedelta
+import array
+import bisect
+import codecs
+import collections
+import contextlib
+from datetime import datetime, timedelta, timezone
+import fcntl
 import functools
-from io import BytesIO
+import gzip
+import hashlib
+from io import BytesIO, StringIO, TextIOWrapper
+import itertools
+import json
 import logging
 import math
+import mmap
 import os
 from pathlib import Path
 import re
 import shutil
 import ssl
+import struct
 import subprocess
+import sys
 import tempfile
+import threading
 import time
 import urllib
 from urllib.parse import urlparse
+import zlib
 
 from django.conf import settings as django_settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import FileResponse, StreamingHttpResponse
+from django.views.static import serve
 from PIL import Image
 
-from .constants import VIDEO_OPTIONS, VIDEO_FONT_DEFAULTS
+from .constants import DEFAULT_ENCODER_PROFILE, ENCODER_PROFILES, VIDEO_OPTIONS, VIDEO_FONT_DEFAULTS
 from .exceptions import ProjectBuildAbortedError
 
 # Ignore SSL verification
@@ -25,6 +45,7 @@ ssl._create_default_https_context = ssl._create_unverified_context
 
 GOURCE_TIMEOUT = 4*60*60    # 4 hours
 FFMPEG_TIMEOUT = 4*60*60    # 4 hours
+AUDIO_FADE_SECONDS = 2.0    # Fade out of background audio
 
 
 def get_gource():
@@ -181,11 +202,373 @@ def validate_project_url(url):
         raise ValueError(f"Unauthorized URL domain: {info.netloc}")
 
 
-def download_git_log(url, branch="master"):
+def _run_git(args, cwd=None, timeout=60):
+    "Run `git` command, raising `RuntimeError` on failure. Returns stdout (str)."
+    p1 = subprocess.run([get_git()] + args, cwd=cwd, timeout=timeout,
+                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if p1.returncode:
+        raise RuntimeError(f"[{p1.returncode}] Error: {p1.stderr.decode('utf-8')}")
+    return p1.stdout.decode('utf-8')
+
+
+def _run_hg(args, cwd=None, timeout=60):
+    "Run `hg` command, raising `RuntimeError` on failure. Returns stdout (str)."
+    # HGPLAIN disables user configuration affecting output (aliases, i18n, etc.)
+    p1 = subprocess.run([get_mercurial(), '--noninteractive'] + args, cwd=cwd, timeout=timeout,
+                        env=dict(os.environ, HGPLAIN='1', HGENCODING='utf-8'),
+                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if p1.returncode:
+        raise RuntimeError(f"[{p1.returncode}] Error: {p1.stderr.decode('utf-8')}")
+    return p1.stdout.decode('utf-8')
+
+
+def get_vcs_cache_dir():
+    "Return path of local VCS repository cache (or None if disabled)."
+    cache_dir = getattr(django_settings, 'VCS_CACHE_DIR', None)
+    return Path(cache_dir) if cache_dir else None
+
+
+@contextlib.contextmanager
+def git_mirror(url, branch="master"):
+    """
+    Context manager providing a local (no checkout) clone of Git repository
+    `url` with `branch` up to date.
+
+    Clones are kept in `VCS_CACHE_DIR` (one per URL) and later refreshed
+    using `git fetch`, so only new objects are downloaded.  The clone is
+    locked while in use, so concurrent workers do not modify it at the
+    same time.  Least recently used clones are removed once the cache is
+    larger than `VCS_CACHE_MAX_SIZE` (see `evict_git_mirrors()`, run when a
+    new clone is added and periodically by Celery beat).
+
+    If no cache is configured, a temporary clone is used instead.
+
+        with git_mirror(url, branch) as repo_path:
+            ...
+    """
+    with _vcs_mirror(url, url, branch, _clone_git_mirror, _fetch_git_mirror) as repo_path:
+        yield repo_path
+
+
+@contextlib.contextmanager
+def hg_mirror(url, branch="default"):
+    """
+    Context manager providing a local (no working copy) clone of Mercurial
+    repository `url` with `branch` up to date.
+
+    Same as `git_mirror()`, with clones refreshed using `hg pull`.
+
+        with hg_mirror(url, branch) as repo_path:
+            ...
+    """
+    with _vcs_mirror(url, f'hg:{url}', branch, _clone_hg_mirror, _pull_hg_mirror) as repo_path:
+        yield repo_path
+
+
+@contextlib.contextmanager
+def _vcs_mirror(url, cache_key, branch, clone_func, update_func):
+    # See `git_mirror()`
+    # - `clone_func(url, branch, repo_path)`
+    # - `update_func(branch, repo_path)`
+    cache_dir = get_vcs_cache_dir()
+    if cache_dir is None:
+        tempdir = tempfile.mkdtemp(prefix="gource_")
+        try:
+            repo_path = Path(tempdir) / 'vcs_source'
+            clone_func(url, branch, repo_path)
+            yield repo_path
+        finally:
+            shutil.rmtree(tempdir)
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    mirror_name = hashlib.sha256(cache_key.encode('utf-8')).hexdigest()[:32]
+    repo_path = cache_dir / mirror_name
+    created = False
+    with open(cache_dir / f'{mirror_name}.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Lock file modification time tracks last use
+            os.utime(lock_file.name)
+            if os.path.isdir(repo_path):
+                try:
+                    update_func(branch, repo_path)
+                except Exception:
+                    # Start over (e.g. corrupted or branch history rewritten)
+                    logging.exception("Failed to update VCS mirror (re-cloning): %s", url)
+                    shutil.rmtree(repo_path)
+            if not os.path.isdir(repo_path):
+                tmp_path = cache_dir / f'.{mirror_name}.tmp'
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                try:
+                    clone_func(url, branch, tmp_path)
+                    os.replace(tmp_path, repo_path)
+                    created = True
+                finally:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+            yield repo_path
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    if created:
+        # Growth of existing mirrors is handled periodically (see `tasks.evict_vcs_mirrors`)
+        try:
+            evict_git_mirrors()
+        except Exception:
+            logging.exception("Failed to evict VCS mirrors")
+
+
+def _clone_git_mirror(url, branch, repo_path):
+    ## 1 - Clone repository locally (as minimal as possible)
+    _run_git(['clone', '--quiet', '--filter=blob:none', '--no-checkout',
+              '--single-branch',
+              '--branch', branch,
+              url, str(repo_path)])
+
+    ## 1.1 - Disable 'filterpartialclone' and 'promisor' to prevent any additional
+    ##       network fetching (via lazy loading)
+    #      - This may cause the generated 'git log' to be incomplete,
+    #        but additional network downloading is not doable in our application
+    for config_setting in ['remote.origin.partialclonefilter', 'remote.origin.promisor']:
+        cmd = [get_git(), 'config', '--unset', config_setting]
+        p1_1 = subprocess.run(cmd, cwd=str(repo_path), timeout=10,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if p1_1.returncode and p1_1.returncode not in [5]:
+            # Error
+            raise RuntimeError(f"[{p1_1.returncode}] Error: {p1_1.stderr.decode('utf-8')}")
+
+
+def _fetch_git_mirror(branch, repo_path):
+    # Update (or add) local branch, downloading only new commits/trees
+    # - NOTE: HEAD may refer to this branch (`--update-head-ok`)
+    _run_git(['fetch', '--quiet', '--filter=blob:none', '--update-head-ok',
+              'origin', f'+refs/heads/{branch}:refs/heads/{branch}'],
+             cwd=str(repo_path), timeout=300)
+
+
+def _clone_hg_mirror(url, branch, repo_path):
+    # Only pull changesets of `branch` (and ancestors)
+    _run_hg(['clone', '--quiet', '--noupdate', '--branch', branch, url, str(repo_path)], timeout=600)
+
+
+def _pull_hg_mirror(branch, repo_path):
+    # Download only new changesets
+    _run_hg(['pull', '--quiet', '--branch', branch], cwd=str(repo_path), timeout=300)
+
+
+def evict_git_mirrors(max_size=None):
+    """
+    Remove least recently used VCS mirrors (Git or Mercurial) until cache is within `max_size`
+    bytes (default: `VCS_CACHE_MAX_SIZE`).  Mirrors in use are skipped.
+
+    Sizes of mirrors are cached (see `_get_mirror_size()`), so only mirrors
+    used since the last eviction are measured again.
+
+    Returns list of removed mirror paths.
+    """
+    cache_dir = get_vcs_cache_dir()
+    if max_size is None:
+        max_size = getattr(django_settings, 'VCS_CACHE_MAX_SIZE', None)
+    if cache_dir is None or max_size is None or not os.path.isdir(cache_dir):
+        return []
+
+    mirrors = []
+    total_size = 0
+    for entry in os.scandir(cache_dir):
+        if not entry.is_dir() or entry.name.startswith('.'):
+            continue
+        size = _get_mirror_size(cache_dir, entry.name)
+        lock_path = cache_dir / f'{entry.name}.lock'
+        last_used = os.path.getmtime(lock_path) if os.path.exists(lock_path) else 0
+        mirrors.append((last_used, entry.name, size))
+        total_size += size
+
+    removed = []
+    for _, mirror_name, size in sorted(mirrors):
+        if total_size <= max_size:
+            break
+        with open(cache_dir / f'{mirror_name}.lock', 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue    # In use
+            try:
+                # NOTE: Lock file is kept, as others may already have it open (and
+                # would not exclude a process locking a new file of the same name)
+                shutil.rmtree(cache_dir / mirror_name)
+                if os.path.exists(cache_dir / f'{mirror_name}.size'):
+                    os.remove(cache_dir / f'{mirror_name}.size')
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        total_size -= size
+        removed.append(cache_dir / mirror_name)
+    return removed
+
+
+def _get_mirror_size(cache_dir, mirror_name):
+    # Return disk usage of VCS mirror, cached in '<mirror>.size' until the
+    # mirror is used again (lock file modification time, see `_vcs_mirror()`)
+    size_path = cache_dir / f'{mirror_name}.size'
+    lock_path = cache_dir / f'{mirror_name}.lock'
+    try:
+        if not os.path.exists(lock_path) or os.path.getmtime(size_path) >= os.path.getmtime(lock_path):
+            with open(size_path, 'r') as _file:
+                return int(_file.read())
+    except (OSError, ValueError):
+        pass
+    size = 0
+    for dirpath, _, filenames in os.walk(cache_dir / mirror_name):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    try:
+        with open(size_path, 'w') as _file:
+            _file.write(str(size))
+    except OSError:
+        logging.exception("Failed to save VCS mirror size: %s", size_path)
+    return size
+
+
+# Map `git log --name-status` change types to Gource actions
+# - (T)ype changes, (U)nmerged, etc. are treated as (M)odified
+GIT_GOURCE_ACTIONS = {'A': 'A', 'D': 'D'}
+
+def _unquote_git_path(path):
+    "Return path quoted by Git (C-style, for special characters) as-is"
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+    return codecs.escape_decode(path[1:-1].encode('utf-8'))[0].decode('utf-8', 'replace')
+
+
+def iter_git_gource_log(repo_path, branch=None):
+    """
+    Iterate over Gource log entries (see `GourceLogEntry`) generated from
+    the commit history of local Git repository `repo_path`, oldest first.
+
+    Runs `git log --name-status` as a streaming subprocess, so only the
+    current commit is held in memory.  Output matches the custom log
+    written by `gource --output-custom-log` (commit time, author name,
+    no rename detection, merge commits without changes skipped).
+    """
+    cmd = [get_git(), '-C', str(repo_path),
+           '-c', 'core.quotepath=off',
+           'log',
+           '--reverse',
+           '--no-renames',
+           '--name-status',
+           '--encoding=UTF-8',
+           '--format=%x00%ct|%aN',
+    ]
+    if branch:
+        cmd += [f'refs/heads/{branch}', '--']
+    yield from _iter_vcs_gource_log(cmd, unquote_path=_unquote_git_path)
+
+
+def iter_hg_gource_log(repo_path, branch=None):
+    """
+    Iterate over Gource log entries (see `GourceLogEntry`) generated from
+    the changeset history of local Mercurial repository `repo_path`
+    (ancestors of `branch` head), oldest first.
+
+    Same as `iter_git_gource_log()`, using `hg log` with a template
+    matching the `git log --name-status` output.
+    """
+    revset = f"::branch({_quote_hg_revset(branch)})" if branch else "all()"
+    cmd = [get_mercurial(), '--noninteractive',
+           '--repository', str(repo_path),
+           'log',
+           '--rev', f"sort({revset}, rev)",
+           '--template', "\\0{date|hgdate}|{author|person}\\n"
+                         "{file_adds % 'A\\t{file}\\n'}"
+                         "{file_mods % 'M\\t{file}\\n'}"
+                         "{file_dels % 'D\\t{file}\\n'}",
+    ]
+    yield from _iter_vcs_gource_log(cmd, env=dict(os.environ, HGPLAIN='1', HGENCODING='utf-8'))
+
+
+def _quote_hg_revset(value):
+    "Return `value` as a quoted Mercurial revset string"
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def _iter_vcs_gource_log(cmd, env=None, unquote_path=None):
+    # Parse streamed output of VCS log command `cmd`:
+    #   \x00<TIMESTAMP>[ <TZ>]|<AUTHOR>
+    #   <CHANGE_TYPE>\t<PATH>
+    #   ...
+    # NOTE: stderr written to a file, so a full pipe can't block the command while stdout is read
+    stderr_file = tempfile.TemporaryFile()
+    p1 = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=stderr_file)
+    try:
+        timestamp = user = None
+        for line in TextIOWrapper(p1.stdout, encoding='utf-8', errors='replace'):
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            if line.startswith('\x00'):
+                # New commit header
+                _timestamp, _, user = line[1:].partition('|')
+                timestamp = int(_timestamp.split(' ', 1)[0])
+                user = sys.intern(user.replace('|', ''))
+                continue
+            change_type, _, path = line.partition('\t')
+            if not path or timestamp is None:
+                continue
+            if unquote_path is not None:
+                path = unquote_path(path)
+            yield GourceLogEntry(timestamp, user, GIT_GOURCE_ACTIONS.get(change_type[:1], 'M'), '/' + path)
+        p1.wait()
+        if p1.returncode:
+            stderr_file.seek(0)
+            _stderr = stderr_file.read().decode('utf-8', 'replace')
+            raise RuntimeError(f"[{p1.returncode}] Error: {_stderr}")
+    finally:
+        if p1.poll() is None:
+            p1.kill()
+            p1.wait()
+        p1.stdout.close()
+        stderr_file.close()
+
+
+def write_git_gource_log(repo_path, dest_path, branch=None, log_stats=None, vcs="git"):
+    """
+    Write Gource log generated from local Git repository `repo_path` to
+    `dest_path` (see `iter_git_gource_log()`).
+
+    Use `vcs="hg"` for a local Mercurial repository (see `iter_hg_gource_log()`).
+
+    If `log_stats` (`GourceLogStats`) is provided, it is updated with each
+    entry while the log is written.
+
+    Returns (sha256, size) of written log.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    iter_log = iter_hg_gource_log if vcs == 'hg' else iter_git_gource_log
+    with open(dest_path, 'wb') as _file:
+        for entry in iter_log(repo_path, branch=branch):
+            if log_stats is not None:
+                log_stats.add(entry)
+            line = f"{entry.timestamp}|{entry.user}|{entry.action}|{entry.path}\n".encode('utf-8')
+            digest.update(line)
+            _file.write(line)
+            size += len(line)
+    return digest.hexdigest(), size
+
+
+def download_git_log(url, branch="master", log_stats=None, dest_path=None):
     """
     Generate Gource log from Git repository URL.
 
-    Returns (log_data, latest_hash, latest_subject)
+    If `log_stats` (`GourceLogStats`) is provided, it is populated while
+    the log is generated (see `write_git_gource_log()`).
+
+    If `dest_path` is given, the log is streamed to that file (instead of
+    being read into memory), and its (sha256, size) is returned in place
+    of `log_data`.
+
+    Returns (log_data, latest_hash, latest_subject, tags_list)
     """
     if not re.match(r'https?:\/\/', url):
         raise ValueError("URL must be a valid HTTP resource")
@@ -193,79 +576,45 @@ def download_git_log(url, branch="master"):
     tempdir = tempfile.mkdtemp(prefix="gource_")
     try:
         tempdir_path = Path(tempdir)
-        destdir = tempdir_path / 'vcs_source'
-        ## 1 - Clone repository locally (as minimal as possible)
-        cmd = [get_git(), 'clone', '--quiet', '--filter=blob:none', '--no-checkout',
-               '--single-branch',
-               '--branch', branch,
-               url, str(destdir)]
-        p1 = subprocess.Popen(cmd, cwd=str(tempdir_path),
-                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        p1.wait(timeout=60)     # 60 seconds
-        if p1.returncode:
-            # Error
-            _stdout, _stderr = [x.decode('utf-8') for x in p1.communicate()]
-            raise RuntimeError(f"[{p1.returncode}] Error: {_stderr}")
-
-        ## 1.1 - Disable 'filterpartialclone' and 'promisor' to prevent any additional
-        ##       network fetching (via lazy loading)
-        #      - This may cause the generated 'git log' to be incomplete,
-        #        but additional network downloading is not doable in our application
-        for config_setting in ['remote.origin.partialclonefilter', 'remote.origin.promisor']:
-            cmd = [get_git(), 'config', '--unset', config_setting]
-            p1_1 = subprocess.Popen(cmd, cwd=str(destdir),
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            p1_1.wait(timeout=10)     # 10 seconds
-            if p1_1.returncode and p1_1.returncode not in [5]:
-                # Error
-                _stdout, _stderr = [x.decode('utf-8') for x in p1_1.communicate()]
-                raise RuntimeError(f"[{p1_1.returncode}] Error: {_stderr}")
-
-        ## 2 - Generate Gource log from repository
-        #   `gource --output-custom-log ${LOGFILE} ${TMP_REPO_PATH}`
-        destlog = tempdir_path / 'gource.log'
-        cmd = [get_gource(),
-               '--git-branch', branch,
-               '--output-custom-log', str(destlog),
-               str(destdir)
-        ]
-        p2 = subprocess.Popen(cmd, cwd=str(tempdir_path),
-                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        p2.wait(timeout=10)     # 10 seconds
-        if p2.returncode:
-            # Error
-            _stdout, _stderr = [x.decode('utf-8') for x in p2.communicate()]
-            raise RuntimeError(f"[{p2.returncode}] Error: {_stderr}")
-
-        ## 3 - Retrieve latest commit hash/subject from repo
-        #   `git log` => <HASH>:<SUBJECT>
-        commit_hash = None
-        commit_subject = None
-        cmd = [get_git(), 'log',
-               '--pretty=format:%H:%s',
-               '-n', '1'
-        ]
-        destdir_git = destdir / '.git'
-        p3 = subprocess.Popen(cmd, cwd=str(tempdir_path), env={'GIT_DIR': str(destdir_git)},
-                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        p3.wait(timeout=5)      # 5 seconds
-        _stdout, _stderr = p3.communicate()
-        if p3.returncode:
-            # Error (log, but make non-fatal)
-            logging.error("Failed to retrieve Git Hash/Subject")
-            logging.error(str(_stderr))
-        else:
-            commit_hash, commit_subject = _stdout.decode('utf-8').split(':', 1)
+        ## 1 - Clone/update local copy of repository (see `git_mirror()`)
+        with git_mirror(url, branch) as destdir:
+            ## 2 - Generate Gource log from repository
+            #   (equivalent to `gource --output-custom-log ${LOGFILE} ${TMP_REPO_PATH}`)
+            destlog = Path(dest_path) if dest_path else tempdir_path / 'gource.log'
+            log_digest = write_git_gource_log(destdir, destlog, branch=branch, log_stats=log_stats)
+
+            ## 3 - Retrieve latest commit hash/subject from repo
+            #   `git log` => <HASH>:<SUBJECT>
+            commit_hash = None
+            commit_subject = None
+            cmd = [get_git(), 'log',
+                   '--pretty=format:%H:%s',
+                   '-n', '1',
+                   f'refs/heads/{branch}'
+            ]
+            destdir_git = destdir / '.git'
+            p3 = subprocess.Popen(cmd, cwd=str(tempdir_path), env={'GIT_DIR': str(destdir_git)},
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            p3.wait(timeout=5)      # 5 seconds
+            _stdout, _stderr = p3.communicate()
+            if p3.returncode:
+                # Error (log, but make non-fatal)
+                logging.error("Failed to retrieve Git Hash/Subject")
+                logging.error(str(_stderr))
+            else:
+                commit_hash, commit_subject = _stdout.decode('utf-8').split(':', 1)
 
-        ## 4 - Retrieve list of tags
-        tags_list = []
-        try:
-            tags_list = retrieve_tags_from_git_repo(destdir_git)
-        except Exception as e:
-            logging.error("Error retrieving tags from Git repo: ", str(e))
+            ## 4 - Retrieve list of tags
+            tags_list = []
+            try:
+                tags_list = retrieve_tags_from_git_repo(destdir_git, branch=branch)
+            except Exception as e:
+                logging.error("Error retrieving tags from Git repo: ", str(e))
 
         # Return result
-        with destlog.open() as _file:
+        if dest_path:
+            return log_digest, commit_hash, commit_subject, tags_list
+        with destlog.open(encoding='utf-8') as _file:
             data = _file.read()
         return data, commit_hash, commit_subject, tags_list
 
@@ -275,44 +624,227 @@ def download_git_log(url, branch="master"):
     raise RuntimeError("Unexpected end")
 
 
-def download_git_tags(url, branch="master"):
+def download_hg_log(url, branch="default", log_stats=None, dest_path=None):
     """
-    Retrieve list of tags from Git repository URL.
+    Generate Gource log from Mercurial repository URL.
 
-    Returns [(timestamp, name)]
+    Same as `download_git_log()` (including `dest_path`), using a local
+    clone kept up to date with `hg pull` (see `hg_mirror()`).
+
+    Returns (log_data, latest_hash, latest_subject, tags_list)
     """
     if not re.match(r'https?:\/\/', url):
         raise ValueError("URL must be a valid HTTP resource")
 
     tempdir = tempfile.mkdtemp(prefix="gource_")
     try:
-        tempdir_path = Path(tempdir)
-        destdir = tempdir_path / 'vcs_source'
-        ## 1 - Clone repository locally (as minimal as possible)
-        cmd = [get_git(), 'clone', '--quiet', '--filter=blob:none', '--no-checkout',
-               '--single-branch',
-               '--branch', branch,
-               url, str(destdir)]
-        p1 = subprocess.Popen(cmd, cwd=str(tempdir_path),
-                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        p1.wait(timeout=60)     # 60 seconds
-        if p1.returncode:
-            # Error
-            _stdout, _stderr = [x.decode('utf-8') for x in p1.communicate()]
-            raise RuntimeError(f"[{p1.returncode}] Error: {_stderr}")
+        destlog = Path(dest_path) if dest_path else Path(tempdir) / 'gource.log'
+        ## 1 - Clone/update local copy of repository (see `hg_mirror()`)
+        with hg_mirror(url, branch) as destdir:
+            ## 2 - Generate Gource log from repository
+            log_digest = write_git_gource_log(destdir, destlog, branch=branch, log_stats=log_stats, vcs='hg')
+
+            ## 3 - Retrieve latest changeset hash/subject of branch
+            commit_hash = None
+            commit_subject = None
+            try:
+                output = _run_hg(['log', '--rev', f"max(branch({_quote_hg_revset(branch)}))",
+                                  '--template', '{node}:{desc|firstline}'],
+                                 cwd=str(destdir), timeout=10)
+                if output:
+                    commit_hash, commit_subject = output.split(':', 1)
+            except Exception:
+                # Error (log, but make non-fatal)
+                logging.exception("Failed to retrieve Mercurial Hash/Subject")
+
+            ## 4 - Retrieve list of tags
+            tags_list = []
+            try:
+                tags_list = retrieve_tags_from_hg_repo(destdir, branch=branch)
+            except Exception as e:
+                logging.error("Error retrieving tags from Mercurial repo: %s", str(e))
 
-        return retrieve_tags_from_git_repo(str(destdir))
+        # Return result
+        if dest_path:
+            return log_digest, commit_hash, commit_subject, tags_list
+        with destlog.open(encoding='utf-8') as _file:
+            data = _file.read()
+        return data, commit_hash, commit_subject, tags_list
 
     finally:
         shutil.rmtree(tempdir)
 
-    raise RuntimeError("Unexpected end")
 
+def download_vcs_log(url, branch="master", log_stats=None, vcs="git", dest_path=None):
+    """
+    Generate Gource log from VCS repository URL (`vcs` is "git" or "hg").
+
+    Returns (log_data, latest_hash, latest_subject, tags_list), see
+    `download_git_log()` for `dest_path`.
+    """
+    if vcs == 'hg':
+        return download_hg_log(url, branch=branch, log_stats=log_stats, dest_path=dest_path)
+    if vcs == 'git':
+        return download_git_log(url, branch=branch, log_stats=log_stats, dest_path=dest_path)
+    raise ValueError(f"Unsupported VCS: {vcs}")
+
+
+def get_git_remote_head(url, branch="master"):
+    """
+    Return latest commit hash of `branch` in remote Git repository `url`
+    (or None if branch does not exist).
 
-def retrieve_tags_from_git_repo(repo_path):
+    Uses `git ls-remote`, so no objects are downloaded.
+    """
+    if not re.match(r'https?:\/\/', url):
+        raise ValueError("URL must be a valid HTTP resource")
+
+    ref = f'refs/heads/{branch}'
+    for line in _run_git(['ls-remote', '--heads', url, ref], timeout=30).splitlines():
+        commit_hash, _, line_ref = line.partition('\t')
+        if line_ref == ref:
+            return commit_hash
+    return None
+
+
+def get_hg_remote_head(url, branch="default"):
+    """
+    Return latest changeset hash of `branch` in remote Mercurial repository
+    `url` (or None if branch does not exist).
+
+    Uses `hg identify`, so no changesets are downloaded.
+    """
+    if not re.match(r'https?:\/\/', url):
+        raise ValueError("URL must be a valid HTTP resource")
+
+    try:
+        # `--debug` displays full hash (along with other debug messages)
+        output = _run_hg(['identify', '--debug', '--id', '--rev', branch, url], timeout=30)
+    except RuntimeError as e:
+        if 'unknown revision' in str(e):
+            return None
+        raise
+    for line in output.splitlines():
+        if re.match(r'^[0-9a-f]{40}$', line.strip()):
+            return line.strip()
+    return None
+
+
+def get_vcs_remote_head(url, branch="master", vcs="git"):
+    "Return latest commit hash of `branch` in remote VCS repository `url` (see `get_git_remote_head()`)."
+    if vcs == 'hg':
+        return get_hg_remote_head(url, branch=branch)
+    if vcs == 'git':
+        return get_git_remote_head(url, branch=branch)
+    raise ValueError(f"Unsupported VCS: {vcs}")
+
+
+@functools.lru_cache(maxsize=None)
+def _check_shared_cache():
+    # Warn (once) if Django cache is not shared between processes (see `CACHES`)
+    backend = caches['default']
+    if isinstance(backend, (DummyCache, LocMemCache)):
+        logging.warning("Django cache backend (%s) is not shared between processes; "
+                        "per-host limits only apply within each worker process", type(backend).__name__)
+
+
+@contextlib.contextmanager
+def host_slot(host, limit=None, timeout=600):
+    """
+    Context manager claiming one of `limit` concurrent slots for remote
+    `host` (shared between workers using Django cache, so `CACHES` must
+    not be process-local).
+
+    Yields True if a slot was claimed (or `limit` is None), False if all
+    slots are in use.  Slots expire after `timeout` seconds in case a
+    worker dies while holding one.
+
+        with host_slot('github.com', limit=2) as acquired:
+            if not acquired:
+                # Retry later
+    """
+    if not limit:
+        yield True
+        return
+    _check_shared_cache()
+    for index in range(limit):
+        slot_key = f'host_slot:{host}:{index}'
+        if cache.add(slot_key, 1, timeout):
+            try:
+                yield True
+            finally:
+                cache.delete(slot_key)
+            return
+    yield False
+
+
+def download_git_tags(url, branch="master"):
+    """
+    Retrieve list of tags from Git repository URL.
+
+    Tags of a cached snapshot (see `download_git_snapshot()`) are reused if
+    available, otherwise they are listed from a local clone (see
+    `git_mirror()`), without generating the Gource log.
+
+    Returns [(timestamp, name)]
+    """
+    if getattr(django_settings, 'VCS_SNAPSHOT_CACHE_TIMEOUT', 0):
+        cached = cache.get(_get_snapshot_cache_key(url, branch))
+        if cached is not None:
+            return cached[3]
+    with git_mirror(url, branch) as repo_path:
+        return retrieve_tags_from_git_repo(str(repo_path), branch=branch)
+
+
+VcsSnapshot = collections.namedtuple('VcsSnapshot', ['log_data', 'commit_hash', 'commit_subject', 'tags', 'log_stats'])
+
+def download_git_snapshot(url, branch="master", cache_timeout=None, vcs="git", refresh=False):
+    """
+    Retrieve Gource log, latest commit and tags from Git repository URL
+    using a single clone/fetch (see `download_git_log()`).
+
+    Use `vcs="hg"` for a Mercurial repository (see `download_hg_log()`).
+
+    Results are cached for `cache_timeout` seconds (default:
+    `VCS_SNAPSHOT_CACHE_TIMEOUT`), so back-to-back operations on the same
+    repository/branch reuse the same snapshot.  Use `refresh=True` to force a
+    new download (still cached for later use), or `cache_timeout=0` to skip
+    the cache entirely.
+
+    Returns VcsSnapshot(log_data, commit_hash, commit_subject, tags, log_stats)
+    """
+    if cache_timeout is None:
+        cache_timeout = getattr(django_settings, 'VCS_SNAPSHOT_CACHE_TIMEOUT', 0)
+    cache_key = _get_snapshot_cache_key(url, branch, vcs)
+    if cache_timeout and not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            log_data, commit_hash, commit_subject, tags, log_stats = cached
+            return VcsSnapshot(gzip.decompress(log_data).decode('utf-8'), commit_hash, commit_subject, tags,
+                               GourceLogStats.from_dict(log_stats))
+
+    log_stats = GourceLogStats()
+    snapshot = VcsSnapshot(*download_vcs_log(url, branch=branch, log_stats=log_stats, vcs=vcs), log_stats)
+    if cache_timeout:
+        # Store log compressed (may be several MB for large projects)
+        cache.set(cache_key, (compress_gource_log(snapshot.log_data.encode('utf-8')),) + tuple(snapshot[1:4])
+                             + (log_stats.to_dict(),), cache_timeout)
+    return snapshot
+
+
+def _get_snapshot_cache_key(url, branch, vcs="git"):
+    cache_key = 'vcs_snapshot:' + hashlib.sha256(f'{url}#{branch}'.encode('utf-8')).hexdigest()
+    if vcs != 'git':
+        cache_key += f':{vcs}'
+    return cache_key
+
+
+def retrieve_tags_from_git_repo(repo_path, branch=None):
     """
     Retrieve list of tags from a local Git repository folder.
 
+    If `branch` is given, only tags reachable from it are included.
+
     Returns [(timestamp, name)]
     """
     if not os.path.isdir(repo_path):
@@ -322,6 +854,8 @@ def retrieve_tags_from_git_repo(repo_path):
     cmd = [get_git(), 'tag',
            '--list',
            '--format=%(creatordate:iso8601)|%(refname:short)']
+    if branch:
+        cmd += ['--merged', f'refs/heads/{branch}']
     p1 = subprocess.Popen(cmd, cwd=repo_path,
                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     p1.wait(timeout=60)
@@ -343,13 +877,77 @@ def retrieve_tags_from_git_repo(repo_path):
     return tags_list
 
 
-def generate_gource_video(log_data, *, video_size='1280x720', framerate=60, avatars=None, default_avatar=None, captions=None, logo_file=None, background_file=None, gource_options=None, project_build=None, output_path=None, skip_video_size_defaults=False):
+def retrieve_tags_from_hg_repo(repo_path, branch=None):
+    """
+    Retrieve list of tags from a local Mercurial repository folder
+    (using date of tagged changeset).
+
+    If `branch` is given, only tags on ancestors of its head are included.
+
+    Returns [(timestamp, name)]
+    """
+    if not os.path.isdir(repo_path):
+        raise ValueError(f"Invalid Mercurial repo path: {repo_path}")
+
+    revset = f"tag() and ::branch({_quote_hg_revset(branch)})" if branch else "tag()"
+    tags_output = _run_hg(['log', '--rev', revset,
+                           '--template', "{tags % '{date|hgdate}|{tag}\\n'}"],
+                          cwd=str(repo_path))
+    tags_list = []
+    for line in tags_output.strip().split('\n'):
+        if not line:
+            continue
+        timestamp, _, tag_name = line.partition('|')
+        if tag_name == 'tip':
+            continue
+        # "<UNIXTIME> <OFFSET>" (offset in seconds west of UTC)
+        unixtime, offset = [int(x) for x in timestamp.split()]
+        tags_list.append(
+            (datetime.fromtimestamp(unixtime, tz=timezone(timedelta(seconds=-offset))), tag_name)
+        )
+    return tags_list
+
+
+def generate_gource_video(log_data, *, video_size='1280x720', framerate=60, avatars=None, default_avatar=None, captions=None, logo_file=None, background_file=None, gource_options=None, project_build=None, output_path=None, skip_video_size_defaults=False, log_index=None, segments=None, work_dir=None, base_video=None, base_log_size=None, encoder_profile=None, background_audio=None, estimated_duration=None):
     """
     Create a new Gource video using provided options.
+
+    `log_data` may be the Gource log contents or a `pathlib.Path` to it.
+    When a path is given, only the part of the log covered by date/position
+    options is passed to Gource (optionally using a prebuilt `log_index`).
+
+    If `segments` (default: `GOURCE_RENDER_SEGMENTS` setting) is more than 1,
+    the timeline is split into time windows rendered concurrently, which are
+    then joined without re-encoding (see `write_gource_log_segments()`).
+
+    If `work_dir` is given, segments (and a manifest, see
+    `load_render_manifest()`) are kept there, with renders also split into
+    checkpoints of `GOURCE_CHECKPOINT_SECONDS`.  Calling again with the same
+    `work_dir` and inputs (e.g. after a worker restart) only renders the
+    segments not completed yet.
+
+    If `base_video` is given (video rendered by the same options from the
+    first `base_log_size` bytes of this log), only the entries after it are
+    rendered, then appended to its video stream (see `write_gource_log_increment()`).
+
+    Video is encoded using `encoder_profile` (default: "standard", see
+    `get_encoder_profile()`).
+
+    If `background_audio` (MP3) is given, it is looped over the video.  For
+    single segment renders, audio is added by the same FFmpeg process that
+    encodes the video, fading out at the `estimated_duration` (seconds) of
+    the video.  Otherwise (or if that render fails), it is added after
+    joining the segments (see `add_background_audio()`), keeping the video
+    without audio if mixing fails.
     """
     # Input validation
     if video_size not in [n[0] for n in VIDEO_OPTIONS]:
         raise ValueError(f'Invalid video size: {video_size}')
+    encoder_settings = get_encoder_profile(encoder_profile)
+
+    if background_audio is not None:
+        if not os.path.isfile(background_audio):
+            raise ValueError(f"Path to 'background_audio' file not found: {background_audio}")
 
     gource_options = gource_options if gource_options else {}
     if not isinstance(gource_options, dict):
@@ -373,150 +971,180 @@ def generate_gource_video(log_data, *, video_size='1280x720', framerate=60, avat
     print(f"VIDEO TEMPDIR = {tempdir}")
     try:
         tempdir_path = Path(tempdir)
-        log_path = tempdir_path / 'gource.log'
+        render_dir = Path(work_dir) if work_dir else tempdir_path
+        os.makedirs(render_dir, exist_ok=True)
+        log_path = render_dir / 'gource.log'
         # Write log file to disk
-        with log_path.open('a') as f:
-            f.write(log_data)
-        # Use FIFO (named pipe) to pipe Gource PPM output to FFmpeg
-        # and run both processes simultaneously
-        fifo_path = tempdir_path / 'gource.fifo'
-        os.mkfifo(str(fifo_path), 0o666)
+        if isinstance(log_data, os.PathLike):
+            gource_options = write_gource_log_slice(log_data, log_path, gource_options, log_index=log_index)
+        else:
+            with log_path.open('w') as f:
+                f.write(log_data)
 
         if django_settings.DEBUG:
             p0_output = subprocess.check_output([get_gource(), '--help'])
             gource_version = re.search(r'Gource (v0\.\d\d)', p0_output.decode('utf-8')).group(1)
             print(f" ~ Using Gource {gource_version}")
 
-        ## 1 - Generate PPM video file from Gource
-        cmd = [get_gource(),
-               # General video options
-               '--stop-at-end',
-               '--no-vsync',
-               #'--disable-input',
-        ]
-
-        # - Add custom settings
-        for option_name, option_value in gource_options.items():
-            cmd += [f'--{option_name}', option_value]
-
-        # - Add avatar settings (if provided)
-        if avatars:
-            cmd += ['--user-image-dir', avatars]
-        if default_avatar:
-            cmd += ['--default-user-image', default_avatar]
-        # - Add captions file
-        if captions:
-            cmd += ['--caption-file', captions]
-
-        # - Add logo/background files
-        if logo_file:
-            cmd += ['--logo', logo_file]
-        if background_file:
-            cmd += ['--background-image', background_file]
-
-        # - Add resolution options
-        cmd += [f'-{video_size}',
-                '--output-framerate', str(framerate),
-                '--output-ppm-stream', str(fifo_path),
-                str(log_path),  # NOTE: must be last argument
-        ]
+        # Split timeline into windows to render concurrently (optional)
+        # - With a `work_dir`, renders are also split into checkpoints, and
+        #   windows rendered by an earlier (interrupted) attempt are reused
+        max_running = get_gource_render_segments(segments)
+        manifest = None
+        if work_dir:
+            manifest_key = hashlib.sha256(json.dumps({
+                'log': get_file_sha256(log_path),
+                'gource_options': gource_options,
+                'video_size': video_size,
+                'framerate': framerate,
+                'segments': max_running,
+                'encoder': encoder_settings,
+                'base_video': str(base_video) if base_video else None,
+                'base_log_size': base_log_size,
+            }, sort_keys=True).encode('utf-8')).hexdigest()
+            manifest = load_render_manifest(render_dir, manifest_key)
+            if manifest is not None:
+                print(f" ~ Resuming render ({sum(1 for seg in manifest['segments'] if seg['completed'])}"
+                      f"/{len(manifest['segments'])} segments completed)")
+        if manifest is None:
+            if work_dir:
+                # Start over (discard output of earlier attempt)
+                for entry in os.scandir(render_dir):
+                    if entry.is_dir() and entry.name.startswith('segment.'):
+                        shutil.rmtree(entry.path)
+            log_segments = [GourceLogSegment(log_path, gource_options, 0)]
+            checkpoint_duration = getattr(django_settings, 'GOURCE_CHECKPOINT_SECONDS', None) if work_dir else None
+            if base_video:
+                # Only render entries added since `base_video`
+                log_increment = write_gource_log_increment(log_path, render_dir / 'gource.increment.log',
+                                                           base_log_size, gource_options)
+                if log_increment is None:
+                    raise ValueError("No new log entries to append to base video")
+                log_segments = [log_increment]
+            elif max_running > 1 or checkpoint_duration:
+                log_segments = write_gource_log_segments(log_path, render_dir, max_running, gource_options,
+                                                         max_duration=checkpoint_duration)
+            # Add background audio while encoding video (single segment only)
+            # - Audio of joined segments is added afterwards (video stream copied)
+            # - Decision and fade out time are kept, so a resumed render matches
+            #   (even if the duration estimate has changed since)
+            audio_duration = None
+            if background_audio and estimated_duration and not base_video and len(log_segments) == 1:
+                audio_duration = estimated_duration
+            manifest = {
+                'key': manifest_key if work_dir else None,
+                'audio_duration': audio_duration,
+                'segments': [
+                    {'log': os.path.relpath(log_segment.log_path, render_dir),
+                     'gource_options': log_segment.gource_options,
+                     'preroll_seconds': log_segment.preroll_seconds,
+                     'video': f'segment.{index}/output.mp4',
+                     'completed': False}
+                    for index, log_segment in enumerate(log_segments)
+                ],
+            }
+            if work_dir:
+                save_render_manifest(render_dir, manifest)
+        if len(manifest['segments']) > 1:
+            print(f" ~ Rendering {len(manifest['segments'])} segment(s)")
+
+        audio_settings = None
+        if background_audio and manifest.get('audio_duration'):
+            audio_settings = (str(background_audio), manifest['audio_duration'])
+
+        def _start_segment(index):
+            segment = manifest['segments'][index]
+            segment_path = render_dir / f'segment.{index}'
+            shutil.rmtree(segment_path, ignore_errors=True)
+            segment_path.mkdir()
+            return _start_gource_render(
+                render_dir / segment['log'], segment_path, segment['gource_options'],
+                video_size=video_size, framerate=framerate, avatars=avatars,
+                default_avatar=default_avatar, captions=captions, logo_file=logo_file,
+                background_file=background_file, encoder_settings=encoder_settings,
+                audio_settings=audio_settings,
+                skip_frames=round(segment['preroll_seconds'] * framerate)
+            )
+
+        def _segment_completed(index):
+            manifest['segments'][index]['completed'] = True
+            if work_dir:
+                save_render_manifest(render_dir, manifest)
+
+        def _run_renders():
+            _run_gource_renders(
+                [index for index, segment in enumerate(manifest['segments'])
+                 if not segment['completed'] or not os.path.isfile(render_dir / segment['video'])],
+                _start_segment, max_running=max_running, on_complete=_segment_completed,
+                project_build=project_build
+            )
 
-        #####################################################################
-        # If configured, run with `xvfb-run` (X11 Virtual Frame Buffer)
-        #####################################################################
-        gource_display = ''
-        if hasattr(django_settings, 'USE_XVFB') and django_settings.USE_XVFB:
+        try:
+            _run_renders()
+        except RuntimeError:
+            if not audio_settings:
+                raise
+            # Audio may not be decodable (e.g. invalid MP3), so render video
+            # only and mix audio afterwards (keeping silent video on failure)
+            logging.exception("Failed to render video with background audio, retrying without it")
+            audio_settings = None
+            manifest['audio_duration'] = None
+            if work_dir:
+                save_render_manifest(render_dir, manifest)
+            _run_renders()
+
+        segment_videos = [render_dir / segment['video'] for segment in manifest['segments']]
+        if base_video:
+            ## 3 - Extract video stream of base video (without audio)
+            segment_videos.insert(0, tempdir_path / 'base.mp4')
+            cmd = [get_ffmpeg(), '-y',
+                   '-i', str(base_video),
+                   '-map', '0:v:0',
+                   '-c', 'copy',
+                   str(segment_videos[0])
+            ]
+            logging.info("[STEP 3] %s", cmd)
+            p3 = subprocess.run(cmd, cwd=str(tempdir_path), timeout=FFMPEG_TIMEOUT,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if p3.returncode:
+                raise RuntimeError(f"[{p3.returncode}] Error extracting base video: {p3.stderr.decode('utf-8')}")
+        dest_video = segment_videos[0]
+        if len(segment_videos) > 1:
+            ## 4 - Join segments (same encoding settings, so streams are copied as-is)
+            print(f" ~ Joining {len(segment_videos)} segments")
+            concat_path = tempdir_path / 'segments.txt'
+            with concat_path.open('w') as f:
+                for segment_video in segment_videos:
+                    f.write(f"file '{segment_video}'\n")
+            dest_video = tempdir_path / 'output.mp4'
+            cmd = [get_ffmpeg(), '-y',
+                   '-f', 'concat',
+                   '-safe', '0',
+                   '-i', str(concat_path),
+                   '-c', 'copy',
+                   str(dest_video)
+            ]
+            logging.info("[STEP 4] %s", cmd)
+            p3 = subprocess.run(cmd, cwd=str(tempdir_path), timeout=FFMPEG_TIMEOUT,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if p3.returncode:
+                raise RuntimeError(f"[{p3.returncode}] Error joining segments: {p3.stderr.decode('utf-8')}")
+
+        if background_audio and not audio_settings:
+            ## 5 - Add background audio
             try:
-                xvfb_run = get_xvfb_run()
-                # Prepend `gource` execution with `xvfb-run` command
-                # NOTE: always run at 24 framerate, even if Gource intends to render higher
-                cmd = [xvfb_run,
-                       "--auto-servernum",
-                       "--server-args=-screen 0, {0}x24".format(video_size)] + cmd
-                gource_display = ' (XVFB)'
-            except:
-                pass
-        #####################################################################
-
-        start_time = time.monotonic()
-        print(f" ~ Starting Gource{gource_display}")
-        p1 = subprocess.Popen(cmd, cwd=str(tempdir_path),
-                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        logging.info("[STEP 1] %s", p1.args)
-        #p1.wait(timeout=GOURCE_TIMEOUT)
-        time.sleep(1)   # Wait a short time for Gource to get started
-        p1.poll()
-        if p1.returncode is not None:
-            # Error
-            print(" ~ Gource command error - exiting...")
-            _stdout, _stderr = [x.decode('utf-8') for x in p1.communicate()]
-            raise RuntimeError(f"[{p1.returncode}] Stdout: {_stdout}, Error: {_stderr}")
-
-        ## 2 - Generate video using ffmpeg
-        print(f" ~ Starting ffmpeg encoding")
-        dest_video = tempdir_path / 'output.mp4'
-        cmd = [get_ffmpeg(),
-               '-y',
-               '-r', str(framerate),
-               '-f', 'image2pipe',
-               '-vcodec', 'ppm',
-               '-i', str(fifo_path),
-               '-vcodec', 'libx264',
-               '-pix_fmt', 'yuv420p',       # * Change to chroma subsampling 4:2:0 YUV
-               '-crf', '23',
-               str(dest_video)
-        ]
-        # * - The chroma subsampling default for FFmpeg (Planar 4:4:4 YUV) will not play in
-        #     some browsers that do support H.264, notably Firefox.
-        #     Changing to an alternate 4:2:0 value found in H.26x standards seems to work better,
-        #     even though it is technically lower quality.
-
-        # Direct FFmpeg stdout/stderr to file to avoid halting due to filled I/O buffer
-        # - On long running videos, can cause process to halt waiting for output to be read
-        ffmpeg_start = time.monotonic()
-        with open(str(tempdir_path / 'ffmpeg.stdout'), 'w') as ffout:
-            with open(str(tempdir_path / 'ffmpeg.stderr'), 'w') as fferr:
-                p2 = subprocess.Popen(cmd, cwd=str(tempdir_path),
-                                      stdout=ffout, stderr=fferr)
-                                      #stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                logging.info("[STEP 2] %s", p2.args)
-                while p2.returncode is None and (time.monotonic() - ffmpeg_start) < FFMPEG_TIMEOUT:
-                    # Periodically check if task was aborted
-                    if project_build is not None:
-                        project_build.refresh_from_db()
-                        if project_build.status == 'aborted':
-                            p2.terminate()
-                            p1.terminate()
-                            raise ProjectBuildAbortedError()
-                    try:
-                        p2.wait(timeout=5)
-                        if p2.returncode is not None and p2.returncode:
-                            # Error
-                            print(" ~ FFmpeg command error - exiting...")
-                            #_stdout, _stderr = [x.decode('utf-8') for x in p2.communicate()]
-                            #raise RuntimeError(f"[{p2.returncode}] Error: {_stderr}")
-                            try:
-                                # Print relevant 'gource' process output as well
-                                p1.wait(timeout=5)
-                                if p1.returncode:
-                                    print(" ~ Gource command error - exiting...")
-                                    _stdout, _stderr = [x.decode('utf-8') for x in p1.communicate()]
-                                    print(f" ~~~ GOURCE: [{p1.returncode}] -> Stdout: {_stdout}, Error: {_stderr}")
-                            except:
-                                pass
-                            raise RuntimeError(f"[{p2.returncode}] Error during FFmpeg conversion")
-                    except subprocess.TimeoutExpired:
-                        pass
-
-                if p2.returncode is None:
-                    if project_build is not None:
-                        raise RuntimeError(f"Project video timeout elapsed [Build={project_build.id}]")
-                    else:
-                        raise RuntimeError("Project video timeout elapsed")
+                dest_video = add_background_audio(str(dest_video), str(background_audio), loop=True,
+                                                  output_path=str(tempdir_path / 'output_audio.mp4'))
+            except Exception:
+                logging.exception("Failed to mix background audio")
 
         if not output_path:
             output_path = f'/tmp/{int(time.time())}.mp4'
-        shutil.move(str(dest_video), output_path)
+        if work_dir and len(segment_videos) == 1 and dest_video == segment_videos[0]:
+            # Keep checkpoint (until work directory is removed)
+            shutil.copyfile(str(dest_video), output_path)
+        else:
+            shutil.move(str(dest_video), output_path)
         print(f"+ Final video: {output_path}")
         return output_path
 
@@ -526,11 +1154,418 @@ def generate_gource_video(log_data, *, video_size='1280x720', framerate=60, avat
     raise RuntimeError("Unexpected end")
 
 
-def add_background_audio(video_path, audio_path, loop=True, output_path=None):
+def _start_gource_render(log_path, workdir, gource_options, *, video_size, framerate, avatars=None, default_avatar=None, captions=None, logo_file=None, background_file=None, encoder_settings=None, audio_settings=None, skip_frames=0):
+    """
+    Start Gource (rendering `log_path`) piping its PPM output into FFmpeg,
+    with both processes running in `workdir`.
+
+    Video is encoded using `encoder_settings` (see `get_encoder_profile()`).
+
+    If `audio_settings` (audio path, estimated video duration) is given, the
+    audio is looped until the video ends and faded out at the estimated end.
+
+    The first `skip_frames` frames are dropped from the encoded video.
+
+    Frames are passed as PPM images ("ppm"), or as raw RGB frames stripped
+    of their PPM headers by a background thread ("rawvideo"), depending on
+    `get_gource_pipe_format()`.
+
+    Returns (gource_process, ffmpeg_process, video_path)
+    """
+    pipe_format = get_gource_pipe_format(video_size)
+    if pipe_format == 'rawvideo':
+        # Gource writes to (inherited) pipe, read by `_pipe_ppm_frames()`
+        frames_read, frames_write = os.pipe()
+        ppm_output = f'/dev/fd/{frames_write}'
+        pass_fds = (frames_write,)
+    else:
+        # Use FIFO (named pipe) to pipe Gource PPM output to FFmpeg
+        # and run both processes simultaneously
+        fifo_path = workdir / 'gource.fifo'
+        os.mkfifo(str(fifo_path), 0o666)
+        ppm_output = str(fifo_path)
+        pass_fds = ()
+
+    ## 1 - Generate PPM video file from Gource
+    cmd = [get_gource(),
+           # General video options
+           '--stop-at-end',
+           '--no-vsync',
+           #'--disable-input',
+    ]
+
+    # - Add custom settings
+    for option_name, option_value in gource_options.items():
+        cmd += [f'--{option_name}', option_value]
+
+    # - Add avatar settings (if provided)
+    if avatars:
+        cmd += ['--user-image-dir', avatars]
+    if default_avatar:
+        cmd += ['--default-user-image', default_avatar]
+    # - Add captions file
+    if captions:
+        cmd += ['--caption-file', captions]
+
+    # - Add logo/background files
+    if logo_file:
+        cmd += ['--logo', logo_file]
+    if background_file:
+        cmd += ['--background-image', background_file]
+
+    # - Add resolution options
+    cmd += [f'-{video_size}',
+            '--output-framerate', str(framerate),
+            '--output-ppm-stream', ppm_output,
+            str(log_path),  # NOTE: must be last argument
+    ]
+
+    #####################################################################
+    # If configured, run with `xvfb-run` (X11 Virtual Frame Buffer)
+    # - Each render uses its own display (`--auto-servernum`)
+    #####################################################################
+    gource_display = ''
+    if hasattr(django_settings, 'USE_XVFB') and django_settings.USE_XVFB:
+        try:
+            xvfb_run = get_xvfb_run()
+            # Prepend `gource` execution with `xvfb-run` command
+            # NOTE: always run at 24 framerate, even if Gource intends to render higher
+            cmd = [xvfb_run,
+                   "--auto-servernum",
+                   "--server-args=-screen 0, {0}x24".format(video_size)] + cmd
+            gource_display = ' (XVFB)'
+        except:
+            pass
+    #####################################################################
+
+    print(f" ~ Starting Gource{gource_display}")
+    try:
+        p1 = subprocess.Popen(cmd, cwd=str(workdir), pass_fds=pass_fds,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    finally:
+        if pass_fds:
+            os.close(frames_write)  # Only Gource keeps write end open
+    logging.info("[STEP 1] %s", p1.args)
+    #p1.wait(timeout=GOURCE_TIMEOUT)
+    time.sleep(1)   # Wait a short time for Gource to get started (and claim its display)
+    p1.poll()
+    if p1.returncode is not None:
+        # Error
+        print(" ~ Gource command error - exiting...")
+        if pass_fds:
+            os.close(frames_read)
+        _stdout, _stderr = [x.decode('utf-8') for x in p1.communicate()]
+        raise RuntimeError(f"[{p1.returncode}] Stdout: {_stdout}, Error: {_stderr}")
+
+    ## 2 - Generate video using ffmpeg
+    print(f" ~ Starting ffmpeg encoding")
+    dest_video = workdir / 'output.mp4'
+    cmd = [get_ffmpeg(), '-y'] + get_ffmpeg_pipe_input_args(
+        pipe_format, video_size, framerate, '-' if pipe_format == 'rawvideo' else ppm_output
+    )
+    if audio_settings:
+        # NOTE: Requires `ffmpeg` newer than 2017-11 to fix 'stream_loop' bug
+        audio_path, estimated_duration = audio_settings
+        fade_duration = min(AUDIO_FADE_SECONDS, estimated_duration)
+        cmd += ['-stream_loop', '-1',
+                '-i', audio_path,
+                '-map', '0:v:0',
+                '-map', '1:a:0',
+                '-af', f'afade=t=out:st={estimated_duration - fade_duration:.3f}:d={fade_duration:.3f}',
+                '-c:a', 'aac',
+                '-shortest']
+    if skip_frames:
+        # Drop pre-roll frames (see `write_gource_log_segments()`)
+        cmd += ['-vf', f'trim=start_frame={skip_frames},setpts=PTS-STARTPTS']
+    cmd += get_ffmpeg_encoder_args(encoder_settings or get_encoder_profile(), framerate)
+    cmd += [str(dest_video)]
+
+    # Direct FFmpeg stdout/stderr to file to avoid halting due to filled I/O buffer
+    # - On long running videos, can cause process to halt waiting for output to be read
+    with open(str(workdir / 'ffmpeg.stdout'), 'w') as ffout:
+        with open(str(workdir / 'ffmpeg.stderr'), 'w') as fferr:
+            p2 = subprocess.Popen(cmd, cwd=str(workdir),
+                                  stdin=subprocess.PIPE if pipe_format == 'rawvideo' else None,
+                                  stdout=ffout, stderr=fferr)
+                                  #stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    logging.info("[STEP 2] %s", p2.args)
+    if pipe_format == 'rawvideo':
+        width, height = [int(n) for n in video_size.split('x')]
+        threading.Thread(target=_pipe_ppm_frames, args=(os.fdopen(frames_read, 'rb'), p2, width, height),
+                         name=f"ppm-pipe-{p2.pid}", daemon=True).start()
+    return p1, p2, dest_video
+
+
+def get_encoder_profile(name=None):
+    """
+    Return FFmpeg encoder settings of profile `name` (default: "standard"):
+
+        {"preset", "crf", "threads", "tune", "keyint"}
+
+    Values from `ENCODER_PROFILES` setting ({name: {...}}) replace the
+    defaults of each profile.
+    """
+    name = name or DEFAULT_ENCODER_PROFILE
+    if name not in ENCODER_PROFILES:
+        raise ValueError(f"Invalid encoder profile: {name}")
+    profile = dict(ENCODER_PROFILES[name])
+    profile.update(getattr(django_settings, 'ENCODER_PROFILES', {}).get(name, {}))
+    return profile
+
+
+def get_ffmpeg_encoder_args(encoder_settings, framerate):
+    """
+    Return FFmpeg (libx264) output arguments for `encoder_settings`
+    (see `get_encoder_profile()`).
+    """
+    args = ['-vcodec', 'libx264',
+            '-pix_fmt', 'yuv420p',       # * Change to chroma subsampling 4:2:0 YUV
+            '-preset', str(encoder_settings['preset']),
+            '-crf', str(encoder_settings['crf'])]
+    if encoder_settings.get('tune'):
+        args += ['-tune', str(encoder_settings['tune'])]
+    if encoder_settings.get('keyint'):
+        args += ['-g', str(int(float(encoder_settings['keyint']) * framerate))]
+    if encoder_settings.get('threads') is not None:
+        args += ['-threads', str(encoder_settings['threads'])]
+    # * - The chroma subsampling default for FFmpeg (Planar 4:4:4 YUV) will not play in
+    #     some browsers that do support H.264, notably Firefox.
+    #     Changing to an alternate 4:2:0 value found in H.26x standards seems to work better,
+    #     even though it is technically lower quality.
+    return args
+
+
+GOURCE_PIPE_FORMATS = ('ppm', 'rawvideo')
+
+def get_gource_pipe_format(video_size):
+    """
+    Return format used to pass Gource frames to FFmpeg at `video_size`
+    ("ppm" or "rawvideo", see `_start_gource_render()`).
+
+    `GOURCE_PIPE_FORMAT` setting is either a format, or a mapping of video
+    size to format (missing sizes use "ppm").  Use the `benchmark_pipe_formats`
+    command to compare them.
+    """
+    pipe_format = getattr(django_settings, 'GOURCE_PIPE_FORMAT', 'ppm')
+    if isinstance(pipe_format, dict):
+        pipe_format = pipe_format.get(video_size, 'ppm')
+    if pipe_format not in GOURCE_PIPE_FORMATS:
+        raise ValueError(f"Unsupported Gource pipe format: {pipe_format}")
+    return pipe_format
+
+
+def get_ffmpeg_pipe_input_args(pipe_format, video_size, framerate, source):
+    """
+    Return FFmpeg input arguments to read Gource frames from `source` (path or "-")
+    in `pipe_format` ("ppm" or "rawvideo").
+    """
+    if pipe_format == 'rawvideo':
+        # Headerless frames: size/pixel format must be given up front
+        return ['-f', 'rawvideo',
+                '-pix_fmt', 'rgb24',
+                '-s', video_size,
+                '-r', str(framerate),
+                '-i', source]
+    return ['-r', str(framerate),
+            '-f', 'image2pipe',
+            '-vcodec', 'ppm',
+            '-i', source]
+
+
+def copy_ppm_frames(src, dst, width, height):
+    """
+    Copy pixel data of binary PPM (P6) frames, as written by Gource
+    `--output-ppm-stream`, from `src` to `dst` as raw RGB24 frames.
+
+    Frames are read into a single reused buffer (`readinto()`) and written
+    from a `memoryview` of it, so pixel data is never copied in Python.
+
+    Returns number of frames copied.  Raises `ValueError` on an invalid or
+    truncated frame, or one not matching `width`x`height`.
+    """
+    frame = bytearray(width * height * 3)
+    view = memoryview(frame)
+    count = 0
+    while True:
+        size = _read_ppm_header(src)
+        if size is None:
+            return count
+        if size != (width, height):
+            raise ValueError(f"Unexpected PPM frame size: {size[0]}x{size[1]} (expected {width}x{height})")
+        received = 0
+        while received < len(frame):
+            n = src.readinto(view[received:])
+            if not n:
+                raise ValueError(f"Truncated PPM frame (frame {count + 1})")
+            received += n
+        dst.write(view)
+        count += 1
+
+
+def _read_ppm_header(src):
+    # Return (width, height) from next PPM header, or None at end of stream
+    # - Gource writes "P6\n{width} {height}\n255\n" (no comments)
+    tokens = []
+    while len(tokens) < 4:
+        line = src.readline(64)
+        if not line:
+            if tokens:
+                raise ValueError("Truncated PPM header")
+            return None
+        tokens += line.split(b'#', 1)[0].split()
+    if len(tokens) != 4 or tokens[0] != b'P6' or tokens[3] != b'255':
+        raise ValueError(f"Unsupported PPM header: {b' '.join(tokens)!r}")
+    return int(tokens[1]), int(tokens[2])
+
+
+def _pipe_ppm_frames(src, ffmpeg_process, width, height):
+    # Thread target: feed Gource output from `src` to FFmpeg stdin (rawvideo)
+    try:
+        copy_ppm_frames(src, ffmpeg_process.stdin, width, height)
+    except BrokenPipeError:
+        pass    # FFmpeg exited (error reported by `_run_gource_renders()`)
+    except Exception:
+        logging.exception("Failed to pipe Gource frames to FFmpeg")
+        ffmpeg_process.kill()
+    finally:
+        src.close()
+        try:
+            ffmpeg_process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def _run_gource_renders(indexes, start_render, *, max_running=1, on_complete=None, project_build=None):
+    """
+    Run renders of segment `indexes`, with at most `max_running` at the
+    same time, checking periodically if `project_build` was aborted.
+
+    `start_render(index)` starts a render (see `_start_gource_render()`),
+    and `on_complete(index)` is called when its video is encoded.
+
+    Raises `RuntimeError` if any FFmpeg process fails or times out.
+    """
+    ffmpeg_start = time.monotonic()
+    waiting = list(indexes)
+    running = {}    # {index: (p1, p2, video_path)}
+    try:
+        while (waiting or running) and (time.monotonic() - ffmpeg_start) < FFMPEG_TIMEOUT:
+            while waiting and len(running) < max_running:
+                index = waiting.pop(0)
+                running[index] = start_render(index)
+            # Periodically check if task was aborted
+            if project_build is not None:
+                project_build.refresh_from_db()
+                if project_build.status == 'aborted':
+                    raise ProjectBuildAbortedError()
+            for index, (p1, p2, _) in list(running.items()):
+                try:
+                    p2.wait(timeout=5 / len(running))
+                except subprocess.TimeoutExpired:
+                    continue
+                if p2.returncode:
+                    # Error
+                    print(" ~ FFmpeg command error - exiting...")
+                    try:
+                        # Print relevant 'gource' process output as well
+                        p1.wait(timeout=5)
+                        if p1.returncode:
+                            print(" ~ Gource command error - exiting...")
+                            _stdout, _stderr = [x.decode('utf-8') for x in p1.communicate()]
+                            print(f" ~~~ GOURCE: [{p1.returncode}] -> Stdout: {_stdout}, Error: {_stderr}")
+                    except:
+                        pass
+                    raise RuntimeError(f"[{p2.returncode}] Error during FFmpeg conversion")
+                del running[index]
+                if on_complete is not None:
+                    on_complete(index)
+    finally:
+        # Stop remaining processes (on error/abort)
+        for p1, p2, _ in running.values():
+            for process in (p2, p1):
+                if process.poll() is None:
+                    process.terminate()
+
+    if waiting or running:
+        if project_build is not None:
+            raise RuntimeError(f"Project video timeout elapsed [Build={project_build.id}]")
+        else:
+            raise RuntimeError("Project video timeout elapsed")
+
+
+@contextlib.contextmanager
+def try_lock_directory(path):
+    """
+    Context manager taking an exclusive lock on directory `path` (created
+    if needed), without waiting.  Lock is released if the process dies.
+
+    Yields True if the lock was acquired (or `path` is None), False if it
+    is held by another process.
+    """
+    if path is None:
+        yield True
+        return
+    os.makedirs(path, exist_ok=True)
+    with open(Path(path) / '.lock', 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+RENDER_MANIFEST_NAME = 'manifest.json'
+
+def load_render_manifest(work_dir, key=None):
+    """
+    Return render manifest saved in `work_dir` (see `generate_gource_video()`),
+    or None if missing, invalid or not matching `key` (hash of render inputs).
+
+        {
+            "key": "<SHA256>",
+            "segments": [
+                {"log": "gource.0.log", "gource_options": {...}, "preroll_seconds": 0,
+                 "video": "segment.0/output.mp4", "completed": true},
+                ...
+            ]
+        }
+    """
+    try:
+        with open(Path(work_dir) / RENDER_MANIFEST_NAME, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or not manifest.get('segments'):
+        return None
+    if key is not None and manifest.get('key') != key:
+        return None
+    return manifest
+
+
+def save_render_manifest(work_dir, manifest):
+    "Write render `manifest` to `work_dir` (atomically replacing previous)."
+    manifest_path = Path(work_dir) / RENDER_MANIFEST_NAME
+    tmp_path = manifest_path.with_name(f'.{RENDER_MANIFEST_NAME}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+
+def add_background_audio(video_path, audio_path, loop=True, output_path=None, fade_duration=AUDIO_FADE_SECONDS):
     """
     Remix video with provided audio mp3.
 
     If `loop=True`, will loop audio if shorter than video.
+
+    Audio is trimmed to the length of the video and faded out over the last
+    `fade_duration` seconds, in a single FFmpeg pass (video stream is copied
+    as-is, not re-encoded).
     """
     if not os.path.isfile(video_path):
         raise ValueError(f"File not found: {video_path}")
@@ -539,65 +1574,42 @@ def add_background_audio(video_path, audio_path, loop=True, output_path=None):
     elif not audio_path.endswith('.mp3'):
         raise ValueError(f"Audio file must be MP3 format: {audio_path}")
 
+    duration = get_video_duration(video_path)
+
     tempdir = tempfile.mkdtemp(prefix="gource_")
     save_file = None
     try:
         tempdir_path = Path(tempdir)
-        cmd1_out = tempdir_path / 'output_1a.mp4'
+        cmd_out = tempdir_path / 'output_1a.mp4'
 
-        # Loop audio with video until shortest ends
+        # Loop audio with video, trimmed to video length, with audio fade out
         # NOTE: Requires `ffmpeg` newer than 2017-11 to fix 'stream_loop' bug
-        #ffmpeg  -i input.mp4 -stream_loop -1 -i input.mp3 -shortest -map 0:v:0 -map 1:a:0 -y out.mp4
-        cmd1 = [get_ffmpeg(),
-                '-i', video_path,
-                '-stream_loop', '-1',
-                '-i', audio_path,
-                '-shortest',
+        #ffmpeg -i input.mp4 -stream_loop -1 -i input.mp3 -filter_complex "[1:a:0] atrim=duration=D, afade=t=out:st=D-2:d=2 [a]" -map 0:v:0 -map "[a]" -c:v copy out.mp4
+        cmd = [get_ffmpeg(), '-y',
+               '-i', video_path]
+        if loop:
+            cmd += ['-stream_loop', '-1']
+        cmd += ['-i', audio_path,
+                '-filter_complex', get_audio_fade_filter('[1:a:0]', duration, fade_duration) + ' [a]',
                 '-map', '0:v:0',
-                '-map', '1:a:0',
-                '-y',
-                cmd1_out
+                '-map', '[a]',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                cmd_out
         ]
         # Direct FFmpeg stdout/stderr to file to avoid halting due to filled I/O buffer
-        a1_start_time = time.monotonic()
+        start_time = time.monotonic()
         with open(str(tempdir_path / 'ffmpeg1.stdout'), 'w') as ffout:
             with open(str(tempdir_path / 'ffmpeg1.stderr'), 'w') as fferr:
-                p1 = subprocess.Popen(cmd1, cwd=str(tempdir_path), stdout=ffout, stderr=fferr)
-                logging.info("[AUDIO MIXING 1/2] %s", p1.args)
+                p1 = subprocess.Popen(cmd, cwd=str(tempdir_path), stdout=ffout, stderr=fferr)
+                logging.info("[AUDIO MIXING] %s", p1.args)
                 p1.wait(timeout=FFMPEG_TIMEOUT)
                 if p1.returncode:
                     # Error
-                    #_stdout, _stderr = [x.decode('utf-8') for x in p1.communicate()]
-                    raise RuntimeError(f"Non-zero exit code while mixing audio (1/2) -- Exit code: {p1.returncode}")
-                logging.info("[+%s][AUDIO MIXING 1/2] + Completed", format_duration(time.monotonic() - a1_start_time))
-
-        # Checkpoint
-        save_file = cmd1_out
-
-        # Audio Fadeout (crossfade with silence -> 2.0 sec)
-        #ffmpeg -i input.mp4 -filter_complex "aevalsrc=0:d=0.6 [a_silence]; [0:a:0] [a_silence] acrossfade=d=0.6" output.mp4
-        # TODO: Any way to accomplish this on the first pass?
-        cmd2_out = tempdir_path / 'output_1b.mp4'
-        cmd2 = [get_ffmpeg(),
-                '-i', cmd1_out,
-                '-filter_complex',
-                'aevalsrc=0:d=2.0 [a_silence]; [0:a:0] [a_silence] acrossfade=d=2.0',
-                cmd2_out
-        ]
-        # Direct FFmpeg stdout/stderr to file to avoid halting due to filled I/O buffer
-        a2_start_time = time.monotonic()
-        with open(str(tempdir_path / 'ffmpeg2.stdout'), 'w') as ffout:
-            with open(str(tempdir_path / 'ffmpeg2.stderr'), 'w') as fferr:
-                p2 = subprocess.Popen(cmd2, cwd=str(tempdir_path), stdout=ffout, stderr=fferr)
-                logging.info("[AUDIO MIXING 2/2] %s", p2.args)
-                p2.wait(timeout=FFMPEG_TIMEOUT)
-                if p2.returncode:
-                    # Error
-                    #_stdout, _stderr = [x.decode('utf-8') for x in p2.communicate()]
-                    raise RuntimeError(f"Non-zero exit code while mixing audio (2/2) -- Exit code: {p2.returncode}")
-                logging.info("[+%s][AUDIO MIXING 2/2] + Completed", format_duration(time.monotonic() - a2_start_time))
+                    raise RuntimeError(f"Non-zero exit code while mixing audio -- Exit code: {p1.returncode}")
+                logging.info("[+%s][AUDIO MIXING] + Completed", format_duration(time.monotonic() - start_time))
 
-        save_file = cmd2_out
+        save_file = cmd_out
 
     finally:
         if save_file:
@@ -610,6 +1622,16 @@ def add_background_audio(video_path, audio_path, loop=True, output_path=None):
     return video_path
 
 
+def get_audio_fade_filter(source, duration, fade_duration=AUDIO_FADE_SECONDS):
+    """
+    Return FFmpeg filter (chain) trimming audio stream `source` (e.g. "[1:a:0]")
+    to `duration` seconds, fading out over the last `fade_duration` seconds.
+    """
+    fade_duration = max(0.0, min(float(fade_duration), duration))
+    return (f'{source} atrim=duration={duration:.3f}, '
+            f'afade=t=out:st={duration - fade_duration:.3f}:d={fade_duration:.3f}')
+
+
 def remove_background_audio(video_path, output_path=None):
     """
     Remix video with audio track removed.
@@ -791,53 +1813,1438 @@ def get_video_thumbnail(video_path, width=512, secs=None, percent=None):
         shutil.rmtree(tempdir)
 
 
+class GourceLogEntry:
+    """
+    Single change entry from a Gource custom log.
+
+        <TIME>|<AUTHOR>|<MODIFICATION>|<PATH>[|<COLOR>]
+    """
+    __slots__ = ('timestamp', 'user', 'action', 'path')
+
+    def __init__(self, timestamp, user, action, path):
+        self.timestamp = timestamp
+        self.user = user
+        self.action = action
+        self.path = path
+
+    def __repr__(self):
+        return f"<GourceLogEntry {self.timestamp}|{self.user}|{self.action}|{self.path}>"
+
+
+def iter_gource_log(source):
+    """
+    Iterate over the entries of a Gource custom log, one line at a time.
+
+    `source` may be a path (`pathlib.Path`, plain or compressed log), an
+    open text file object or a string containing log data.  Only the
+    current line is held in memory, and user/path names are interned so
+    that repeated values share the same string.
+
+    Yields `GourceLogEntry` objects.
+    """
+    if isinstance(source, os.PathLike):
+        with open_gource_log(source) as _file:
+            yield from iter_gource_log(_file)
+        return
+    if isinstance(source, str):
+        source = StringIO(source)
+
+    for lineno, line in enumerate(source, start=1):
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        # <TIME>|<AUTHOR>|<MODIFICATION>|<PATH>[|<COLOR>]
+        segments = line.split('|', 4)
+        if len(segments) < 4:
+            raise ValueError(f"Invalid Gource log entry on line {lineno}: {line}")
+        try:
+            timestamp = int(segments[0])
+        except ValueError:
+            raise ValueError(f"Invalid timestamp on line {lineno}: {segments[0]}")
+        yield GourceLogEntry(timestamp, sys.intern(segments[1]), segments[2], sys.intern(segments[3]))
+
+
+class GourceLogStats:
+    """
+    Single-pass accumulator of Gource log statistics.
+
+    Entries are fed in log order (see `iter_gource_log()`), after which the
+    log summary, action counts and video duration estimates are available
+    without having to read the log again.
+    """
+    SECONDS_PER_DAY = 24*60*60
+
+    def __init__(self):
+        self.start_time = None
+        self.end_time = None
+        self.num_changes = 0
+        self.num_commits = 0
+        self.users = set()
+        self.commit_days = set()
+        self.actions = {'A': 0, 'M': 0, 'D': 0}
+        # Histogram of gaps (in days) between each new date in the log
+        self.day_gap_counts = collections.Counter()
+        self._current_day = None
+
+    @classmethod
+    def from_log(cls, source):
+        "Return a new instance populated from a Gource log (see `iter_gource_log()`)."
+        return cls().update(iter_gource_log(source))
+
+    def add(self, entry):
+        if self.start_time is None:
+            self.start_time = entry.timestamp
+            self._current_day = entry.timestamp // self.SECONDS_PER_DAY
+        if entry.timestamp != self.end_time:
+            self.num_commits += 1
+        self.end_time = entry.timestamp
+        self.num_changes += 1
+        self.users.add(entry.user)
+        if entry.action in self.actions:
+            self.actions[entry.action] += 1
+
+        commit_day = entry.timestamp // self.SECONDS_PER_DAY
+        self.commit_days.add(commit_day)
+        if commit_day > self._current_day:
+            self.day_gap_counts[commit_day - self._current_day] += 1
+            self._current_day = commit_day
+
+    def update(self, entries):
+        for entry in entries:
+            self.add(entry)
+        return self
+
+    def to_dict(self):
+        "Return JSON-serializable state (see `from_dict()`)."
+        return {
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'num_changes': self.num_changes,
+            'num_commits': self.num_commits,
+            'users': sorted(self.users),
+            'commit_days': sorted(self.commit_days),
+            'actions': dict(self.actions),
+            'day_gap_counts': sorted(self.day_gap_counts.items()),
+            'current_day': self._current_day,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        "Restore instance from state returned by `to_dict()`."
+        stats = cls()
+        stats.start_time = data['start_time']
+        stats.end_time = data['end_time']
+        stats.num_changes = data['num_changes']
+        stats.num_commits = data['num_commits']
+        stats.users = set(data['users'])
+        stats.commit_days = set(data['commit_days'])
+        stats.actions.update(data['actions'])
+        stats.day_gap_counts = collections.Counter(dict(data['day_gap_counts']))
+        stats._current_day = data['current_day']
+        return stats
+
+    def _check_empty(self):
+        if not self.num_changes:
+            raise ValueError("Gource log contains no entries")
+
+    def summary(self):
+        """
+        Return some statistics on the Gource log
+
+        Format:
+            {
+                "start_date":       <datetime>,
+                "end_date":         <datetime>,
+                "num_changes":      <int>
+                "num_commits":      <int>
+                "num_commit_days":  <int>
+                "users":            [<str>, ...]
+            }
+        """
+        self._check_empty()
+        return {
+            'start_date': datetime.utcfromtimestamp(self.start_time),
+            'end_date': datetime.utcfromtimestamp(self.end_time),
+            'num_changes': self.num_changes,
+            'num_commits': self.num_commits,
+            'num_commit_days': len(self.commit_days),
+            'users': sorted(list(self.users), key=lambda n: n.lower())
+        }
+
+    def estimate_duration(self, gource_options=None):
+        """
+        Estimate the duration (in seconds) of a Gource video for this log.
+
+        See `estimate_gource_video_duration()` for supported options.
+        """
+        self._check_empty()
+        return estimate_duration_from_day_gaps(self.day_gap_counts, gource_options)
+
+    def estimate_durations(self, gource_options_list):
+        "Return list of duration estimates for each of `gource_options_list`."
+        self._check_empty()
+        return estimate_durations_from_day_gaps(self.day_gap_counts, gource_options_list)
+
+
+class GourceLogColumns:
+    """
+    Read-only, memory-mapped columnar copy of a Gource log.
+
+    The columns are stored as raw native-endian arrays in a sidecar
+    directory (see `write_gource_log_columns()`):
+
+        timestamps.bin  int64   Entry timestamp
+        users.bin       uint32  Index into `users.txt`
+        actions.bin     uint8   Action code (see `ACTIONS`)
+        paths.bin       uint32  Index into `paths.txt`
+        days.bin        int64   Day records (see `DAY_FIELDS`)
+        day_users.bin   uint32  Distinct users of each day record
+        user_counts.bin uint64  Number of changes per user
+        meta.json       Format version, row/record counts, SHA-256 of source
+                        log and whether timestamps are sorted
+
+    Each day record covers consecutive rows of the same (UTC) date, with
+    running totals up to its last row, so statistics of whole days are read
+    from the records instead of the rows (see `get_stats()`).
+
+    Columns are exposed as `memoryview` objects backed by `mmap`, so pages
+    are shared between processes through the OS page cache.
+    """
+    VERSION = 3
+    ACTIONS = ('A', 'M', 'D')
+    COLUMNS = (
+        # name, array typecode
+        ('timestamps', 'q'),
+        ('users', 'I'),
+        ('actions', 'B'),
+        ('paths', 'I'),
+    )
+    # Fields of day records: date (days since epoch), then running totals of
+    # rows, commits, actions (see `ACTIONS`) and `day_users` entries
+    DAY_FIELDS = ('day', 'rows', 'commits', 'A', 'M', 'D', 'day_users')
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'meta.json', 'r') as _file:
+            self.meta = json.load(_file)
+        if self.meta.get('version') != self.VERSION:
+            raise ValueError(f"Unsupported log columns version: {self.meta.get('version')}")
+        self._mmaps = []
+        self._views = []
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, self._map_array(name, typecode, self.meta['rows']))
+        self.days = self._map_array('days', 'q', self.meta['records'] * len(self.DAY_FIELDS))
+        day_users_count = self.days[-1] if self.meta['records'] else 0
+        self.day_users = self._map_array('day_users', 'I', day_users_count)
+        self.user_counts = self._map_array('user_counts', 'Q', self.meta['users'])
+        self._user_names = None
+        self._path_names = None
+
+    def _map_array(self, name, typecode, length):
+        if not length:
+            view = memoryview(array.array(typecode))
+        else:
+            with open(self.path / f'{name}.bin', 'rb') as _file:
+                mm = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmaps.append(mm)
+            # Ignore any data written after `meta.json` was last updated
+            view = memoryview(mm).cast(typecode)[:length]
+        self._views.append(view)
+        return view
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        for mm in self._mmaps:
+            mm.close()
+        self._views = []
+        self._mmaps = []
+
+    @property
+    def sha256(self):
+        return self.meta.get('sha256')
+
+    @property
+    def is_sorted(self):
+        "Return True if timestamps are in (non-decreasing) order."
+        return self.meta.get('sorted', False)
+
+    @property
+    def user_names(self):
+        if self._user_names is None:
+            self._user_names = _read_string_table(self.path / 'users.txt')
+        return self._user_names
+
+    @property
+    def path_names(self):
+        if self._path_names is None:
+            self._path_names = _read_string_table(self.path / 'paths.txt')
+        return self._path_names
+
+    def date_range(self):
+        "Return (start, end) dates of log as naive UTC datetimes."
+        if not len(self):
+            return None, None
+        return (datetime.utcfromtimestamp(self.timestamps[0]),
+                datetime.utcfromtimestamp(self.timestamps[-1]))
+
+    def user_change_counts(self):
+        "Return mapping of user names to number of changes."
+        names = self.user_names
+        return {names[idx]: count for idx, count in enumerate(self.user_counts) if count}
+
+    def daily_change_counts(self):
+        "Return mapping of (UTC) dates to number of changes."
+        fields = len(self.DAY_FIELDS)
+        counts = collections.Counter()
+        previous_rows = 0
+        for day, rows in zip(self.days[0::fields], self.days[1::fields]):
+            counts[day] += rows - previous_rows
+            previous_rows = rows
+        epoch = datetime(1970, 1, 1).date()
+        return {epoch + timedelta(days=day): count for day, count in sorted(counts.items())}
+
+    def day_gap_counts(self, start=0, stop=None):
+        """
+        Return histogram of gaps (in days) between each new date for rows
+        [start:stop] (see `estimate_duration_from_day_gaps()`).
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return self._get_row_stats(start, stop).day_gap_counts
+
+    def get_stats(self, start_time=None, stop_time=None):
+        """
+        Return `GourceLogStats` for rows with timestamps between `start_time`
+        and `stop_time` (inclusive, either optional), without parsing the log.
+
+        Sorted logs are searched by timestamp, with totals of whole days read
+        from day records.  Unsorted logs are filtered row by row (unless the
+        whole log is selected).
+        """
+        if self.is_sorted:
+            start = bisect.bisect_left(self.timestamps, start_time) if start_time is not None else 0
+            stop = bisect.bisect_right(self.timestamps, stop_time) if stop_time is not None else len(self)
+        elif start_time is None and stop_time is None:
+            start, stop = 0, len(self)
+        else:
+            return self._get_filtered_stats(start_time, stop_time)
+        return self._get_row_stats(start, stop)
+
+    def _get_day_totals(self, index):
+        # Return running totals (`DAY_FIELDS` after 'day') at end of day record `index`
+        fields = len(self.DAY_FIELDS)
+        if index < 0:
+            return [0] * (fields - 1)
+        return self.days[index*fields + 1:(index + 1)*fields].tolist()
+
+    def _get_row_stats(self, start, stop):
+        # Return `GourceLogStats` for rows [start:stop], reading only the rows
+        # of partially selected day records at either end
+        log_stats = GourceLogStats()
+        if start >= stop:
+            return log_stats
+        fields = len(self.DAY_FIELDS)
+        rows_end = self.days[1::fields]
+        first = bisect.bisect_right(rows_end, start)
+        last = bisect.bisect_right(rows_end, stop - 1)
+        # Records selected as a whole (rows [whole_start:whole_stop])
+        first_whole = first if (rows_end[first - 1] if first else 0) == start else first + 1
+        last_whole = last if rows_end[last] == stop else last - 1
+        whole_start = whole_stop = stop
+        if first_whole <= last_whole:
+            before = self._get_day_totals(first_whole - 1)
+            after = self._get_day_totals(last_whole)
+            whole_start, whole_stop = before[0], after[0]
+            _, commits, added, modified, deleted, _ = [a - b for a, b in zip(after, before)]
+            log_stats.num_commits = commits
+            for action, count in zip(self.ACTIONS, (added, modified, deleted)):
+                log_stats.actions[action] += count
+            if start == 0 and stop == len(self):
+                user_ids = {idx for idx, count in enumerate(self.user_counts) if count}
+            else:
+                user_ids = set(self.day_users[before[-1]:after[-1]])
+            if whole_start == start and start > 0 and self.timestamps[start] == self.timestamps[start - 1]:
+                # Commit continued from row before selection
+                log_stats.num_commits += 1
+        else:
+            user_ids = set()
+
+        timestamps = self.timestamps
+        for idx in itertools.chain(range(start, whole_start), range(max(whole_stop, start), stop)):
+            if idx == start or timestamps[idx] != timestamps[idx - 1]:
+                log_stats.num_commits += 1
+            log_stats.actions[self.ACTIONS[self.actions[idx]]] += 1
+            user_ids.add(self.users[idx])
+
+        log_stats.start_time = timestamps[start]
+        log_stats.end_time = timestamps[stop - 1]
+        log_stats.num_changes = stop - start
+        user_names = self.user_names
+        log_stats.users = {user_names[idx] for idx in user_ids}
+        days = self.days[first*fields:(last + 1)*fields:fields].tolist()
+        log_stats.commit_days = set(days)
+        log_stats.day_gap_counts, log_stats._current_day = _count_day_gaps(days)
+        return log_stats
+
+    def _get_filtered_stats(self, start_time, stop_time):
+        # Return `GourceLogStats` for rows with timestamps in range (checking all rows)
+        rows = [idx for idx, ts in enumerate(self.timestamps)
+                if (start_time is None or ts >= start_time) and (stop_time is None or ts <= stop_time)]
+        log_stats = GourceLogStats()
+        if not rows:
+            return log_stats
+        SECONDS_PER_DAY = GourceLogStats.SECONDS_PER_DAY
+        timestamps = [self.timestamps[idx] for idx in rows]
+        log_stats.start_time = timestamps[0]
+        log_stats.end_time = timestamps[-1]
+        log_stats.num_changes = len(timestamps)
+        # Consecutive entries with the same timestamp make up a commit (see `GourceLogStats.add()`)
+        log_stats.num_commits = sum(1 for _ in itertools.groupby(timestamps))
+        user_names = self.user_names
+        log_stats.users = {user_names[self.users[idx]] for idx in rows}
+        days = [ts // SECONDS_PER_DAY for ts in timestamps]
+        log_stats.commit_days = set(days)
+        for code, count in collections.Counter(self.actions[idx] for idx in rows).items():
+            log_stats.actions[self.ACTIONS[code]] += count
+        log_stats.day_gap_counts, log_stats._current_day = _count_day_gaps(days)
+        return log_stats
+
+    def iter_entries(self, start=0, stop=None):
+        "Yield `GourceLogEntry` objects for rows [start:stop]."
+        users = self.user_names
+        paths = self.path_names
+        for idx in range(*slice(start, stop).indices(len(self))):
+            yield GourceLogEntry(self.timestamps[idx], users[self.users[idx]],
+                                 self.ACTIONS[self.actions[idx]], paths[self.paths[idx]])
+
+
+def _count_day_gaps(days):
+    # Return histogram of gaps between each new date (days since epoch), and last date
+    counts = collections.Counter()
+    current_day = None
+    # Dates only move forward (see `GourceLogStats.add()`)
+    for day in days:
+        if current_day is None:
+            current_day = day
+        elif day > current_day:
+            counts[day - current_day] += 1
+            current_day = day
+    return counts, current_day
+
+
+class _GourceLogColumnTotals:
+    # Running totals of rows written to a columnar sidecar, grouped into day
+    # records and per-user counts (see `GourceLogColumns.DAY_FIELDS`)
+
+    def __init__(self, totals=None, user_counts=None, last_timestamp=None, records=0, is_sorted=True):
+        self.totals = list(totals) if totals is not None else [0] * (len(GourceLogColumns.DAY_FIELDS) - 1)
+        self.user_counts = user_counts if user_counts is not None else array.array('Q')
+        self.last_timestamp = last_timestamp
+        self.records = records
+        self.is_sorted = is_sorted
+        # Pending output (see `flush()`)
+        self.days = array.array('q')
+        self.day_users = array.array('I')
+        self._day = None
+        self._users = set()
+
+    def add(self, timestamp, user_id, action_code):
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            self.is_sorted = False
+        day = timestamp // GourceLogStats.SECONDS_PER_DAY
+        if day != self._day:
+            self.end_day()
+            self._day = day
+        totals = self.totals
+        totals[0] += 1
+        if timestamp != self.last_timestamp:
+            # Consecutive entries with the same timestamp make up a commit
+            totals[1] += 1
+            self.last_timestamp = timestamp
+        totals[2 + action_code] += 1
+        self._users.add(user_id)
+        if user_id >= len(self.user_counts):
+            self.user_counts.extend([0] * (user_id + 1 - len(self.user_counts)))
+        self.user_counts[user_id] += 1
+
+    def end_day(self):
+        if self._day is None:
+            return
+        self.day_users.extend(sorted(self._users))
+        self.totals[-1] += len(self._users)
+        self.days.append(self._day)
+        self.days.extend(self.totals)
+        self.records += 1
+        self._day = None
+        self._users = set()
+
+    def flush(self, days_file, day_users_file):
+        for buf, _file in [(self.days, days_file), (self.day_users, day_users_file)]:
+            buf.tofile(_file)
+            del buf[:]
+
+
+def _read_string_table(path):
+    with open(path, 'r', encoding='utf-8', newline='\n') as _file:
+        return _file.read().split('\n')[:-1]
+
+
+def get_log_columns_path(log_path):
+    "Return path of columnar sidecar directory for Gource log at `log_path`."
+    return f'{log_path}.cols'
+
+
+def write_gource_log_columns(source, dest_path, sha256=None):
+    """
+    Write columnar sidecar for Gource log `source` (see `iter_gource_log()`)
+    to directory `dest_path`, replacing any existing copy.
+
+    Returns `GourceLogColumns` instance for the new sidecar.
+    """
+    dest_path = Path(dest_path)
+    tmp_path = Path(tempfile.mkdtemp(prefix=f'.{dest_path.name}.', dir=dest_path.parent))
+    try:
+        totals = _GourceLogColumnTotals()
+        _write_gource_log_columns(tmp_path, iter_gource_log(source), {}, {}, totals, append=False)
+        _write_gource_log_columns_meta(tmp_path, sha256, totals)
+        if dest_path.exists():
+            shutil.rmtree(dest_path)
+        os.replace(tmp_path, dest_path)
+    except:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return GourceLogColumns(dest_path)
+
+
+def append_gource_log_columns(columns_path, entries, sha256=None):
+    """
+    Append `entries` (`GourceLogEntry` objects) to existing columnar sidecar
+    at `columns_path`, and update its totals, SHA-256 and sorted flag.
+
+    Readers see the new rows only once `meta.json` is replaced.
+    """
+    columns_path = Path(columns_path)
+    with GourceLogColumns(columns_path) as columns:
+        rows = len(columns)
+        records = columns.meta['records']
+        totals = _GourceLogColumnTotals(totals=columns._get_day_totals(records - 1),
+                                        user_counts=array.array('Q', columns.user_counts),
+                                        last_timestamp=columns.timestamps[-1] if rows else None,
+                                        records=records, is_sorted=columns.is_sorted)
+        user_ids = {name: idx for idx, name in enumerate(columns.user_names)}
+        path_ids = {name: idx for idx, name in enumerate(columns.path_names)}
+    # Discard any data not committed to `meta.json` (e.g. interrupted append)
+    sizes = [(name, typecode, rows) for name, typecode in GourceLogColumns.COLUMNS]
+    sizes += [('days', 'q', records * len(GourceLogColumns.DAY_FIELDS)), ('day_users', 'I', totals.totals[-1])]
+    for name, typecode, length in sizes:
+        with open(columns_path / f'{name}.bin', 'ab') as _file:
+            _file.truncate(length * array.array(typecode).itemsize)
+    for filename, names in [('users.txt', user_ids), ('paths.txt', path_ids)]:
+        with open(columns_path / filename, 'r+b') as _file:
+            _file.truncate(sum(len(name.encode('utf-8')) + 1 for name in names))
+    _write_gource_log_columns(columns_path, entries, user_ids, path_ids, totals, append=True)
+    _write_gource_log_columns_meta(columns_path, sha256, totals)
+
+
+def _write_gource_log_columns(columns_path, entries, user_ids, path_ids, totals, append=False):
+    # Write entries to column files, updating string table mappings and
+    # `totals` (`_GourceLogColumnTotals`)
+    action_codes = {action: code for code, action in enumerate(GourceLogColumns.ACTIONS)}
+    mode = 'a' if append else 'w'
+    files = {name: open(columns_path / f'{name}.bin', f'{mode}b') for name, _ in GourceLogColumns.COLUMNS}
+    days_file = open(columns_path / 'days.bin', f'{mode}b')
+    day_users_file = open(columns_path / 'day_users.bin', f'{mode}b')
+    users_file = open(columns_path / 'users.txt', mode, encoding='utf-8', newline='\n')
+    paths_file = open(columns_path / 'paths.txt', mode, encoding='utf-8', newline='\n')
+    rows = 0
+    try:
+        CHUNK_SIZE = 65536
+        buffers = {name: array.array(typecode) for name, typecode in GourceLogColumns.COLUMNS}
+        for entry in entries:
+            user_id = user_ids.get(entry.user)
+            if user_id is None:
+                user_id = user_ids[entry.user] = len(user_ids)
+                users_file.write(entry.user + '\n')
+            path_id = path_ids.get(entry.path)
+            if path_id is None:
+                path_id = path_ids[entry.path] = len(path_ids)
+                paths_file.write(entry.path + '\n')
+            action_code = action_codes.get(entry.action, 1)
+            totals.add(entry.timestamp, user_id, action_code)
+            buffers['timestamps'].append(entry.timestamp)
+            buffers['users'].append(user_id)
+            buffers['actions'].append(action_code)
+            buffers['paths'].append(path_id)
+            rows += 1
+            if rows % CHUNK_SIZE == 0:
+                for name, buf in buffers.items():
+                    buf.tofile(files[name])
+                    del buf[:]
+                totals.flush(days_file, day_users_file)
+        for name, buf in buffers.items():
+            buf.tofile(files[name])
+        totals.end_day()
+        totals.flush(days_file, day_users_file)
+    finally:
+        for _file in list(files.values()) + [days_file, day_users_file, users_file, paths_file]:
+            _file.close()
+
+
+def _write_gource_log_columns_meta(columns_path, sha256, totals):
+    # Per-user counts are replaced (not appended), so current readers are unaffected
+    tmp_counts_path = columns_path / 'user_counts.bin.tmp'
+    with open(tmp_counts_path, 'wb') as _file:
+        totals.user_counts.tofile(_file)
+    os.replace(tmp_counts_path, columns_path / 'user_counts.bin')
+    tmp_meta_path = columns_path / 'meta.json.tmp'
+    with open(tmp_meta_path, 'w') as _file:
+        json.dump({'version': GourceLogColumns.VERSION, 'rows': totals.totals[0], 'sha256': sha256,
+                   'sorted': totals.is_sorted, 'records': totals.records,
+                   'users': len(totals.user_counts)}, _file)
+    os.replace(tmp_meta_path, columns_path / 'meta.json')
+
+
+def append_file(path, data):
+    """
+    Append `data` (bytes) to file at `path` in place.
+
+    If writing fails, the file is truncated back to its original size.
+    """
+    with open(path, 'ab') as _file:
+        size = _file.tell()
+        try:
+            _file.write(data)
+            _file.flush()
+            os.fsync(_file.fileno())
+        except:
+            _file.truncate(size)
+            raise
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def is_gzip_file(path):
+    "Return True if file at `path` is gzip-compressed."
+    with open(path, 'rb') as _file:
+        return _file.read(2) == GZIP_MAGIC
+
+
+# Compressed logs are written as a series of gzip members (blocks) of at most
+# `GZIP_BLOCK_SIZE` uncompressed bytes, each recording its compressed size in
+# a "BC" extra field (as in BGZF), so any offset can be read by decompressing
+# a single block (see `open_gource_log_at()`).
+GZIP_BLOCK_SIZE = 0xff00
+GZIP_BLOCK_HEADER = struct.Struct('<4sIBBH2sHH')    # Header with "BC" extra field
+GZIP_BLOCK_MAX_SIZE = 65536
+
+
+def _compress_gzip_block(data):
+    # Return gzip member (with "BC" extra field) for `data` (<= GZIP_BLOCK_SIZE bytes)
+    for level in (6, 0):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+        block_size = GZIP_BLOCK_HEADER.size + len(deflated) + 8
+        if block_size <= GZIP_BLOCK_MAX_SIZE:
+            break
+    # ID1 ID2 CM FLG(FEXTRA), MTIME (0), XFL, OS (unknown), XLEN, SI1 SI2, SLEN, BSIZE
+    header = GZIP_BLOCK_HEADER.pack(b'\x1f\x8b\x08\x04', 0, 0, 255, 6, b'BC', 2, block_size - 1)
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def compress_gource_log(data):
+    """
+    Return gzip-compressed copy of Gource log `data` (bytes), as a series of
+    independently compressed blocks (see `GZIP_BLOCK_SIZE`).
+
+    Output is deterministic (no embedded timestamp), so identical logs
+    compress to identical files.
+    """
+    if not data:
+        return _compress_gzip_block(b'')
+    return b''.join(_compress_gzip_block(data[offset:offset + GZIP_BLOCK_SIZE])
+                    for offset in range(0, len(data), GZIP_BLOCK_SIZE))
+
+
+def get_gzip_blocks(path):
+    """
+    Return list of (compressed offset, uncompressed offset, uncompressed size)
+    of each block of compressed Gource log at `path` (see `compress_gource_log()`),
+    by reading only the block headers and trailers.
+
+    Returns None if any member is not a block (e.g. logs compressed as a single
+    gzip member).
+    """
+    blocks = []
+    offset = 0
+    data_offset = 0
+    with open(path, 'rb') as _file:
+        file_size = os.fstat(_file.fileno()).st_size
+        while offset < file_size:
+            _file.seek(offset)
+            header = _file.read(GZIP_BLOCK_HEADER.size)
+            if len(header) < GZIP_BLOCK_HEADER.size:
+                return None
+            magic, _, _, _, xlen, subfield, slen, bsize = GZIP_BLOCK_HEADER.unpack(header)
+            if magic != b'\x1f\x8b\x08\x04' or xlen != 6 or subfield != b'BC' or slen != 2:
+                return None
+            _file.seek(offset + bsize + 1 - 4)
+            trailer = _file.read(4)
+            if len(trailer) < 4:
+                return None
+            size, = struct.unpack('<I', trailer)
+            blocks.append((offset, data_offset, size))
+            offset += bsize + 1
+            data_offset += size
+    return blocks
+
+
+class _GzipBlockReader(gzip.GzipFile):
+    # Decompress from already open raw file (positioned at a block), closing it when done
+
+    def __init__(self, raw_file):
+        super().__init__(fileobj=raw_file, mode='rb')
+        self._raw_file = raw_file
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._raw_file.close()
+
+
+def open_gource_log_at(path, offset=0):
+    """
+    Open Gource log at `path` for reading (bytes), positioned at `offset`
+    of uncompressed contents.
+
+    Compressed logs are entered at the block containing `offset` (see
+    `get_gzip_blocks()`), so earlier contents are not decompressed (except
+    for logs not written in blocks).  `tell()`/`seek()` of the returned
+    file object are not absolute.
+    """
+    if not is_gzip_file(path):
+        _file = open(path, 'rb')
+        _file.seek(offset)
+        return _file
+    blocks = get_gzip_blocks(path)
+    if not blocks:
+        _file = gzip.open(path, 'rb')
+        _file.seek(offset)
+        return _file
+    idx = max(0, bisect.bisect_right(blocks, offset, key=lambda block: block[1]) - 1)
+    raw_file = open(path, 'rb')
+    raw_file.seek(blocks[idx][0])
+    _file = _GzipBlockReader(raw_file)
+    # Within single block
+    _file.seek(offset - blocks[idx][1])
+    return _file
+
+
+def get_gource_log_size(path):
+    """
+    Return size of (uncompressed) Gource log contents at `path`.
+
+    Compressed logs are only read in full if not written in blocks.
+    """
+    if not is_gzip_file(path):
+        return os.path.getsize(path)
+    blocks = get_gzip_blocks(path)
+    if blocks is not None:
+        return blocks[-1][1] + blocks[-1][2] if blocks else 0
+    size = 0
+    with gzip.open(path, 'rb') as _file:
+        for chunk in iter(functools.partial(_file.read, 1024*1024), b''):
+            size += len(chunk)
+    return size
+
+
+def open_gource_log(path, mode='r'):
+    """
+    Open Gource log at `path` for reading, decompressing if needed.
+
+    Gzip-compressed logs are detected by contents (not file extension).
+    Use `mode='rb'` to read bytes, otherwise returns a text file object.
+    """
+    if mode not in ('r', 'rb'):
+        raise ValueError(f"Invalid mode: {mode}")
+    if is_gzip_file(path):
+        if mode == 'rb':
+            return gzip.open(path, 'rb')
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if mode == 'rb':
+        return open(path, 'rb')
+    return open(path, 'r', encoding='utf-8')
+
+
+def get_gource_log_digest(path, max_size=None):
+    """
+    Return (SHA-256 hex digest, size) of (uncompressed) Gource log contents at `path`.
+
+    If `max_size` is given, only the first `max_size` bytes are included.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open_gource_log(path, 'rb') as _file:
+        while max_size is None or size < max_size:
+            chunk = _file.read(1024*1024 if max_size is None else min(1024*1024, max_size - size))
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class GourceLogDigest:
+    """
+    SHA-256 digest and size of (uncompressed) Gource log contents.
+
+    Saved next to the log file (see `get_log_digest_path()`), along with the
+    size and modification time of the file it was computed from, so changes
+    to the log (including compressed logs, or rewrites of the same size) are
+    detected without reading it.
+    """
+    VERSION = 1
+
+    def __init__(self, sha256, size, file_stamp=None):
+        self.sha256 = sha256
+        self.size = size
+        self.file_stamp = file_stamp    # [file size, mtime (ns)]
+
+    @staticmethod
+    def get_file_stamp(log_path):
+        stat = os.stat(log_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    @classmethod
+    def from_log(cls, log_path):
+        "Compute digest by reading Gource log at `log_path`."
+        # NOTE: Stamp taken first, so changes made while reading are detected later
+        file_stamp = cls.get_file_stamp(log_path)
+        sha256, size = get_gource_log_digest(log_path)
+        return cls(sha256, size, file_stamp=file_stamp)
+
+    @classmethod
+    def from_data(cls, data):
+        "Compute digest of Gource log contents `data` (bytes)."
+        return cls(hashlib.sha256(data).hexdigest(), len(data))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as _file:
+            data = json.load(_file)
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported log digest version: {data.get('version')}")
+        return cls(data['sha256'], data['size'], file_stamp=data.get('file_stamp'))
+
+    def save(self, path):
+        "Write digest to `path` (atomically)."
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as _file:
+            json.dump({'version': self.VERSION, 'sha256': self.sha256, 'size': self.size,
+                       'file_stamp': self.file_stamp}, _file)
+        os.replace(tmp_path, path)
+
+    def matches(self, log_path):
+        "Return True if Gource log at `log_path` is unchanged since digest was computed."
+        try:
+            return self.file_stamp is not None and self.get_file_stamp(log_path) == self.file_stamp
+        except OSError:
+            return False
+
+
+def get_log_digest_path(log_path):
+    "Return path of `GourceLogDigest` sidecar file for Gource log at `log_path`."
+    return f'{log_path}.sha256'
+
+
+def append_gource_log(path, data):
+    """
+    Append new entries `data` (bytes) to Gource log at `path` (in place,
+    see `append_file()`).
+
+    Entries are kept on separate lines (adding newlines where missing).
+    Compressed logs have `data` added as new gzip blocks, so existing
+    contents are not recompressed.
+
+    Returns `GourceLogDigest` of new (uncompressed) log contents.
+    """
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    if _get_gource_log_last_byte(path) not in (b'', b'\n'):
+        data = b'\n' + data
+    append_file(path, compress_gource_log(data) if is_gzip_file(path) else data)
+    return GourceLogDigest.from_log(path)
+
+
+def _get_gource_log_last_byte(path):
+    # Return last byte of (uncompressed) Gource log contents (b'' if empty)
+    size = get_gource_log_size(path)
+    if not size:
+        return b''
+    with open_gource_log_at(path, size - 1) as _file:
+        return _file.read(1)
+
+
+def serve_gource_log(request, log_path):
+    """
+    Return HTTP response with contents of Gource log at `log_path`.
+
+    Compressed logs are sent as stored (`Content-Encoding: gzip`) if the
+    client accepts it, otherwise they are decompressed while streaming.
+    """
+    filename = os.path.basename(log_path)
+    if not is_gzip_file(log_path):
+        return serve(request, filename, os.path.dirname(log_path))
+    if filename.endswith('.gz'):
+        filename = filename[:-3]
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = FileResponse(open(log_path, 'rb'), content_type='text/plain', filename=filename)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        def _iter_log():
+            with open_gource_log(log_path, 'rb') as _file:
+                yield from iter(functools.partial(_file.read, 64*1024), b'')
+        response = StreamingHttpResponse(_iter_log(), content_type='text/plain')
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def get_file_sha256(path):
+    """
+    Return SHA-256 hex digest of file contents (read in chunks).
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as _file:
+        for chunk in iter(functools.partial(_file.read, 1024*1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GourceLogIndex:
+    """
+    Sparse timestamp -> byte offset index of a Gource log.
+
+    The log is split into blocks of roughly `BLOCK_SIZE` bytes (on line
+    boundaries), recording each block's starting offset and its earliest and
+    latest timestamps.  This allows reading only the blocks of a large log
+    that can contain entries within a date range.
+    """
+    VERSION = 1
+    BLOCK_SIZE = 64*1024
+
+    def __init__(self, blocks, size, sha256=None):
+        self.blocks = blocks    # List of [offset, min timestamp, max timestamp]
+        self.size = size
+        self.sha256 = sha256
+
+    def __len__(self):
+        return len(self.blocks)
+
+    @classmethod
+    def from_log(cls, log_path, sha256=None, block_size=None):
+        "Build index by scanning Gource log at `log_path`."
+        block_size = block_size if block_size else cls.BLOCK_SIZE
+        blocks = []
+        block = None
+        offset = 0
+        with open_gource_log(log_path, 'rb') as _file:
+            for line in _file:
+                line_offset = offset
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    timestamp = int(line.split(b'|', 1)[0])
+                except ValueError:
+                    raise ValueError(f"Invalid Gource log timestamp at offset {line_offset}")
+                if block is None or line_offset - block[0] >= block_size:
+                    block = [line_offset, timestamp, timestamp]
+                    blocks.append(block)
+                elif timestamp < block[1]:
+                    block[1] = timestamp
+                elif timestamp > block[2]:
+                    block[2] = timestamp
+        return cls(blocks, offset, sha256=sha256)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as _file:
+            data = json.load(_file)
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported log index version: {data.get('version')}")
+        return cls(data['blocks'], data['size'], sha256=data.get('sha256'))
+
+    def save(self, path):
+        "Write index to `path` (atomically)."
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as _file:
+            json.dump({'version': self.VERSION, 'size': self.size, 'sha256': self.sha256,
+                       'blocks': self.blocks}, _file)
+        os.replace(tmp_path, path)
+
+    def get_byte_range(self, start_time=None, stop_time=None):
+        """
+        Return (start, stop) byte offsets of log containing all entries
+        between `start_time` and `stop_time` (UNIX timestamps, inclusive).
+
+        Blocks are only skipped if every entry is outside of range (and all
+        prior/following blocks are too), so unordered logs are also safe.
+        """
+        start, stop = 0, self.size
+        if start_time is not None:
+            start = self.size
+            for offset, _, max_ts in self.blocks:
+                if max_ts >= start_time:
+                    start = offset
+                    break
+        if stop_time is not None:
+            stop = self.blocks[0][0] if self.blocks else 0
+            for idx in range(len(self.blocks) - 1, -1, -1):
+                if self.blocks[idx][1] <= stop_time:
+                    stop = self.blocks[idx + 1][0] if idx + 1 < len(self.blocks) else self.size
+                    break
+        return start, max(start, stop)
+
+    def iter_lines(self, log_path, start_time=None, stop_time=None):
+        "Yield (decoded) log lines of `log_path` within byte range for dates."
+        start, stop = self.get_byte_range(start_time, stop_time)
+        with open_gource_log_at(log_path, start) as _file:
+            for line in _file:
+                if start >= stop:
+                    break
+                start += len(line)
+                yield line.decode('utf-8')
+
+
+def get_log_index_path(log_path):
+    "Return path of `GourceLogIndex` sidecar file for Gource log at `log_path`."
+    return f'{log_path}.idx'
+
+
+# Gource options limiting which part of the log is shown
+GOURCE_LOG_SLICE_OPTIONS = ('start-date', 'stop-date', 'start-position', 'stop-position')
+
+
+def parse_gource_date_option(value):
+    """
+    Return UNIX timestamp for Gource `start-date`/`stop-date` option value
+    ("YYYY-MM-DD [HH:mm:ss]"), or None if not valid.
+
+    Dates without timezone are treated as UTC.
+    """
+    try:
+        dt = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def get_gource_log_byte_range(log_path, gource_options, log_index=None):
+    """
+    Return (start, stop) byte offsets of Gource log at `log_path` needed
+    to render using `gource_options` (see `write_gource_log_slice()`).
+
+    Offsets are within uncompressed log contents.  A `log_index` is only
+    needed (and built if not given) for date options.
+    """
+    size = log_index.size if log_index is not None else get_gource_log_size(log_path)
+    start, stop = 0, size
+    # Position options (fraction of log file size)
+    start_position = gource_options.get('start-position')
+    stop_position = gource_options.get('stop-position')
+    if start_position is not None and str(start_position) != 'random':
+        offset = int(size * float(start_position))
+        if offset > 0:
+            # Begin at next complete line
+            with open_gource_log_at(log_path, offset - 1) as _file:
+                start = max(start, offset - 1 + len(_file.readline()))
+    if stop_position is not None:
+        offset = int(size * float(stop_position))
+        if offset < size:
+            # Finish current line
+            with open_gource_log_at(log_path, offset) as _file:
+                stop = min(stop, offset + len(_file.readline()))
+
+    # Date options
+    # - Include extra margin for timezone of date (applied exactly by Gource)
+    DATE_MARGIN = 24*60*60
+    start_time = parse_gource_date_option(gource_options.get('start-date', ''))
+    stop_time = parse_gource_date_option(gource_options.get('stop-date', ''))
+    if start_time is not None or stop_time is not None:
+        if log_index is None:
+            log_index = GourceLogIndex.from_log(log_path)
+        date_start, date_stop = log_index.get_byte_range(
+            start_time - DATE_MARGIN if start_time is not None else None,
+            stop_time + DATE_MARGIN if stop_time is not None else None
+        )
+        start = max(start, date_start)
+        stop = min(stop, date_stop)
+    return start, max(start, stop)
+
+
+def write_gource_log_slice(log_path, dest_path, gource_options, log_index=None):
+    """
+    Copy only the part of Gource log at `log_path` covered by `gource_options`
+    (`start-date`, `stop-date`, `start-position`, `stop-position`) to `dest_path`,
+    so Gource does not need to load the full log.
+
+    Date options are still applied by Gource itself.  Position options are
+    relative to the original log, so are removed from the returned (copy of)
+    `gource_options`.
+    """
+    gource_options = dict(gource_options)
+    if not any(gource_options.get(name) not in (None, '') for name in GOURCE_LOG_SLICE_OPTIONS):
+        with open_gource_log(log_path, 'rb') as src, open(dest_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024*1024)
+        return gource_options
+    start, stop = get_gource_log_byte_range(log_path, gource_options, log_index=log_index)
+    with open_gource_log_at(log_path, start) as src, open(dest_path, 'wb') as dst:
+        remaining = stop - start
+        while remaining > 0:
+            chunk = src.read(min(remaining, 1024*1024))
+            if not chunk:
+                break
+            dst.write(chunk)
+            remaining -= len(chunk)
+    if str(gource_options.get('start-position')) != 'random':
+        gource_options.pop('start-position', None)
+    gource_options.pop('stop-position', None)
+    return gource_options
+
+
+def get_gource_render_segments(segments=None):
+    """
+    Return number of segments to render a Gource video with (see
+    `generate_gource_video()`).
+
+    `segments` (default: `GOURCE_RENDER_SEGMENTS` setting) is a number, or
+    "auto" to use one segment for every 2 available CPU cores (each segment
+    runs a Gource and an FFmpeg process).
+    """
+    if segments is None:
+        segments = getattr(django_settings, 'GOURCE_RENDER_SEGMENTS', 1)
+    if segments == 'auto':
+        if hasattr(os, 'sched_getaffinity'):
+            cores = len(os.sched_getaffinity(0))
+        else:
+            cores = os.cpu_count() or 1
+        segments = cores // 2
+        max_segments = getattr(django_settings, 'GOURCE_RENDER_MAX_SEGMENTS', None)
+        if max_segments:
+            segments = min(segments, max_segments)
+    return max(1, int(segments or 1))
+
+
+GourceLogSegment = collections.namedtuple('GourceLogSegment', ['log_path', 'gource_options', 'preroll_seconds'])
+
+def write_gource_log_segments(log_path, dest_dir, count, gource_options=None, min_duration=None, max_duration=None):
+    """
+    Split Gource log at `log_path` into (at most) `count` consecutive time
+    windows of similar estimated video duration, written to `dest_dir`,
+    so they can be rendered concurrently and joined (see
+    `generate_gource_video()`).
+
+    Each split is made at the longest gap between commits close to its
+    ideal position, where Gource would usually auto-skip anyway.  Windows
+    shorter than `min_duration` seconds (default:
+    `GOURCE_SEGMENT_MIN_SECONDS`) are not created.  If `max_duration` is
+    given, more windows are created as needed to keep them shorter.
+
+    Every log after the first begins with a "pre-roll" commit adding the
+    files present at the start of its window (by their last author), so
+    the tree is already built when the window begins.  The first
+    `preroll_seconds` of each rendered segment must then be dropped.
+
+    `start-date`/`stop-date` options are only kept for the first/last
+    window.  Logs using `start-position`/`stop-position` are not split.
+
+    Returns list of GourceLogSegment(log_path, gource_options, preroll_seconds)
+    """
+    gource_options = dict(gource_options) if gource_options else {}
+    if min_duration is None:
+        min_duration = getattr(django_settings, 'GOURCE_SEGMENT_MIN_SECONDS', 60)
+    dest_dir = Path(dest_dir)
+    seconds_per_day = float(gource_options.get('seconds-per-day', 1.0))
+    skip_secs = float(gource_options.get('auto-skip-seconds', 3.0))
+    start_time = parse_gource_date_option(gource_options.get('start-date', ''))
+    stop_time = parse_gource_date_option(gource_options.get('stop-date', ''))
+    single = [GourceLogSegment(log_path, gource_options, 0)]
+    if (count <= 1 and not max_duration) or any(gource_options.get(name) not in (None, '') for name in ('start-position', 'stop-position')):
+        return single
+
+    def in_range(timestamp):
+        return (start_time is None or timestamp >= start_time) and (stop_time is None or timestamp < stop_time)
+
+    ## 1 - Estimated video time of each commit (distinct timestamp) within date range
+    commit_times = array.array('q')
+    commit_gaps = array.array('d')      # Video seconds since previous commit
+    previous = None
+    for entry in iter_gource_log(log_path):
+        if previous is not None and entry.timestamp == previous:
+            continue
+        gap = 0.0
+        if previous is not None and in_range(entry.timestamp):
+            gap = min(max(0, entry.timestamp - previous) / 86400 * seconds_per_day, skip_secs)
+        commit_times.append(entry.timestamp)
+        commit_gaps.append(gap)
+        previous = entry.timestamp
+    total = sum(commit_gaps)
+    if max_duration:
+        count = max(count, math.ceil(total / max_duration))
+    count = min(count, int(total // min_duration) if min_duration else count)
+    if count <= 1:
+        return single
+
+    ## 2 - Select split commits (largest gap within a quarter window of ideal position)
+    tolerance = total / count / 4
+    boundaries = []     # Commit index starting each window (after first)
+    elapsed = 0.0
+    candidates = []
+    target = 1
+    for index, gap in enumerate(commit_gaps):
+        elapsed += gap
+        if not in_range(commit_times[index]) or index == 0:
+            continue
+        if elapsed >= target * total / count - tolerance:
+            candidates.append((gap, -abs(elapsed - target * total / count), index))
+        if candidates and (elapsed > target * total / count + tolerance or index == len(commit_gaps) - 1):
+            boundaries.append(max(candidates)[2])
+            candidates = []
+            target += 1
+            if target >= count:
+                break
+    if not boundaries:
+        return single
+
+    ## 3 - Write window logs (replaying file tree for pre-roll commits)
+    preroll_seconds, preroll_gap = _get_gource_preroll(gource_options)
+    tree = {}   # {path: user}
+    result = []
+    commit_index = -1
+    previous = None
+    window_file = None
+    try:
+        with open_gource_log(log_path) as src:
+            for line in src:
+                fields = line.rstrip('\r\n').split('|', 4)
+                if len(fields) < 4:
+                    continue
+                timestamp = int(fields[0])
+                if timestamp != previous:
+                    commit_index += 1
+                    previous = timestamp
+                    if window_file is None or (len(result) <= len(boundaries) and commit_index == boundaries[len(result) - 1]):
+                        # Start next window
+                        if window_file is not None:
+                            window_file.close()
+                        window_path = dest_dir / f'gource.{len(result)}.log'
+                        window_file = open(window_path, 'w', encoding='utf-8')
+                        window_options = dict(gource_options)
+                        if result:
+                            window_options.pop('start-date', None)
+                            _write_gource_preroll(window_file, tree, timestamp - preroll_gap)
+                        if len(result) < len(boundaries):
+                            window_options.pop('stop-date', None)
+                        result.append(GourceLogSegment(window_path, window_options, preroll_seconds if result else 0))
+                window_file.write(line if line.endswith('\n') else line + '\n')
+                if in_range(timestamp):
+                    _update_gource_tree(tree, fields)
+    finally:
+        if window_file is not None:
+            window_file.close()
+    return result
+
+
+def write_gource_log_increment(log_path, dest_path, offset, gource_options=None):
+    """
+    Write entries of Gource log at `log_path` after byte `offset` (end of
+    an earlier version of the log, already rendered) to `dest_path`, so
+    only new entries need rendering before appending to the earlier video.
+
+    The log begins with a "pre-roll" commit adding the files present at
+    `offset`, like windows of `write_gource_log_segments()`.
+
+    Returns GourceLogSegment(dest_path, gource_options, preroll_seconds), or
+    None if there are no entries after `offset`.
+    """
+    gource_options = dict(gource_options) if gource_options else {}
+    preroll_seconds, preroll_gap = _get_gource_preroll(gource_options)
+    tree = {}   # {path: user}
+    dest = None
+    position = 0
+    try:
+        with open_gource_log(log_path, 'rb') as src:
+            for raw_line in src:
+                position += len(raw_line)
+                line = raw_line.decode('utf-8', 'replace')
+                fields = line.rstrip('\r\n').split('|', 4)
+                if len(fields) < 4:
+                    continue
+                if position <= offset:
+                    # Already rendered
+                    _update_gource_tree(tree, fields)
+                    continue
+                if dest is None:
+                    dest = open(dest_path, 'w', encoding='utf-8')
+                    _write_gource_preroll(dest, tree, int(fields[0]) - preroll_gap)
+                dest.write(line if line.endswith('\n') else line + '\n')
+    finally:
+        if dest is not None:
+            dest.close()
+    if dest is None:
+        return None
+    return GourceLogSegment(Path(dest_path), gource_options, preroll_seconds)
+
+
+def _get_gource_preroll(gource_options):
+    # Return (video seconds, log seconds) of pre-roll commit before a window
+    # - Kept short of `auto-skip-seconds`, so Gource does not skip ahead
+    seconds_per_day = float(gource_options.get('seconds-per-day', 1.0))
+    skip_secs = float(gource_options.get('auto-skip-seconds', 3.0))
+    preroll_seconds = min(getattr(django_settings, 'GOURCE_SEGMENT_PREROLL_SECONDS', 2.0), skip_secs / 2)
+    return preroll_seconds, max(1, int(preroll_seconds / seconds_per_day * 86400))
+
+
+def _update_gource_tree(tree, fields):
+    # Apply log entry (split line) to mapping of present files {path: last user}
+    if fields[2] == 'D':
+        tree.pop(fields[3], None)
+    else:
+        tree[fields[3]] = fields[1]
+
+
+def _write_gource_preroll(dest, tree, timestamp):
+    for path, user in tree.items():
+        dest.write(f"{timestamp}|{user}|A|{path}\n")
+
+
+def estimate_duration_from_day_gaps(day_gap_counts, gource_options=None):
+    """
+    Estimate the duration (in seconds) of a Gource video from a histogram of
+    day gaps (mapping of gap in days to number of occurrences) in its log.
+
+    Every gap costs `seconds-per-day` for each elapsed day, up to the
+    `auto-skip-seconds` threshold, so the estimate is computed per distinct
+    gap rather than per log entry.
+
+    See `estimate_gource_video_duration()` for supported options.
+    """
+    return estimate_durations_from_day_gaps(day_gap_counts, [gource_options])[0]
+
+
+def estimate_durations_from_day_gaps(day_gap_counts, gource_options_list):
+    """
+    Estimate Gource video durations for a list of `gource_options` using
+    a single day gap histogram (see `estimate_duration_from_day_gaps()`).
+
+    Histogram is prepared once (sorted gaps with cumulative totals), so
+    each estimate only costs a binary search.
+
+    Returns list of durations (in seconds) in the same order.
+    """
+    day_gaps = sorted(day_gap_counts)
+    # Cumulative number of gaps/days for gaps shorter than `day_gaps[i]`
+    cumulative_gaps = [0]
+    cumulative_days = [0]
+    for day_gap in day_gaps:
+        count = day_gap_counts[day_gap]
+        cumulative_gaps.append(cumulative_gaps[-1] + count)
+        cumulative_days.append(cumulative_days[-1] + (day_gap * count))
+
+    durations = []
+    for gource_options in gource_options_list:
+        gource_options = gource_options if gource_options else {}
+        seconds_per_day = float(gource_options.get('seconds-per-day', 1.0))
+        skip_secs = float(gource_options.get('auto-skip-seconds', 3.0))
+        # Amount of days before auto-skip kicks in
+        skip_day_limit = math.ceil(skip_secs / seconds_per_day)
+
+        idx = bisect.bisect_left(day_gaps, skip_day_limit)
+        short_gap_days = cumulative_days[idx]   # Total days of gaps shorter than auto-skip threshold
+        skipped_gaps = cumulative_gaps[-1] - cumulative_gaps[idx]   # Number of gaps reaching threshold
+
+        duration = 0.0
+        duration += seconds_per_day     # First day
+        duration += seconds_per_day * short_gap_days
+        duration += ((seconds_per_day * skip_day_limit)+skip_secs) * skipped_gaps
+
+        VIDEO_BUFFER = 5    # 5 second still at end
+        durations.append(duration + VIDEO_BUFFER)
+    return durations
+
+
+class DurationCalibration:
+    """
+    Linear correction of video duration estimates, fitted from past builds.
+
+        actual = slope * estimate + intercept
+
+    The default (identity) calibration leaves estimates unchanged.
+    """
+    MIN_SAMPLES = 3
+
+    def __init__(self, slope=1.0, intercept=0.0, samples=0):
+        self.slope = slope
+        self.intercept = intercept
+        self.samples = samples
+
+    def __repr__(self):
+        return f'<DurationCalibration {self.slope:.3f}*x{self.intercept:+.2f} (n={self.samples})>'
+
+    @classmethod
+    def fit(cls, pairs):
+        """
+        Return least-squares fit of (estimate, actual) duration `pairs`,
+        or None if there are too few samples.
+        """
+        pairs = [(float(x), float(y)) for x, y in pairs if x and y]
+        n = len(pairs)
+        if n < cls.MIN_SAMPLES:
+            return None
+        mean_x = sum(x for x, _ in pairs) / n
+        mean_y = sum(y for _, y in pairs) / n
+        var_x = sum((x - mean_x)**2 for x, _ in pairs)
+        cov_xy = sum((x - mean_x)*(y - mean_y) for x, y in pairs)
+        if var_x < 1e-9 or cov_xy <= 0:
+            # No usable trend, so only correct overall scale
+            return cls(slope=mean_y / mean_x, intercept=0.0, samples=n)
+        slope = cov_xy / var_x
+        return cls(slope=slope, intercept=mean_y - slope*mean_x, samples=n)
+
+    def apply(self, duration):
+        "Return corrected `duration` estimate (in seconds)."
+        return max(0.0, self.slope * duration + self.intercept)
+
+
 def analyze_gource_log(data):
     """
     Return some statistics on a provided Gource log
 
-    Format:
-        {
-            "start_date":       <datetime>,
-            "end_date":         <datetime>,
-            "num_changes":      <int>
-            "num_commits":      <int>
-            "num_commit_days":  <int>
-            "users":            [<str>, ...]
-        }
+    `data` may be log contents, an open file or a `pathlib.Path`
+    (see `GourceLogStats.summary()` for format).
     """
-    lines = data.strip().split('\n')
-    start_date = datetime.utcfromtimestamp(int(lines[0].split('|')[0]))
-    end_date = datetime.utcfromtimestamp(int(lines[-1].split('|')[0]))
-    users = set()
-    commit_days = set()
-    num_commits = 0
-    current_date = None
-    for line in lines:
-        # <TIME>|<AUTHOR>|<MODIFICATION>|<PATH>[|<COLOR>]
-        segments = line.split('|')
-        # Add user
-        users.add(segments[1])
-        # Check date
-        commit_date = datetime.utcfromtimestamp(int(segments[0]))
-        commit_days.add(commit_date.date())
-        if current_date is None or current_date != commit_date:
-            num_commits += 1
-            current_date = commit_date
-
-    return {
-        'start_date': start_date,
-        'end_date': end_date,
-        'num_changes': len(lines),
-        'num_commits': num_commits,
-        'num_commit_days': len(commit_days),
-        'users': sorted(list(users), key=lambda n: n.lower())
-    }
+    return GourceLogStats.from_log(data).summary()
 
 
 def estimate_gource_video_duration(data, gource_options=None):
     """
     Estimate the duration (in seconds) of a Gource video based on log.
 
+    `data` may be log contents, an open file or a `pathlib.Path`.
+
     Uses relevant `gource_options` to determine changes in time:
 
       `seconds-per-day`   (default=1) - Speed of simulation in seconds per day.
@@ -852,61 +3259,7 @@ def estimate_gource_video_duration(data, gource_options=None):
 
     Returns number of seconds of resulting video.
     """
-    lines = data.strip().split('\n')
-    start_date = datetime.utcfromtimestamp(int(lines[0].split('|')[0]))
-    end_date = datetime.utcfromtimestamp(int(lines[-1].split('|')[0]))
-
-    gource_options = gource_options if gource_options else {}
-    seconds_per_day = float(gource_options.get('seconds-per-day', 1.0))
-    skip_secs = float(gource_options.get('auto-skip-seconds', 3.0))
-    # Amount of days before auto-skip kicks in
-    skip_day_limit = math.ceil(skip_secs / seconds_per_day)
-
-    duration = 0.0
-    duration += seconds_per_day     # First day
-    current_date = start_date
-    file_count = 0
-    mod_time = 0
-    dir_changes = set()
-    user_changes = set()
-    for line in lines:
-        # <TIME>|<AUTHOR>|<MODIFICATION>|<PATH>[|<COLOR>]
-        segments = line.split('|')
-        # Check user
-        user_changes.add( segments[1] )
-        # Check date
-        commit_date = datetime.utcfromtimestamp(int(segments[0]))
-        dir_changes.add( os.path.dirname(segments[3]) )
-        if commit_date.date() > current_date.date():
-            # Include time taken to "touch" each file in tree
-            #if (file_count * 0.1) > seconds_per_day:
-            #    duration += ((file_count * 0.1) - seconds_per_day)
-            #duration += ((file_count * 0.1) - 0)
-            #if mod_time > seconds_per_day:
-            #    duration += (mod_time - seconds_per_day)
-            #duration += max((len(dir_changes) * 0.25)-seconds_per_day, 0)
-            #duration += max((len(dir_changes) * 0.25), 0)
-            #duration += (len(dir_changes) * 0.01)
-            #duration += (len(user_changes) * 0.1)
-            #duration += mod_time
-            user_changes = set()
-            dir_changes = set()
-            mod_time = 0
-            file_count = 0
-            # Determine number of days that have elapsed since last commit change
-            day_gap = (commit_date.date() - current_date.date()).days
-            # - Check for auto-size threshold
-            if day_gap >= skip_day_limit:
-                duration += (seconds_per_day * skip_day_limit)+skip_secs
-            else:
-                duration += (seconds_per_day * day_gap)
-            current_date = commit_date
-        else:
-            file_count += 1
-
-    VIDEO_BUFFER = 5    # 5 second still at end
-    #return duration
-    return duration + VIDEO_BUFFER
+    return GourceLogStats.from_log(data).estimate_duration(gource_options)
 
 
 def resolve_project_avatars(project, contributors):
@@ -25,16 +25,14 @@ from django.views.static import serve
 ssl._create_default_https_context = ssl._create_unverified_context
 
 from .api.serializers import ProjectSerializer, UserPlaylistProjectSerializer
-from .constants import GOURCE_OPTIONS, GOURCE_OPTIONS_LIST, GOURCE_OPTIONS_JSON, VIDEO_OPTIONS, filter_by_version
+from .constants import ENCODER_PROFILES, GOURCE_OPTIONS, GOURCE_OPTIONS_LIST, GOURCE_OPTIONS_JSON, VIDEO_OPTIONS, filter_by_version
 from .exceptions import ProjectBuildAbortedError
 from .models import Project, ProjectBuild, ProjectBuildOption, ProjectCaption, ProjectMember, ProjectOption, ProjectUserAvatar, UserAvatar, UserPlaylist
 from .tasks import generate_gource_build
 from .utils import (
     add_background_audio,   #(video_path, audio_path, loop=True):
-    analyze_gource_log,     #(data):
-    download_git_log,       #(url, branch="master"):
-    download_git_tags,      #(url, branch="master"):
-    estimate_gource_video_duration,
+    compress_gource_log,
+    download_git_snapshot,  #(url, branch="master", cache_timeout=None):
     generate_gource_video,  #(log_data, video_size='1280x720', framerate=60, gource_options={}):
     get_ffmpeg_version,     #(split=False):
     get_git_version,        #(split=False):
@@ -45,6 +43,7 @@ from .utils import (
     get_xvfb_run,
     remove_background_audio,#(video_path):
     resolve_project_avatars,
+    serve_gource_log,
     test_http_url,          #(url):
     validate_project_url,   #(url):
 )
@@ -339,11 +338,14 @@ def edit_project(request, project_id=None, project_slug=None):
     # General project fields
     project_updated = False
     update_fields = []
-    for field in ['video_size', 'project_slug', 'is_public']:
+    for field in ['video_size', 'encoder_profile', 'project_slug', 'is_public']:
         if field in data:
             setattr(project, field, data[field])
             project_updated = True
             update_fields.append(field)
+    if 'encoder_profile' in data and data['encoder_profile'] not in ENCODER_PROFILES:
+        response = {"error": True, "message": f"Invalid encoder profile: {data['encoder_profile']}"}
+        return HttpResponse(json.dumps(response), status=400, content_type="application/json")
 
     if 'gource_options' in data:
         if isinstance(data['gource_options'], dict):
@@ -465,7 +467,7 @@ def project_actions(request, project_id=None, project_slug=None):
     elif data['action'] == 'load_captions_from_tags':
         try:
             content = test_http_url(project.project_url)
-            tags_list = download_git_tags(project.project_url, branch=project.project_branch)
+            tags_list = download_git_snapshot(project.project_url, branch=project.project_branch, vcs=project.project_vcs).tags
             for timestamp, tag_name in tags_list:
                 captions_added = 0
                 try:
@@ -585,7 +587,7 @@ def project_build_gource_log(request, project_id=None, project_slug=None, build_
         filepath = build.project_log.path
     else:
         filepath = project.project_log.path
-    return serve(request, os.path.basename(filepath), os.path.dirname(filepath))
+    return serve_gource_log(request, filepath)
 
 
 def avatar_image(request, avatar_id):
@@ -794,24 +796,19 @@ def project_queue_build(request, project_id=None, project_slug=None):
     refetch_log = request.GET.get('refetch_log', None)
 
     # Check if project currently has queued build
-    if project.builds.filter(status__in=['pending', 'queued', 'running']).count():
+    if project.has_build_waiting:
         response = "ERROR: Project already has pending builds.<br /><br />"
         response += f'<a href="/projects/{project.id}/">{project.project_url}</a>'
         return HttpResponse(response, status=400)
 
     try:
         if str(refetch_log) in ['t', 'true', '1']:
-            # Download latest VCS branch; generate Gource log
-            content = test_http_url(project.project_url)
-            log_data, log_hash, log_subject, tags_list = download_git_log(project.project_url, branch=project.project_branch)
-            project.project_log_commit_hash = log_hash
-            project.project_log_commit_preview = log_subject
-            # Get time/author from last entry
-            latest_commit = log_data.splitlines()[-1].split('|')
-            project.project_log_commit_time = make_aware(datetime.utcfromtimestamp(int(latest_commit[0])))
-            if project.project_log:
-                project.project_log.delete()
-            project.project_log.save('gource.log', ContentFile(log_data))
+            # Download latest VCS branch in background (build queued afterwards)
+            fetch = project.queue_fetch(queue_build=True, user=request.user)
+            response = 'Log refresh has been queued successfully.<br /><br />'
+            response += f'Project Page: <a href="/projects/{project.id}/">/projects/{project.id}/</a><br />'
+            response += f'Pending Fetch: <a href="{fetch.get_absolute_url()}">{fetch.get_absolute_url()}</a> (ID={fetch.id})<br />'
+            return HttpResponse(response, status=202)
 
         # Create new build (immediately in "queued" state)
         build = project.create_build()
@@ -871,29 +868,6 @@ def new_project(request):
 #        except Project.DoesNotExist:
 #            pass
 
-        # Test that URL is reachable
-        # NOTE: some domains don't support HEAD/OPTIONS requests...
-        try:
-            test_http_url(project_url)
-        except Exception as e:
-            response = {"error": True, "message": f"[ERROR][TEST] {str(e)}"}
-            return HttpResponse(json.dumps(response), status=400, content_type="application/json")
-
-        # Download initial project data
-        try:
-            if project_vcs == 'git':
-                log_data, log_hash, log_subject, tags_list = download_git_log(project_url, branch=project_branch)
-            elif project_vcs == 'hg':
-                # TODO
-                response = {"error": True, "message": f"[ERROR] Mercurial download not supported"}
-                return HttpResponse(json.dumps(response), status=400, content_type="application/json")
-            else:
-                response = {"error": True, "message": f"[ERROR] Invalid VCS option: {project_vcs}"}
-                return HttpResponse(json.dumps(response), status=400, content_type="application/json")
-        except Exception as e:
-            response = {"error": True, "message": f"[ERROR] {str(e)}"}
-            return HttpResponse(json.dumps(response), status=400, content_type="application/json")
-
         project_name = os.path.basename(project_url.rstrip('/'))
         project = Project(
             name=project_name,
@@ -905,37 +879,13 @@ def new_project(request):
         # Set project private
         if not project_is_public:
             project.is_public = False
-        # Populate attributes from source download
-        if log_hash:
-            project.project_log_commit_hash = log_hash
-        if log_subject:
-            project.project_log_commit_preview = log_subject
-        # Get time/author from last entry
-        if log_data:
-            latest_commit = log_data.splitlines()[-1].split('|')
-            project.project_log_commit_time = make_aware(datetime.utcfromtimestamp(int(latest_commit[0])))
         project.save()
 
-        # Load initial ProjectCaptions from VCS tags
-        if 'load_captions_from_tags' in data and data['load_captions_from_tags']:
-            try:
-                for timestamp, tag_name in tags_list:
-                    try:
-                        caption, created = ProjectCaption.objects.get_or_create(
-                            project=project,
-                            timestamp=timestamp,
-                            text=tag_name
-                        )
-                    except Exception as ex:
-                        logging.error("Failed to load caption: %s", str(ex))
-            except Exception as e:
-                logging.error("Failed to retrieve project tags: %s", str(e))
-
-        # Save new Gource log content
-        project.project_log.save('gource.log', ContentFile(log_data))
+        # Download initial project data (and ProjectCaptions from VCS tags) in background
+        fetch = project.queue_fetch(load_captions=bool(data.get('load_captions_from_tags')), user=request.user)
         response = {"error": False, "message": "Project saved successfully.",
-                    "data": {"id": project.id}}
-        return HttpResponse(json.dumps(response), status=201, content_type="application/json")
+                    "data": {"id": project.id, "fetch_id": fetch.id, "fetch_url": fetch.get_absolute_url()}}
+        return HttpResponse(json.dumps(response), status=202, content_type="application/json")
     context = {
         'document_title': f'New Project - {SITE_NAME}',
         'nav_page': 'new',
@@ -1019,7 +969,7 @@ def build_queue(request):
     queryset = ProjectBuild.objects.select_related('project')
     queryset = queryset.prefetch_related(
         Prefetch('project__builds', to_attr='_cached_latest_build',
-                 queryset=ProjectBuild.objects.exclude(content='').order_by('-created_at'))
+                 queryset=ProjectBuild.objects.filter(is_draft=False).exclude(content='').order_by('-created_at'))
     )
     # Filter by accessible projects
     projects_list = Project.objects.filter_permissions(request.user)
@@ -1129,12 +1079,12 @@ def fetch_log(request):
         test_time = time.monotonic() - start_time
 
         start_time = time.monotonic()
-        log_data, log_hash, log_subject, tags_list = download_git_log(user_url, branch="master")
+        log_data, log_hash, log_subject, tags_list, log_stats = download_git_snapshot(user_url, branch="master")
         log_time = time.monotonic() - start_time
         total_time = time.monotonic() - start_time
         post_time = time.monotonic()
 
-        log_info = analyze_gource_log(log_data)
+        log_info = log_stats.summary()
         project_days = (log_info['end_date'] - log_info['start_date']).days
         response = f"<b>URL:</b> <a href=\"{user_url}\" target=\"_blank\">{user_url}</a><br />"
         response += f"<b>Date Range:</b> {log_info['start_date']} -- {log_info['end_date']} ({project_days} days)<br />"
@@ -1164,7 +1114,7 @@ def fetch_tags(request):
 
     try:
         content = test_http_url(user_url)
-        tags_list = download_git_tags(user_url, branch="master")
+        tags_list = download_git_snapshot(user_url, branch="master").tags
         response = f"<b>URL:</b> <a href=\"{user_url}\" target=\"_blank\">{user_url}</a><br />"
         response += f"<b>Tags List:</b><br />"
         for timestamp, tag_name in tags_list:
@@ -1208,16 +1158,14 @@ def test_queue_video(request):
     try:
         # Download latest VCS branch; generate Gource log
         content = test_http_url(user_url)
-        log_data, log_hash, log_subject, tags_list = download_git_log(user_url, branch=project.project_branch)
+        log_data, log_hash, log_subject, tags_list, log_stats = download_git_snapshot(user_url, branch=project.project_branch,
+                                                                                       vcs=project.project_vcs, refresh=True)
         project.project_log_commit_hash = log_hash
         project.project_log_commit_preview = log_subject
         # Get time/author from last entry
         latest_commit = log_data.splitlines()[-1].split('|')
         project.project_log_commit_time = make_aware(datetime.utcfromtimestamp(int(latest_commit[0])))
-        if project.project_log:
-            #os.remove(project.project_log.path)
-            project.project_log.delete()
-        project.project_log.save('gource.log', ContentFile(log_data))
+        project.save_project_log(log_data, log_stats=log_stats)
 
         # Create new build (immediately in "queued" state)
         build = ProjectBuild(
@@ -1263,16 +1211,13 @@ def make_video(request):
     try:
         start_time = time.monotonic()
         content = test_http_url(user_url)
-        log_data, log_hash, log_subject, tags_list = download_git_log(user_url, branch="master")
+        log_data, log_hash, log_subject, tags_list, log_stats = download_git_snapshot(user_url, branch="master")
         project.project_log_commit_hash = log_hash
         project.project_log_commit_preview = log_subject
         # Get time/author from last entry
         latest_commit = log_data.splitlines()[-1].split('|')
         project.project_log_commit_time = make_aware(datetime.utcfromtimestamp(int(latest_commit[0])))
-        if project.project_log:
-            #os.remove(project.project_log.path)
-            project.project_log.delete()
-        project.project_log.save('gource.log', ContentFile(log_data))
+        project.save_project_log(log_data, log_stats=log_stats)
 
         # Create new build
         build = ProjectBuild(
@@ -1285,7 +1230,7 @@ def make_video(request):
         build.save()
         try:
             # Gource log
-            build.project_log.save('gource.log', ContentFile(log_data))
+            build.project_log.save('gource.log.gz', ContentFile(compress_gource_log(log_data.encode('utf-8'))))
 
             # Generate video
             #final_path = generate_gource_video(log_data, gource_options={'--seconds-per-day': 0.01})
@@ -1333,20 +1278,6 @@ def estimate_project_duration(request, project_id):
     project = get_object_or_404(queryset, **{'pk': project_id})
     latest_build = project.latest_build
 
-    with open(project.project_log.path, 'r') as _file:
-        data = _file.read()
-
-    added = 0
-    modded = 0
-    deleted = 0
-    lines = data.strip().split('\n')
-    for line in lines:
-        # <TIME>|<AUTHOR>|<MODIFICATION>|<PATH>
-        segments = line.split('|')
-        if segments[2] == 'A': added += 1
-        elif segments[2] == 'M': modded += 1
-        elif segments[2] == 'D': deleted += 1
-
     try:
         spd = float(request.GET.get('seconds-per-day', None))
     except:
@@ -1360,7 +1291,7 @@ def estimate_project_duration(request, project_id):
         'seconds-per-day': spd,
         'auto-skip-seconds': ass,
     }
-    duration = estimate_gource_video_duration(data, gource_options=gource_options)
+    duration = project.get_duration_calibration().apply(project.get_log_summary().estimate_duration(gource_options))
     td_duration = str(timedelta(seconds=int(duration)))
     response = {
         "duration": duration,
@@ -1375,19 +1306,11 @@ def estimate_video_duration(request, project_id):
     project = get_object_or_404(Project, **{'pk': project_id})
     latest_build = project.latest_build
 
-    with open(project.project_log.path, 'r') as _file:
-        data = _file.read()
-
-    added = 0
-    modded = 0
-    deleted = 0
-    lines = data.strip().split('\n')
-    for line in lines:
-        # <TIME>|<AUTHOR>|<MODIFICATION>|<PATH>
-        segments = line.split('|')
-        if segments[2] == 'A': added += 1
-        elif segments[2] == 'M': modded += 1
-        elif segments[2] == 'D': deleted += 1
+    # Cached statistics of project log
+    log_stats = project.get_log_summary().get_stats()
+    added = log_stats.actions['A']
+    modded = log_stats.actions['M']
+    deleted = log_stats.actions['D']
 
     try:
         spd = float(request.GET.get('spd', None))
@@ -1402,11 +1325,11 @@ def estimate_video_duration(request, project_id):
         'seconds-per-day': spd,
         'auto-skip-seconds': ass,
     }
-    duration = estimate_gource_video_duration(data, gource_options=gource_options)
+    duration = log_stats.estimate_duration(gource_options)
     from datetime import timedelta
     td_duration = str(timedelta(seconds=int(duration)))
 
-    log_info = analyze_gource_log(data)
+    log_info = log_stats.summary()
     project_days = (log_info['end_date'] - log_info['start_date']).days
     response = f"<b>URL:</b> <a href=\"{project.project_url}\" target=\"_blank\">{project.project_url}</a><br />"
     response += f"<b>Date Range:</b> {log_info['start_date']} -- {log_info['end_date']} ({project_days} days)<br />"
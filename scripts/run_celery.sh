@@ -2,4 +2,7 @@
 
 source env/bin/activate
 cd gource_studio
-celery -A gource_studio worker --loglevel=INFO
+# NOTE: Draft builds use their own queue ("drafts"), so they can also be
+#       handled by a separate worker: celery -A gource_studio worker -Q drafts
+# NOTE: Periodic tasks are scheduled separately (see `run_celery_beat.sh`)
+celery -A gource_studio worker -Q celery,drafts --loglevel=INFO
@@ -0,0 +1,6 @@
+#!/bin/bash
+
+source env/bin/activate
+cd gource_studio
+# NOTE: Run only one scheduler, however many workers are running
+celery -A gource_studio beat --loglevel=INFO
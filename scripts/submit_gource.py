@@ -22,12 +22,14 @@ DEFAULT_PROJECT_SLUG = None      #  Project Slug
 import argparse
 from datetime import datetime, timezone
 import getpass
+import hashlib
 import json
 import os
 import shutil
 import subprocess
 import sys
 import tempfile
+import urllib.error
 import urllib.parse
 import urllib.request
 
@@ -37,7 +39,7 @@ CAPTIONS_TEMPLATE = "{base_url}/api/v1/projects/{project_id}/captions/"
 QUEUE_TEMPLATE = "{base_url}/api/v1/projects/{project_id}/builds/new/"
 
 
-def main(host, token, project_path, *, project_id=None, project_slug=None, queue_build=False, submit_tags=False):
+def main(host, token, project_path, *, project_id=None, project_slug=None, queue_build=False, submit_tags=False, full_upload=False):
     if not os.path.isdir(project_path):
         raise RuntimeError(f"Path not valid directory: {project_path}")
     project_type = determine_project_type(project_path)
@@ -80,26 +82,54 @@ def main(host, token, project_path, *, project_id=None, project_slug=None, queue
             'project_log_commit_time': author_timestamp,
             'project_log_commit_preview': commit_subject
         }
-        with open(output_log, 'r') as f:
-            put_data['project_log'] = f.read()
         log_url = LOG_TEMPLATE.format(**{
             "base_url": server_host,
             "project_id": project_id if project_id else project_slug
         })
 
-        print("++ Sending update to server...", end='')
-        sys.stdout.flush()
-        # Submit using Token authentication
-        req = urllib.request.Request(log_url, method="PUT", data=json.dumps(put_data).encode('utf-8'), headers={
-            'Content-Type': 'application/json',
-            'Authorization': f'Token {token}'
-        })
-        res = urllib.request.urlopen(req)
-        if res.status not in [200, 201]:
-            print("ERROR")
-            print(f"  !! Unexpected HTTP response: {res.status} {res.reason}", file=sys.stderr)
-            return
-        print(" DONE")
+        # Only send new log entries if server log is unchanged copy of local log
+        log_delta = None
+        if not full_upload:
+            try:
+                log_delta = get_log_delta(output_log, get_project_log_info(log_url, token))
+            except Exception as e:
+                print(f"NOTICE: Could not determine log changes ({str(e)}); sending full log.")
+
+        res = None
+        if log_delta is not None:
+            base_sha256, delta_data = log_delta
+            if not delta_data:
+                # Log unchanged, but commit details may still need updating
+                print("++ Project log already up to date; sending commit details...", end='')
+                sys.stdout.flush()
+                res = urllib.request.urlopen(_json_request(log_url, "PUT", token, put_data))
+            else:
+                print(f"++ Sending update to server ({len(delta_data)} bytes of new entries)...", end='')
+                sys.stdout.flush()
+                try:
+                    res = urllib.request.urlopen(_json_request(log_url, "PUT", token, {
+                        **put_data,
+                        'project_log_delta': delta_data,
+                        'project_log_base': base_sha256,
+                    }))
+                except urllib.error.HTTPError as e:
+                    if e.code != 409:
+                        raise
+                    # Server log changed since check
+                    print(" CONFLICT")
+                    log_delta = None
+        if log_delta is None:
+            with open(output_log, 'r') as f:
+                put_data['project_log'] = f.read()
+            print("++ Sending update to server...", end='')
+            sys.stdout.flush()
+            res = urllib.request.urlopen(_json_request(log_url, "PUT", token, put_data))
+        if res is not None:
+            if res.status not in [200, 201]:
+                print("ERROR")
+                print(f"  !! Unexpected HTTP response: {res.status} {res.reason}", file=sys.stderr)
+                return
+            print(" DONE")
         #shutil.copyfile(output_log, f'./{os.path.basename(output_log)}')
 
         if submit_tags:
@@ -163,6 +193,47 @@ def main(host, token, project_path, *, project_id=None, project_slug=None, queue
             os.unlink(output_log)
 
 
+def _json_request(url, method, token, data=None):
+    "Return new JSON API request (using Token authentication)"
+    return urllib.request.Request(url, method=method,
+                                  data=json.dumps(data).encode('utf-8') if data is not None else None,
+                                  headers={
+                                      'Content-Type': 'application/json',
+                                      'Authorization': f'Token {token}'
+                                  })
+
+
+def get_project_log_info(log_url, token):
+    "Fetch current project log details (SHA-256 hash, size) from server"
+    res = urllib.request.urlopen(_json_request(log_url, "GET", token))
+    return json.loads(res.read().decode('utf-8'))
+
+
+def get_log_delta(log_path, log_info):
+    """
+    Compare local log with server log details and return new entries.
+
+    Returns (server SHA-256, new log data) if server log matches the start
+    of local log, otherwise None (full upload required).
+    """
+    base_sha256 = log_info.get('sha256')
+    base_size = log_info.get('size')
+    if not base_sha256 or base_size is None or base_size > os.path.getsize(log_path):
+        return None
+    digest = hashlib.sha256()
+    with open(log_path, 'rb') as f:
+        remaining = base_size
+        while remaining:
+            chunk = f.read(min(remaining, 1024*1024))
+            if not chunk:
+                return None
+            digest.update(chunk)
+            remaining -= len(chunk)
+        if digest.hexdigest() != base_sha256:
+            return None
+        return base_sha256, f.read().decode('utf-8')
+
+
 def generate_log(project_path, output_path):
     #gource --output-custom-log <LOGFILE> [PROJECT_DIR]
     p1 = subprocess.Popen([get_gource_path(), '--output-custom-log', output_path, project_path],
@@ -334,6 +405,9 @@ the --env-file argument.
 
 Run from the root directory of your project, or specify a path from the command line.
 This will detect the VCS used and generate a Gource log file to upload.
+
+If the server already has an earlier copy of the same log, only the new entries
+are sent and appended (use --full to always upload the complete log).
 """, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("path", metavar="PROJECT_DIR", nargs='?', help="Root directory path (default=cwd)")
     parser.add_argument("--host", metavar="HOST", type=str, required=False, help="Full URL to Gource Studio server")
@@ -344,6 +418,7 @@ This will detect the VCS used and generate a Gource log file to upload.
     parser.add_argument("--env-file", metavar="FILE", type=str, required=False, help="Read in a file of environment variables")
     parser.add_argument("--with-tags", action="store_true", help="Submit project tags as video captions")
     parser.add_argument("--queue-build", action="store_true", help="Queue a new video build using current settings")
+    parser.add_argument("--full", action="store_true", help="Always upload full log (instead of only new entries)")
     args = parser.parse_args()
 
     # Determine project path
@@ -406,5 +481,7 @@ This will detect the VCS used and generate a Gource log file to upload.
         main_kwargs['submit_tags'] = True
     if args.queue_build:
         main_kwargs['queue_build'] = True
+    if args.full:
+        main_kwargs['full_upload'] = True
 
     main(**main_kwargs)
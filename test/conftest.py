@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    # Tests run without a Redis server, so use a process-local cache
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    # Keep files saved by tests (builds, blobs, avatars) out of the real MEDIA_ROOT
+    settings.MEDIA_ROOT = tmp_path / "media"
+    return settings.MEDIA_ROOT
@@ -1,4 +1,6 @@
 from datetime import datetime, timedelta
+import gzip
+from io import StringIO
 import json
 import os
 from pprint import pprint
@@ -7,15 +9,20 @@ from unittest.mock import patch
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.utils import timezone
 import pytest
 
 from gource_studio.core.constants import PROJECT_OPTION_DEFAULTS
+from gource_studio.core.importer import import_projects
 from gource_studio.core.models import (
     Project,
     ProjectCaption,
     ProjectOption,
 )
+from gource_studio.core.tasks import fetch_project_log
+from gource_studio.core.utils import iter_gource_log
 
 TEST_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ASSETS_PATH = os.path.join(TEST_ROOT, "assets")
@@ -27,7 +34,7 @@ DEFAULT_OPTIONS_COUNT = len(PROJECT_OPTION_DEFAULTS)
 def _pass(*args, **kwargs):
     return True
 
-def _fake_download_git_log(project_url, branch="master"):
+def _fake_download_git_log(project_url, branch="master", log_stats=None, dest_path=None):
     log_data = "1296068768|cameronmcefee|A|/README\n" \
                "1315975361|Johnneylee Jack Rollins|M|/README"
     log_hash = "7fd1a60b01f91b314f59955a4e4d4e80d8edf11d"
@@ -35,6 +42,8 @@ def _fake_download_git_log(project_url, branch="master"):
     tags_list = [
         [timezone.make_aware(datetime(2011,1,26,19,6,8)), "1.0.0"]
     ]
+    if log_stats is not None:
+        log_stats.update(iter_gource_log(log_data))
     return log_data, log_hash, log_subject, tags_list
 
 
@@ -97,19 +106,50 @@ class TestProjectsAPI:
         assert req.data['project_log']['url'] is None  # No log data
 
         # Test creating project with "remote" download
-        with patch('gource_studio.core.api.views.validate_project_url', _pass):
-            with patch('gource_studio.core.api.views.test_http_url', _pass):
-                with patch('gource_studio.core.api.views.download_git_log', _fake_download_git_log):
-                    post_data['project_url'] = 'http://example.com'
-                    post_data['project_url_active'] = True
-                    post_data['load_captions_from_tags'] = True
-                    req = client.post('/api/v1/projects/', post_data)
-                    assert req.status_code == 201
-                    # - Check log data loaded
-                    assert req.data['project_log'] is not None
-                    assert req.data['project_log']['commit_time'] is not None
-                    assert req.data['project_log']['commit_hash'] is not None
-                    assert req.data['project_log']['commit_preview'] is not None
+        # - Log is fetched in background (run synchronously here)
+        with patch('gource_studio.core.api.views.validate_project_url', _pass), \
+                patch('gource_studio.core.tasks.test_http_url', _pass), \
+                patch('gource_studio.core.utils.download_git_log', _fake_download_git_log), \
+                patch.object(fetch_project_log, 'delay', fetch_project_log):
+            post_data['project_url'] = 'http://example.com'
+            post_data['project_url_active'] = True
+            post_data['load_captions_from_tags'] = True
+            req = client.post('/api/v1/projects/', post_data)
+            assert req.status_code == 202
+            assert req['Location'] == req.data['fetch']['url']
+            project_id = req.data['id']
+            # - Poll fetch status
+            req = client.get(req.data['fetch']['url'])
+            assert req.status_code == 200
+            assert req.data['status'] == 'completed'
+            assert req.data['commit_hash'] == "7fd1a60b01f91b314f59955a4e4d4e80d8edf11d"
+            assert req.data['duration'] is not None
+            # - Check log data loaded
+            req = client.get(f'/api/v1/projects/{project_id}/')
+            assert req.data['project_log'] is not None
+            assert req.data['project_log']['commit_time'] is not None
+            assert req.data['project_log']['commit_hash'] is not None
+            assert req.data['project_log']['commit_preview'] is not None
+            assert ProjectCaption.objects.filter(project_id=project_id).count() == 1
+
+            # - Refetch log and queue build (build creation itself not run here)
+            with patch('gource_studio.core.models.Project.create_build') as create_build:
+                create_build.return_value = None
+                req = client.post(f'/api/v1/projects/{project_id}/builds/new/', {"refetch_log": True})
+                assert req.status_code == 202
+                assert req.data['queue_build'] is True
+                assert create_build.call_count == 1
+
+        # Follow-up action reuses the same VCS snapshot (no second clone)
+        download_calls = []
+        def _fail_download_git_log(*args, **kwargs):
+            download_calls.append(args)
+            raise RuntimeError("Unexpected download")
+        with patch('gource_studio.core.api.views.test_http_url', _pass):
+            with patch('gource_studio.core.utils.download_git_log', _fail_download_git_log):
+                req = client.post(f"/api/v1/projects/{project_id}/actions/", {"action": "load_captions_from_tags"})
+                assert req.status_code == 201
+                assert download_calls == []
 
         # Invalid options
         # - No name
@@ -356,3 +396,167 @@ class TestProjectsAPI:
         req = client.post(f'/api/v1/projects/{project.id}/members/', json.dumps(post_data), content_type="application/json")
         assert req.status_code == 400
         assert 'Invalid username' in str(req.data)
+
+    def test_project_log_delta_api(self, client):
+        user1 = self._create_user("user1", password="pass1")
+        project = Project.objects.create(name="test", project_vcs="git", created_by=user1)
+        log_data, _, _, _ = _fake_download_git_log(None)
+        client.login(username="user1", password="pass1")
+
+        # No log to append to yet
+        put_data = {'project_log_delta': "1315975362|foo|D|/README\n", 'project_log_base': 'abc'}
+        req = client.put(f'/api/v1/projects/{project.id}/project_log/', json.dumps(put_data), content_type="application/json")
+        assert req.status_code == 409
+
+        req = client.put(f'/api/v1/projects/{project.id}/project_log/', json.dumps({'project_log': log_data}), content_type="application/json")
+        assert req.status_code == 201
+        req = client.get(f'/api/v1/projects/{project.id}/project_log/')
+        assert req.status_code == 200
+        base_sha256 = req.data['sha256']
+        assert req.data['size'] == len(log_data)
+
+        # Base log hash required (and must match current log)
+        put_data = {'project_log_delta': "1315975362|foo|D|/README\n"}
+        req = client.put(f'/api/v1/projects/{project.id}/project_log/', json.dumps(put_data), content_type="application/json")
+        assert req.status_code == 400
+        put_data['project_log_base'] = "0" * 64
+        req = client.put(f'/api/v1/projects/{project.id}/project_log/', json.dumps(put_data), content_type="application/json")
+        assert req.status_code == 409
+        put_data['project_log_base'] = base_sha256
+        req = client.put(f'/api/v1/projects/{project.id}/project_log/', json.dumps(put_data), content_type="application/json")
+        assert req.status_code == 200
+        assert req.data['sha256'] != base_sha256
+        project.refresh_from_db()
+        assert project.analyze_log()['num_changes'] == 3
+        # - Previous base no longer valid
+        req = client.put(f'/api/v1/projects/{project.id}/project_log/', json.dumps(put_data), content_type="application/json")
+        assert req.status_code == 409
+
+        # Commit details updated without log changes
+        put_data = {'project_log_commit_hash': "abc123", 'project_log_commit_preview': "Nothing new"}
+        req = client.put(f'/api/v1/projects/{project.id}/project_log/', json.dumps(put_data), content_type="application/json")
+        assert req.status_code == 200
+        project.refresh_from_db()
+        assert project.project_log_commit_hash == "abc123"
+        assert project.project_log_commit_preview == "Nothing new"
+
+        # Compressed log sent as stored (if accepted by client)
+        req = client.get(f'/api/v1/projects/{project.id}/project_log/download/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert req.status_code == 200
+        assert req['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(b''.join(req.streaming_content)).decode('utf-8') == log_data + "\n1315975362|foo|D|/README\n"
+        req = client.get(f'/api/v1/projects/{project.id}/project_log/download/')
+        assert req.status_code == 200
+        assert not req.has_header('Content-Encoding')
+        assert b''.join(req.streaming_content).decode('utf-8') == log_data + "\n1315975362|foo|D|/README\n"
+
+    def test_projects_import_api(self, client, tmp_path):
+        manifest = [
+            {"project_url": "https://github.com/octocat/Hello-World", "options": {"seconds-per-day": 0.25}},
+            {"project_url": "https://github.com/octocat/Spoon-Knife", "name": "Spoon", "is_public": False},
+            {"project_url": "https://example.com/octocat/Hello-World"},
+            {"project_url": "https://github.com/octocat/Hello-World"},
+            {"project_url": "https://github.com/octocat/Hello-World", "options": {"not-an-option": 1}},
+        ]
+        req = client.post('/api/v1/projects/import/', json.dumps(manifest), content_type="application/json")
+        assert req.status_code == 403
+
+        self._create_user("user1", password="pass1")
+        client.login(username="user1", password="pass1")
+        req = client.post('/api/v1/projects/import/', json.dumps({"projects": "foo"}), content_type="application/json")
+        assert req.status_code == 400
+
+        # Logs are queued for background download
+        with patch.object(fetch_project_log, 'delay') as delay:
+            req = client.post('/api/v1/projects/import/', json.dumps({"projects": manifest}), content_type="application/json")
+            assert req.status_code == 202
+            assert delay.call_count == 2
+        results = req.data['results']
+        assert [r['status'] for r in results] == ['queued', 'queued', 'invalid', 'exists', 'invalid']
+        assert results[3]['project_id'] == results[0]['project_id']
+        assert results[0]['fetch_url'].endswith(f"/projects/{results[0]['project_id']}/fetches/{results[0]['fetch_id']}")
+        project = Project.objects.get(id=results[0]['project_id'])
+        assert project.name == "Hello-World"
+        assert project.created_by.username == "user1"
+        assert project.options.count() == DEFAULT_OPTIONS_COUNT + 1
+        assert project.options.get(name='seconds-per-day').value == "0.25"
+        assert not Project.objects.get(id=results[1]['project_id']).is_public
+
+        # Management command downloads logs using thread pool
+        manifest_path = tmp_path / "manifest.json"
+        manifest_path.write_text(json.dumps([
+            {"project_url": "https://gitlab.com/octocat/Hello-World", "load_captions_from_tags": True},
+            {"project_url": "https://gitlab.com/octocat/Spoon-Knife"},
+        ]))
+        output = StringIO()
+        with patch('gource_studio.core.importer.test_http_url', _pass), \
+                patch('gource_studio.core.utils.download_git_log', _fake_download_git_log):
+            call_command('import_projects', str(manifest_path), '--workers', '2', stdout=output)
+        assert output.getvalue().count(": fetched") == 2
+        assert "Summary: 2 fetched" in output.getvalue()
+        project = Project.objects.get(project_url="https://gitlab.com/octocat/Hello-World")
+        assert project.project_log_commit_hash == "7fd1a60b01f91b314f59955a4e4d4e80d8edf11d"
+        assert project.analyze_log()['num_changes'] == 2
+        assert project.captions.count() == 1
+        assert project.options.count() == DEFAULT_OPTIONS_COUNT
+
+        # Slugs must be unique within the manifest
+        results = import_projects([
+            {"project_url": "https://github.com/octocat/one", "project_slug": "same"},
+            {"project_url": "https://github.com/octocat/two", "project_slug": "same"},
+        ], fetch_logs=False)
+        assert [r['status'] for r in results] == ['created', 'invalid']
+        assert "project_slug" in results[1]['error']
+
+        # Conflicting inserts are reported without partial creation
+        with patch.object(Project.objects, 'bulk_create', side_effect=IntegrityError("conflict")):
+            results = import_projects([{"project_url": "https://github.com/octocat/three"}], fetch_logs=False)
+        assert [r['status'] for r in results] == ['errored']
+        assert not Project.objects.filter(project_url="https://github.com/octocat/three").exists()
+
+    def test_project_duration_api(self, client):
+        user1 = self._create_user("user1", password="pass1")
+        project = Project.objects.create(name="test", project_vcs="git", created_by=user1)
+        log_data, _, _, _ = _fake_download_git_log(None)
+        project.save_project_log(log_data)
+
+        gource_options = "seconds-per-day=2&auto-skip-seconds=3"
+        req = client.get(f'/api/v1/projects/{project.id}/utils/duration/?{gource_options}')
+        assert req.status_code == 200
+        assert req.data['duration'] == 14.0
+
+        # Grid of estimates (using URL params)
+        req = client.get(f'/api/v1/projects/{project.id}/utils/duration/batch/?seconds-per-day=1,2&auto-skip-seconds=3')
+        assert req.status_code == 200
+        assert [r['duration'] for r in req.data['results']] == [12.0, 14.0]
+        req = client.get(f'/api/v1/projects/{project.id}/utils/duration/batch/?seconds-per-day=1,2&auto-skip-seconds=1,3')
+        assert req.status_code == 200
+        assert len(req.data['results']) == 4
+        assert req.data['results'][3] == {
+            "seconds-per-day": 2.0,
+            "auto-skip-seconds": 3.0,
+            "duration": 14.0,
+            "duration_str": "0:00:14",
+        }
+        req = client.get(f'/api/v1/projects/{project.id}/utils/duration/batch/?seconds-per-day=foo')
+        assert req.status_code == 400
+
+        # Limited to date range (only first entry)
+        req = client.get(f'/api/v1/projects/{project.id}/utils/duration/?{gource_options}&stop-date=2011-02-01')
+        assert req.status_code == 200
+        assert req.data['duration'] == 7.0
+        req = client.get(f'/api/v1/projects/{project.id}/utils/duration/?{gource_options}&start-date=2012-01-01')
+        assert req.status_code == 400
+
+        # List of option pairs
+        client.login(username="user1", password="pass1")
+        post_data = {"options": [
+            {"seconds-per-day": 2, "auto-skip-seconds": 3},
+            {"seconds-per-day": 1, "auto-skip-seconds": 3},
+        ]}
+        req = client.post(f'/api/v1/projects/{project.id}/utils/duration/batch/', json.dumps(post_data), content_type="application/json")
+        assert req.status_code == 200
+        assert [r['duration'] for r in req.data['results']] == [14.0, 12.0]
+        post_data = {"options": [{"seconds-per-day": 0}]}
+        req = client.post(f'/api/v1/projects/{project.id}/utils/duration/batch/', json.dumps(post_data), content_type="application/json")
+        assert req.status_code == 400
@@ -1,21 +1,40 @@
 from datetime import datetime, timedelta
+import hashlib
 import os
+import time
+from unittest.mock import patch
 
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import override_settings
 from django.utils import timezone
 import pytest
 
-from gource_studio.core.constants import PROJECT_OPTION_DEFAULTS
+from gource_studio.core.constants import ENCODER_PROFILE_OPTION, PROJECT_OPTION_DEFAULTS
 from gource_studio.core.models import (
+    LogSummary,
     Project,
+    ProjectBuild,
     ProjectCaption,
+    ProjectFetch,
     ProjectOption,
     ProjectUserAvatar,
     ProjectUserAvatarAlias,
     UserAvatar,
     UserAvatarAlias,
+    copy_field_file,
 )
+from gource_studio.core.tasks import (
+    cleanup_build_work_dirs,
+    cleanup_draft_builds,
+    cleanup_log_summaries,
+    fetch_project_log,
+    generate_gource_build,
+    refresh_project_log,
+    schedule_project_refreshes,
+)
+from gource_studio.core.utils import GourceLogStats, compress_gource_log, host_slot, is_gzip_file, open_gource_log, try_lock_directory
 
 TEST_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ASSETS_PATH = os.path.join(TEST_ROOT, "assets")
@@ -115,6 +134,145 @@ class TestProjects:
             'users': ['cameronmcefee', 'Johnneylee Jack Rollins']
         }
 
+    def test_project_log_summary(self):
+        project = Project.objects.create(name="test")
+        self._add_sample_log(project)
+        assert project.project_log_summary is None
+
+        # Summary is computed on first use and shared by identical logs
+        summary = project.get_log_summary()
+        assert summary.sha256 == LogSummary.objects.get().sha256
+        assert summary.summary() == project.analyze_log()
+        assert summary.estimate_duration() == 12.0
+        build = project.create_build(defer_queue=True)
+        assert build.get_log_summary() == summary
+        assert LogSummary.objects.count() == 1
+
+        # Replacing log content uses a new summary
+        with open(project.project_log.path, 'r') as f:
+            log_data = f.read()
+        project.save_project_log(log_data + "1315975362|foo|D|/README\n")
+        assert project.get_log_summary() != summary
+        assert project.analyze_log()['num_changes'] == 3
+        assert 'foo' in project.analyze_log()['users']
+        # - Build snapshot unchanged
+        assert build.analyze_log()['num_changes'] == 2
+
+        # Logs rewritten in place (e.g. same size) are detected
+        new_summary = project.get_log_summary()
+        with open(project.project_log.path, 'wb') as f:
+            f.write(compress_gource_log((log_data + "1315975362|bar|D|/README\n").encode('utf-8')))
+        stat = os.stat(project.project_log.path)
+        os.utime(project.project_log.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert project.get_log_summary() != new_summary
+        assert project.get_log_summary().size == new_summary.size
+        assert 'bar' in project.analyze_log()['users']
+
+        # Summaries no longer used by any project or build are removed
+        assert list(LogSummary.objects.unused(min_age=0)) == [new_summary]
+        assert cleanup_log_summaries() == 0
+        LogSummary.objects.filter(pk=new_summary.pk).update(created_at=timezone.now() - timedelta(days=2))
+        assert cleanup_log_summaries() == 1
+        assert LogSummary.objects.count() == 2
+
+        # Invalid logs are rejected
+        with pytest.raises(ValueError):
+            project.save_project_log("foo")
+
+    def test_project_log_columns(self, django_capture_on_commit_callbacks):
+        project = Project.objects.create(name="test")
+        self._add_sample_log(project)
+
+        with project.get_log_columns() as columns:
+            assert len(columns) == 2
+            assert columns.sha256 == project.get_log_summary().sha256
+            assert list(columns.timestamps) == [1296068768, 1315975361]
+            assert columns.user_names == ['cameronmcefee', 'Johnneylee Jack Rollins']
+            assert columns.path_names == ['/README']
+            assert columns.date_range() == (datetime(2011, 1, 26, 19, 6, 8), datetime(2011, 9, 14, 4, 42, 41))
+            assert columns.user_change_counts() == {'cameronmcefee': 1, 'Johnneylee Jack Rollins': 1}
+            assert len(columns.daily_change_counts()) == 2
+            assert [e.action for e in columns.iter_entries()] == ['A', 'M']
+            assert columns.day_gap_counts() == project.get_log_summary().get_stats().day_gap_counts
+
+        # Sidecar is rebuilt when log changes
+        with open(project.project_log.path, 'r') as f:
+            log_data = f.read()
+        project.save_project_log(log_data + "1315975362|foo|D|/README\n")
+        with project.get_log_columns() as columns:
+            assert len(columns) == 3
+            assert columns.user_change_counts()['foo'] == 1
+            columns_path = columns.path
+
+        # ...and removed along with project
+        assert os.path.isdir(columns_path)
+        with django_capture_on_commit_callbacks(execute=True):
+            project.delete()
+        assert not os.path.isdir(columns_path)
+
+    def test_project_log_append(self):
+        project = Project.objects.create(name="test")
+        self._add_sample_log(project)
+        summary = project.get_log_summary()
+        with project.get_log_columns() as columns:
+            assert len(columns) == 2
+
+        # New entries update existing summary stats and columns sidecar
+        new_summary = project.append_project_log("1315975362|foo|D|/README\n1315975363|foo|A|/LICENSE")
+        assert new_summary != summary
+        assert new_summary.size == os.path.getsize(project.project_log.path)
+        assert project.get_log_summary() == new_summary
+        assert project.analyze_log()['num_changes'] == 4
+        assert 'foo' in project.analyze_log()['users']
+        with project.get_log_columns() as columns:
+            assert len(columns) == 4
+            assert columns.sha256 == new_summary.sha256
+            assert columns.path_names == ['/README', '/LICENSE']
+        with open(project.project_log.path, 'r') as f:
+            log_data = f.read()
+        assert log_data.endswith("1315975362|foo|D|/README\n1315975363|foo|A|/LICENSE\n")
+        # - Same result as parsing complete log
+        assert LogSummary.objects.get_or_create_for_log(log_data) == new_summary
+        assert new_summary.get_stats().to_dict() == GourceLogStats.from_log(log_data).to_dict()
+
+        # Invalid entries are rejected (log unchanged)
+        with pytest.raises(ValueError):
+            project.append_project_log("foo")
+        assert project.get_log_summary() == new_summary
+
+    def test_project_log_compressed(self):
+        project = Project.objects.create(name="test")
+        log_data = "1296068768|cameronmcefee|A|/README\n1315975361|Johnneylee Jack Rollins|M|/README\n"
+        project.save_project_log(log_data)
+        assert project.project_log.name.endswith('.gz')
+        assert is_gzip_file(project.project_log.path)
+        assert os.path.getsize(project.project_log.path) != len(log_data)
+
+        # Summary describes uncompressed contents
+        summary = project.get_log_summary()
+        assert summary.sha256 == hashlib.sha256(log_data.encode('utf-8')).hexdigest()
+        assert summary.size == len(log_data)
+        assert project.analyze_log()['num_changes'] == 2
+        with open_gource_log(project.project_log.path) as f:
+            assert f.read() == log_data
+
+        # Appended entries added as new compressed blocks
+        new_summary = project.append_project_log("1315975362|foo|D|/README")
+        log_data += "1315975362|foo|D|/README\n"
+        assert is_gzip_file(project.project_log.path)
+        assert new_summary.sha256 == hashlib.sha256(log_data.encode('utf-8')).hexdigest()
+        with open_gource_log(project.project_log.path) as f:
+            assert f.read() == log_data
+        with project.get_log_columns() as columns:
+            assert len(columns) == 3
+        assert project.get_log_index().size == len(log_data)
+        assert project.get_log_stats(start_date='2011-09-01').num_changes == 2
+
+        # Builds share compressed snapshot
+        build = project.create_build(defer_queue=True)
+        assert build.project_log.name.endswith('.gz')
+        assert build.analyze_log() == project.analyze_log()
+
     def test_project_options(self):
         # Project options generally map to Gource cmdline arguments
         #   --{name}={value}
@@ -286,9 +444,11 @@ class TestProjects:
         assert build1.build_audio.size == project.build_audio.size
         assert build1.build_logo.size == project.build_logo.size
         assert build1.build_background.size == project.build_background.size
-        assert build1.options.count() == (2 + DEFAULT_OPTIONS_COUNT)
-        assert [str(opt) for opt in build1.options.all()] == \
+        assert build1.options.count() == (2 + DEFAULT_OPTIONS_COUNT + 1)   # + Encoder profile
+        assert [str(opt) for opt in build1.options.exclude(name='encoder-profile')] == \
                [str(opt) for opt in project.options.all()]
+        assert build1.encoder_profile == 'standard'
+        assert build1.options.get(name='encoder-profile').value == 'standard'
         assert build1.captions.count() == 1
         assert [str(cpt) for cpt in build1.captions.all()] == \
                [str(cpt) for cpt in project.captions.all()]
@@ -314,10 +474,262 @@ class TestProjects:
         assert build3.project_captions.size == build2.project_captions.size
         assert build3.pk != build2.pk
         # Check against source ProjectBuild
-        assert build1.options.count() == (2 + DEFAULT_OPTIONS_COUNT) # Project has 1
+        assert build1.options.count() == (2 + DEFAULT_OPTIONS_COUNT + 1) # Project has 1
         assert [str(opt) for opt in build2.options.all()] == \
                [str(opt) for opt in build3.options.all()]
         assert build1.captions.count() == 1 # Project has 2
         assert [str(cpt) for cpt in build2.captions.all()] == \
                [str(cpt) for cpt in build3.captions.all()]
         assert project.builds.count() == 3
+
+    def test_project_build_blob_storage(self, django_capture_on_commit_callbacks):
+        # Build snapshot files are stored once per unique content
+        project = Project.objects.create(name="test", build_logo_resize=False)
+        self._add_sample_log(project)
+        sample_logo = os.path.join(ASSETS_PATH, "globe.png")
+        with open(sample_logo, 'rb') as f:
+            project.build_logo.save('globe.png', ContentFile(f.read()))
+
+        build1 = project.create_build(defer_queue=True)
+        # - Stored log found by its digest (project log not read again)
+        with patch('gource_studio.core.models.copy_field_file', wraps=copy_field_file) as mock_copy:
+            build2 = project.create_build(defer_queue=True)
+            assert [c.args[0].field.name for c in mock_copy.call_args_list] == ['build_logo']
+        build3 = build2.clone_build(defer_queue=True)
+        log_name = build1.project_log.name
+        assert log_name == f'blobs/{log_name[6:8]}/{project.get_log_summary().sha256}.log'
+        assert build2.project_log.name == log_name
+        assert build3.project_log.name == log_name
+        assert build1.build_logo.name.startswith('blobs/')
+        assert build3.build_logo.name == build1.build_logo.name
+        assert build1.project_log.storage.get_reference_count(log_name) == 3
+        with open(build3.project_log.path, 'rb') as f1, open(project.project_log.path, 'rb') as f2:
+            assert f1.read() == f2.read()
+
+        # Shared blobs kept until last reference removed
+        log_path = build1.project_log.path
+        with django_capture_on_commit_callbacks(execute=True):
+            build1.delete()
+            build2.delete()
+        assert os.path.isfile(log_path)
+        # - Recently used blobs kept (may be about to be shared again)
+        with django_capture_on_commit_callbacks(execute=True):
+            build3.delete()
+        assert os.path.isfile(log_path)
+        call_command('gc_blobs')
+        assert os.path.isfile(log_path)
+        call_command('gc_blobs', min_age=0)
+        assert not os.path.isfile(log_path)
+        build4 = project.create_build(defer_queue=True)
+        with override_settings(BLOB_MIN_AGE=0), django_capture_on_commit_callbacks(execute=True):
+            build4.delete()
+        assert not os.path.isfile(log_path)
+
+        # Unused blobs removed by garbage collection
+        orphan_name = build1.project_log.storage.save('orphan.log', ContentFile(b'orphan'))
+        call_command('gc_blobs', min_age=0)
+        assert not build1.project_log.storage.exists(orphan_name)
+
+    def test_project_build_duration_calibration(self):
+        project = Project.objects.create(name="test")
+        self._add_sample_log(project)
+        raw_estimate = project.estimate_video_duration(calibrated=False)
+        # - No past builds to calibrate from
+        assert project.estimate_video_duration() == raw_estimate
+
+        # Past builds were 2x (+1 second) longer than estimated,
+        # and took 3 seconds to build per second of video
+        now = timezone.now()
+        for estimate in [10.0, 20.0, 30.0]:
+            duration = int(estimate*2 + 1)
+            ProjectBuild.objects.create(project=project, status='completed', estimated_duration=estimate,
+                                        duration=duration, running_at=now - timedelta(seconds=duration*3),
+                                        completed_at=now)
+        # - Incremental builds (only rendering new log entries) are not sampled for build time
+        ProjectBuild.objects.create(project=project, status='completed', base_build=ProjectBuild.objects.first(),
+                                    duration=100, running_at=now - timedelta(seconds=1), completed_at=now)
+        calibration = project.get_duration_calibration()
+        assert calibration.samples == 3
+        assert calibration.slope == pytest.approx(2.0)
+        assert calibration.intercept == pytest.approx(1.0)
+        assert project.estimate_video_duration() == pytest.approx(raw_estimate*2 + 1)
+
+        # Progress of running build uses predicted build time
+        build = project.create_build(defer_queue=True)
+        build.status = 'running'
+        build.estimated_duration = 20.0
+        build.running_at = timezone.now() - timedelta(seconds=61.5)
+        assert build.get_expected_build_duration() == pytest.approx(123.0)
+        build.expected_build_time = build.get_expected_build_duration()
+        assert build.get_build_stage_percent() == 50
+
+    def test_project_build_requeue(self, tmp_path):
+        project = Project.objects.create(name="test")
+        self._add_sample_log(project)
+        with override_settings(BUILD_WORK_DIR=tmp_path):
+            build = project.create_build(defer_queue=True)
+            work_dir = build.get_work_dir()
+            assert work_dir == tmp_path / str(build.id)
+
+            # Only running/errored builds can be re-queued
+            assert not build.requeue_build()
+            build.status = 'running'
+            build.save()
+            with patch.object(generate_gource_build, 'delay') as delay:
+                call_command('requeue_builds', '--running')
+                delay.assert_called_once_with(build.id)
+            build.refresh_from_db()
+            assert build.status == 'queued'
+
+            # Build skipped while another worker holds its work directory
+            with try_lock_directory(work_dir) as acquired:
+                assert acquired
+                generate_gource_build(build.id)
+            build.refresh_from_db()
+            assert build.status == 'queued'
+
+            # Redelivered build errored after too many attempts (and re-queued)
+            build.status = 'running'
+            build.attempts = 3
+            build.save()
+            with override_settings(BUILD_MAX_ATTEMPTS=3):
+                generate_gource_build(build.id)
+            build.refresh_from_db()
+            assert build.status == 'errored'
+            assert "3 attempts" in build.error_description
+            with patch.object(generate_gource_build, 'delay'):
+                assert build.requeue_build()
+            assert build.attempts == 0
+
+            # Stale work directories removed, unless build is still queued/running
+            orphan_dir = tmp_path / "999999"
+            orphan_dir.mkdir()
+            old_time = time.time() - 2*24*60*60
+            for path in [work_dir, orphan_dir]:
+                os.utime(path, (old_time, old_time))
+            with override_settings(BUILD_WORK_DIR_MAX_AGE=24*60*60):
+                assert cleanup_build_work_dirs() == 1
+                assert work_dir.exists() and not orphan_dir.exists()
+                build.mark_errored()
+                assert cleanup_build_work_dirs() == 1
+                assert not work_dir.exists()
+            work_dir.mkdir()
+
+            # Work directory removed along with build
+            (work_dir / "manifest.json").write_text("{}")
+            build.delete()
+            assert not work_dir.exists()
+
+    def test_project_build_incremental_base(self):
+        project = Project.objects.create(name="test")
+        log_data = "1331047610|Alice|A|README\n1331047620|Bob|M|README\n"
+        project.save_project_log(log_data)
+        base_build = project.create_build(defer_queue=True)
+        base_build.status = 'completed'
+        base_build.content.save('video.mp4', ContentFile(b'video'))
+
+        # No new log entries
+        assert project.create_build(defer_queue=True, incremental=True).base_build is None
+        ProjectBuild.objects.exclude(id=base_build.id).delete()
+
+        # New entries appended to log
+        project.save_project_log(log_data + "1331047630|Alice|A|LICENSE\n")
+        build = project.create_build(defer_queue=True, incremental=True)
+        assert build.base_build == base_build
+        assert project.create_build(defer_queue=True).base_build is None
+
+        # Changed options require full render
+        option = project.options.first()
+        option.value = option.value + '0'
+        option.save()
+        assert project.create_build(defer_queue=True, incremental=True).base_build is None
+        option.delete()
+
+        # Rewritten history (earlier log not a prefix)
+        project.save_project_log("1331047610|Carol|A|README\n1331047630|Alice|A|LICENSE\n")
+        assert project.create_build(defer_queue=True, incremental=True).base_build is None
+
+    @override_settings(DRAFT_BUILD_QUEUE='drafts', DRAFT_BUILD_MAX_AGE=60*60)
+    def test_project_build_draft(self):
+        project = Project.objects.create(name="test", video_size='1920x1080', encoder_profile='archival')
+        self._add_sample_log(project)
+        with patch.object(generate_gource_build, 'apply_async') as apply_async:
+            draft = project.create_build(draft=True)
+            apply_async.assert_called_once_with((draft.id,), queue='drafts')
+        assert draft.is_draft
+        assert draft.video_size == '1024x576'
+        assert draft.encoder_profile == 'draft'
+        assert draft.options.get(name=ENCODER_PROFILE_OPTION).value == 'draft'
+
+        # Completed drafts are not the latest build of project
+        draft.status = 'completed'
+        draft.content.save('video.mp4', ContentFile(b'video'))
+        assert project.latest_build is None
+        assert project.latest_draft_build == draft
+        assert Project.objects.with_latest_build().get(id=project.id).latest_build is None
+        assert not project.has_build_waiting
+
+        # Clones of drafts (e.g. audio remix) are drafts too
+        with patch.object(generate_gource_build, 'apply_async') as apply_async:
+            clone = draft.clone_build(remix_audio=None)
+            apply_async.assert_called_once_with((clone.id,), queue='drafts')
+        assert clone.is_draft
+        clone.delete()
+
+        # New draft replaces previous (finished) one
+        new_draft = project.create_build(defer_queue=True, draft=True)
+        assert not ProjectBuild.objects.filter(id=draft.id).exists()
+
+        # Expired drafts removed periodically
+        new_draft.status = 'errored'
+        new_draft.save()
+        assert cleanup_draft_builds() == 0
+        ProjectBuild.objects.filter(id=new_draft.id).update(created_at=timezone.now() - timedelta(hours=2))
+        assert cleanup_draft_builds() == 1
+        assert project.builds.count() == 0
+
+    @override_settings(PROJECT_REFRESH_INTERVAL=600, PROJECT_REFRESH_AUTO_BUILD=True)
+    def test_project_refresh(self):
+        project = Project.objects.create(name="test", project_url="https://github.com/octocat/Hello-World",
+                                         project_url_active=True)
+        self._add_sample_log(project)
+        project.save()
+        Project.objects.create(name="inactive", project_url="https://github.com/octocat/Spoon-Knife")
+
+        # Checks are spread across refresh interval
+        with patch.object(refresh_project_log, 'apply_async') as apply_async:
+            assert schedule_project_refreshes() == 1
+            (args,), kwargs = apply_async.call_args
+            assert args == (project.id,)
+            assert 0 <= kwargs['countdown'] < 600
+
+        # Remote head unchanged
+        with patch('gource_studio.core.tasks.get_vcs_remote_head', return_value=project.project_log_commit_hash):
+            assert refresh_project_log(project.id) is None
+        assert not ProjectFetch.objects.exists()
+
+        # Remote head moved (fetch + build queued once)
+        with patch('gource_studio.core.tasks.get_vcs_remote_head', return_value="0"*40), \
+                patch.object(fetch_project_log, 'delay') as delay:
+            fetch_id = refresh_project_log(project.id)
+            delay.assert_called_once_with(fetch_id)
+            fetch = ProjectFetch.objects.get(id=fetch_id)
+            assert fetch.status == 'queued'
+            assert fetch.queue_build
+            assert refresh_project_log(project.id) is None
+
+        # Concurrency limit per host
+        with host_slot("github.com", limit=1) as acquired:
+            assert acquired
+            with host_slot("github.com", limit=1) as acquired_again:
+                assert not acquired_again
+            with host_slot("gitlab.com", limit=1) as acquired_other:
+                assert acquired_other
+        with host_slot("github.com", limit=1) as acquired:
+            assert acquired
+
+        # Fetch given up once all retries used (host slots still busy)
+        with host_slot("github.com", limit=1), override_settings(PROJECT_REFRESH_HOST_CONCURRENCY=1):
+            fetch_project_log.apply(args=(fetch_id,), retries=fetch_project_log.max_retries)
+        fetch.refresh_from_db()
+        assert fetch.status == 'errored'
@@ -1,5 +1,14 @@
 from datetime import datetime, timedelta
+import collections
+import gzip
+import hashlib
+from io import BytesIO
+import math
 import os
+from pathlib import Path
+import shutil
+import subprocess
+from unittest.mock import patch
 
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
@@ -8,21 +17,57 @@ from django.utils import timezone
 import pytest
 
 from gource_studio.core.utils import (
+    GZIP_BLOCK_SIZE,
+    GourceLogColumns,
+    GourceLogDigest,
+    GourceLogIndex,
+    GourceLogStats,
+    add_background_audio,
+    append_gource_log,
+    append_gource_log_columns,
     analyze_gource_log,
+    compress_gource_log,
+    copy_ppm_frames,
+    download_git_snapshot,
+    download_git_tags,
+    estimate_duration_from_day_gaps,
+    estimate_durations_from_day_gaps,
     estimate_gource_video_duration,
+    generate_gource_video,
+    evict_git_mirrors,
+    get_encoder_profile,
     get_executable_path,
     get_ffmpeg,
+    get_ffmpeg_encoder_args,
     get_ffmpeg_version,
     get_ffplay,
     get_ffprobe,
     get_git,
     get_git_version,
     get_gource,
+    get_gource_log_byte_range,
+    get_gource_log_size,
+    get_gource_pipe_format,
     get_gource_version,
+    get_gzip_blocks,
     get_mercurial,
     get_mercurial_version,
     get_xvfb_run,
+    git_mirror,
+    hg_mirror,
+    iter_git_gource_log,
+    iter_gource_log,
+    iter_hg_gource_log,
+    load_render_manifest,
+    open_gource_log_at,
+    retrieve_tags_from_hg_repo,
+    try_lock_directory,
     validate_project_url,
+    write_git_gource_log,
+    write_gource_log_columns,
+    write_gource_log_increment,
+    write_gource_log_segments,
+    write_gource_log_slice,
 )
 
 TEST_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -117,3 +162,588 @@ def test_estimate_gource_video_duration():
     assert estimate_gource_video_duration(data, {"seconds-per-day": 2.0}) == 14.0
 
 
+def test_estimate_duration_from_day_gaps():
+    # Single 231-day gap (Hello-World.log)
+    assert estimate_duration_from_day_gaps({231: 1}) == 12.0
+    assert estimate_duration_from_day_gaps({231: 1}, {"seconds-per-day": 2.0}) == 14.0
+    # No gaps (single day)
+    assert estimate_duration_from_day_gaps({}) == 6.0
+    # Gaps below auto-skip threshold (3 days) count each day
+    assert estimate_duration_from_day_gaps({1: 4, 2: 1}) == 1.0 + 6.0 + 5
+    assert estimate_duration_from_day_gaps({1: 4, 2: 1, 5: 2}) == 1.0 + 6.0 + (3.0+3.0)*2 + 5
+    assert estimate_duration_from_day_gaps({1: 4, 2: 1, 5: 2}, {"seconds-per-day": 0.5, "auto-skip-seconds": 1.0}) == \
+        0.5 + 0.5*4 + (0.5*2+1.0)*3 + 5
+    # Batch estimates match individual estimates
+    options_list = [{"seconds-per-day": spd, "auto-skip-seconds": ass}
+                    for spd in [0.1, 0.5, 1.0, 3.0] for ass in [0.5, 1.0, 3.0]]
+    day_gap_counts = {1: 40, 2: 10, 3: 5, 7: 3, 30: 2, 365: 1}
+    assert estimate_durations_from_day_gaps(day_gap_counts, options_list) == \
+        [estimate_duration_from_day_gaps(day_gap_counts, options) for options in options_list]
+
+    # Matches per-entry results on unsorted logs
+    data = "86400|a|A|/a\n432000|a|M|/a\n259200|b|M|/a\n518400|b|D|/a\n"
+    log_stats = GourceLogStats.from_log(data)
+    assert log_stats.day_gap_counts == {4: 1, 1: 1}
+    assert estimate_gource_video_duration(data) == 1.0 + 6.0 + 1.0 + 5
+
+
+
+
+def test_iter_gource_log():
+    sample_log = os.path.join(ASSETS_PATH, "Hello-World", "Hello-World.log")
+    entries = list(iter_gource_log(Path(sample_log)))
+    assert len(entries) == 2
+    assert entries[0].timestamp == 1296068768
+    assert entries[0].user == "cameronmcefee"
+    assert entries[0].action == "A"
+    assert entries[0].path == "/README"
+    assert entries[1].user == "Johnneylee Jack Rollins"
+
+    # Same results from file objects and strings (single pass for all stats)
+    with open(sample_log, 'r') as f:
+        log_stats = GourceLogStats.from_log(f)
+    with open(sample_log, 'r') as f:
+        assert log_stats.summary() == analyze_gource_log(f.read())
+    assert log_stats.actions == {'A': 1, 'M': 1, 'D': 0}
+    assert log_stats.estimate_duration() == 12.0
+
+    # Blank lines are ignored; malformed entries are not
+    assert len(list(iter_gource_log("1|a|A|/foo\n\n2|b|M|/foo\n"))) == 2
+    with pytest.raises(ValueError):
+        list(iter_gource_log("1|a|A"))
+    with pytest.raises(ValueError):
+        list(iter_gource_log("foo|a|A|/foo"))
+    with pytest.raises(ValueError):
+        analyze_gource_log("")
+
+
+def test_append_gource_log(tmp_path):
+    log_path = tmp_path / 'gource.log'
+    log_path.write_bytes(b"1|a|A|/a")
+    log_digest = append_gource_log(log_path, b"2|b|M|/a")
+    assert log_path.read_bytes() == b"1|a|A|/a\n2|b|M|/a\n"
+    assert (log_digest.sha256, log_digest.size) == (hashlib.sha256(log_path.read_bytes()).hexdigest(), 18)
+    assert log_digest.matches(log_path)
+
+    # Saved digest detects later changes to the log
+    log_digest.save(tmp_path / 'gource.log.sha256')
+    log_digest = GourceLogDigest.load(tmp_path / 'gource.log.sha256')
+    append_gource_log(log_path, b"3|c|D|/a\n")
+    assert not log_digest.matches(log_path)
+
+
+def test_compressed_gource_log_blocks(tmp_path):
+    log_data = b''.join(f"{1000000000 + idx}|user{idx % 7}|M|/src/file{idx}.py\n".encode('utf-8') for idx in range(10000))
+    log_path = tmp_path / 'gource.log.gz'
+    log_path.write_bytes(compress_gource_log(log_data))
+    assert gzip.decompress(log_path.read_bytes()) == log_data
+    blocks = get_gzip_blocks(log_path)
+    assert len(blocks) == math.ceil(len(log_data) / GZIP_BLOCK_SIZE)
+    assert get_gource_log_size(log_path) == len(log_data)
+
+    # Read from any offset (decompressing from block containing it)
+    for offset in [0, 1, GZIP_BLOCK_SIZE - 1, GZIP_BLOCK_SIZE, 3 * GZIP_BLOCK_SIZE + 123, len(log_data) - 1, len(log_data)]:
+        with open_gource_log_at(log_path, offset) as f:
+            assert f.read() == log_data[offset:]
+    # - Same byte range as uncompressed log
+    (tmp_path / 'gource.log').write_bytes(log_data)
+    gource_options = {'start-position': '0.5', 'stop-position': '0.75'}
+    start, stop = get_gource_log_byte_range(log_path, gource_options)
+    assert get_gource_log_byte_range(tmp_path / 'gource.log', gource_options) == (start, stop)
+    assert log_data[start - 1:start] == b'\n' and log_data[stop - 1:stop] == b'\n'
+
+    # Appended entries added as new blocks (existing blocks unchanged)
+    log_digest = append_gource_log(log_path, b"2000000000|foo|A|/foo")
+    assert get_gzip_blocks(log_path)[:len(blocks)] == blocks
+    assert gzip.decompress(log_path.read_bytes()) == log_data + b"2000000000|foo|A|/foo\n"
+    assert log_digest.size == len(log_data) + 22
+
+    # Logs compressed as a single member are still readable
+    log_path.write_bytes(gzip.compress(log_data))
+    assert get_gzip_blocks(log_path) is None
+    assert get_gource_log_size(log_path) == len(log_data)
+    with open_gource_log_at(log_path, 12345) as f:
+        assert f.read() == log_data[12345:]
+    append_gource_log(log_path, b"2000000000|foo|A|/foo\n")
+    assert gzip.decompress(log_path.read_bytes()) == log_data + b"2000000000|foo|A|/foo\n"
+
+
+def test_gource_log_columns_stats(tmp_path):
+    # Same results as parsing log entries in range, for sorted and unsorted logs
+    sorted_data = ("86400|a|A|/a\n86400|b|M|/b\n100000|a|D|/b\n259200|a|M|/a\n259300|c|M|/a\n"
+                   "432000|b|D|/b\n518400|c|A|/c\n518400|a|M|/a\n520000|b|M|/c\n")
+    unsorted_data = "86400|a|A|/a\n432000|a|M|/a\n259200|b|M|/a\n518400|b|D|/a\n"
+    time_ranges = [(None, None), (86400, None), (None, 259200), (200000, 450000), (600000, None),
+                   (90000, 259200), (259250, 518400), (100000, 519000)]
+
+    def assert_stats(columns, data):
+        for start_time, stop_time in time_ranges:
+            entries = [e for e in iter_gource_log(data)
+                       if (start_time is None or e.timestamp >= start_time)
+                       and (stop_time is None or e.timestamp <= stop_time)]
+            expected = GourceLogStats().update(entries)
+            assert columns.get_stats(start_time, stop_time).to_dict() == expected.to_dict()
+        entries = list(iter_gource_log(data))
+        assert columns.user_change_counts() == collections.Counter(e.user for e in entries)
+        assert columns.daily_change_counts() == collections.Counter(
+            datetime.utcfromtimestamp(e.timestamp).date() for e in entries)
+
+    for data, is_sorted in [(sorted_data, True), (unsorted_data, False)]:
+        with write_gource_log_columns(data, tmp_path / f'{is_sorted}.cols') as columns:
+            assert columns.is_sorted == is_sorted
+            assert columns.meta['version'] == GourceLogColumns.VERSION
+            assert_stats(columns, data)
+    assert (tmp_path / 'True.cols' / 'days.bin').exists()
+    assert (tmp_path / 'True.cols' / 'user_counts.bin').exists()
+
+    # Appending continues totals (including same day and commit as last entry)
+    append_data = "520000|d|A|/d\n520000|a|M|/a\n604800|d|M|/d\n"
+    with write_gource_log_columns(sorted_data, tmp_path / 'append.cols') as columns:
+        assert columns.is_sorted
+    append_gource_log_columns(tmp_path / 'append.cols', iter_gource_log(append_data))
+    with GourceLogColumns(tmp_path / 'append.cols') as columns:
+        assert columns.is_sorted
+        assert_stats(columns, sorted_data + append_data)
+
+    # Appending older entries clears sorted flag
+    append_gource_log_columns(tmp_path / 'append.cols', iter_gource_log("172800|d|A|/d\n"))
+    with GourceLogColumns(tmp_path / 'append.cols') as columns:
+        assert not columns.is_sorted
+        assert columns.get_stats(100000, None).num_changes == 11
+        assert_stats(columns, sorted_data + append_data + "172800|d|A|/d\n")
+
+
+def test_gource_log_slice(tmp_path):
+    # One entry per day, starting 2020-01-01 (UTC)
+    log_path = tmp_path / "gource.log"
+    with open(log_path, 'w') as f:
+        for day in range(100):
+            f.write(f"{1577836800 + day*86400}|user{day % 3}|M|/file{day}.txt\n")
+    log_index = GourceLogIndex.from_log(log_path, block_size=100)
+    assert len(log_index) > 10
+    assert log_index.blocks[0][0] == 0
+    assert log_index.size == os.path.getsize(log_path)
+    log_index.save(tmp_path / "gource.log.idx")
+    assert GourceLogIndex.load(tmp_path / "gource.log.idx").blocks == log_index.blocks
+
+    # Only blocks around selected dates are copied (dates still applied by Gource)
+    gource_options = {'start-date': '2020-03-01', 'stop-date': '2020-03-10 12:00:00', 'seconds-per-day': '1'}
+    slice_path = tmp_path / "slice.log"
+    assert write_gource_log_slice(log_path, slice_path, gource_options, log_index=log_index) == gource_options
+    days = [(entry.timestamp - 1577836800) // 86400 for entry in iter_gource_log(slice_path)]
+    assert days == list(range(days[0], days[-1] + 1))
+    assert days[0] <= 60 and days[-1] >= 69
+    assert len(days) < 20
+    tail_entries = list(iter_gource_log(log_index.iter_lines(log_path, 1577836800 + 98*86400)))
+    assert [entry.path for entry in tail_entries[-2:]] == ['/file98.txt', '/file99.txt']
+    assert len(tail_entries) < 10
+
+    # Positions are applied to slice (and removed)
+    gource_options = {'start-position': '0.5', 'stop-position': '0.75'}
+    assert write_gource_log_slice(log_path, slice_path, gource_options) == {}
+    entries = list(iter_gource_log(slice_path))
+    assert 20 <= len(entries) <= 30
+    assert entries[-1].timestamp > entries[0].timestamp
+    # - No options copies full log
+    assert write_gource_log_slice(log_path, slice_path, {}) == {}
+    assert slice_path.read_bytes() == log_path.read_bytes()
+
+
+def _git(*args, cwd=None, env=None):
+    # Run `git` command (with test identity) and return output
+    return subprocess.run(['git', '-c', 'user.name=Test', '-c', 'user.email=test@localhost'] + list(args),
+                          cwd=cwd, env=env, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def test_git_mirror(tmp_path):
+    git = _git
+    source = tmp_path / "source"
+    source.mkdir()
+    git('init', '--quiet', '--initial-branch', 'main', cwd=source)
+    (source / "README").write_text("one\n")
+    git('add', 'README', cwd=source)
+    git('commit', '--quiet', '-m', 'First', cwd=source)
+    url = f"file://{source}"
+
+    cache_dir = tmp_path / "cache"
+    with override_settings(VCS_CACHE_DIR=cache_dir, VCS_CACHE_MAX_SIZE=None):
+        # Initial clone
+        with git_mirror(url, "main") as repo_path:
+            assert repo_path.parent == cache_dir
+            assert git('log', '--pretty=format:%s', 'refs/heads/main', cwd=repo_path) == "First"
+        mirror_path = repo_path
+
+        # New commit is fetched into same mirror (eviction left to periodic task)
+        (source / "README").write_text("two\n")
+        git('commit', '--quiet', '-am', 'Second', cwd=source)
+        with patch('gource_studio.core.utils.evict_git_mirrors') as mock_evict, \
+                git_mirror(url, "main") as repo_path:
+            assert repo_path == mirror_path
+            assert git('log', '--pretty=format:%s', 'refs/heads/main', cwd=repo_path) == "Second\nFirst"
+        assert not mock_evict.called
+
+        # Tags listed from mirror (without generating Gource log)
+        git('tag', 'v1.0', cwd=source)
+        with patch('gource_studio.core.utils.download_vcs_log') as mock_download:
+            assert [name for _, name in download_git_tags(url, "main")] == ["v1.0"]
+            assert not mock_download.called
+
+        # Corrupted mirror is re-cloned
+        (mirror_path / ".git" / "HEAD").unlink()
+        with git_mirror(url, "main") as repo_path:
+            assert git('log', '--pretty=format:%s', '-n', '1', 'refs/heads/main', cwd=repo_path) == "Second"
+
+        # Eviction (within size limit, then over it)
+        assert evict_git_mirrors(max_size=1024**3) == []
+        size_path = mirror_path.with_name(f'{mirror_path.name}.size')
+        assert int(size_path.read_text()) > 0
+        # - Cached size reused until mirror is used again
+        size_path.write_text("0")
+        assert evict_git_mirrors(max_size=0) == []
+        os.utime(size_path, (0, 0))     # Measured before last use
+        assert evict_git_mirrors(max_size=0) == [mirror_path]
+        assert not size_path.exists()
+        assert not mirror_path.exists()
+        assert mirror_path.with_name(f'{mirror_path.name}.lock').exists()
+        assert evict_git_mirrors(max_size=0) == []
+
+    # Without cache, a temporary clone is used
+    with override_settings(VCS_CACHE_DIR=None):
+        with git_mirror(url, "main") as repo_path:
+            assert repo_path.is_dir()
+        assert not repo_path.exists()
+
+
+def test_download_git_snapshot():
+    calls = []
+    def _fake_download_vcs_log(url, branch="master", log_stats=None, vcs="git"):
+        calls.append(url)
+        log_stats.update(iter_gource_log(f"{len(calls)}|foo|A|/README\n"))
+        return f"{len(calls)}|foo|A|/README\n", "abc", "Subject", []
+
+    with patch('gource_studio.core.utils.download_vcs_log', _fake_download_vcs_log):
+        # Back-to-back requests reuse cached snapshot
+        snapshot = download_git_snapshot("https://example.com/foo.git", cache_timeout=60)
+        assert download_git_snapshot("https://example.com/foo.git", cache_timeout=60).log_data == snapshot.log_data
+        assert len(calls) == 1
+        # Refresh forces new download (cached for later requests)
+        snapshot = download_git_snapshot("https://example.com/foo.git", cache_timeout=60, refresh=True)
+        assert snapshot.log_data == "2|foo|A|/README\n"
+        assert download_git_snapshot("https://example.com/foo.git", cache_timeout=60).log_data == snapshot.log_data
+        assert len(calls) == 2
+
+
+def test_git_gource_log(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git('init', '--quiet', '--initial-branch', 'main', cwd=repo)
+
+    def commit(timestamp, author, message):
+        env = dict(os.environ, GIT_COMMITTER_DATE=f"{timestamp} +0000", GIT_AUTHOR_DATE=f"{timestamp} +0000")
+        _git('-c', f'user.name={author}', 'commit', '--quiet', '-m', message, cwd=repo, env=env)
+
+    (repo / "README").write_text("one\n")
+    (repo / "src").mkdir()
+    (repo / "src" / "main file.py").write_text("print()\n")
+    _git('add', '.', cwd=repo)
+    commit(1600000000, "Alice", "Initial")
+    (repo / "README").write_text("two\n")
+    (repo / "src" / "main file.py").rename(repo / "src" / "m\u00e4in.py")
+    _git('add', '-A', cwd=repo)
+    commit(1600086400, "Bob|Builder", "Rename")
+    _git('rm', '--quiet', 'README', cwd=repo)
+    commit(1600259200, "Alice", "Remove")
+
+    entries = [(e.timestamp, e.user, e.action, e.path) for e in iter_git_gource_log(repo, branch="main")]
+    assert entries == [
+        (1600000000, "Alice", "A", "/README"),
+        (1600000000, "Alice", "A", "/src/main file.py"),
+        (1600086400, "BobBuilder", "M", "/README"),
+        (1600086400, "BobBuilder", "D", "/src/main file.py"),
+        (1600086400, "BobBuilder", "A", "/src/m\u00e4in.py"),
+        (1600259200, "Alice", "D", "/README"),
+    ]
+
+    # Written log matches Gource format, with stats filled in the same pass
+    log_path = tmp_path / "gource.log"
+    log_stats = GourceLogStats()
+    sha256, size = write_git_gource_log(repo, log_path, branch="main", log_stats=log_stats)
+    assert size == log_path.stat().st_size
+    assert log_path.read_text(encoding="utf-8").splitlines()[2] == "1600086400|BobBuilder|M|/README"
+    assert log_stats.to_dict() == GourceLogStats.from_log(log_path).to_dict()
+    assert log_stats.summary()['num_commits'] == 3
+
+    # Unknown branch
+    with pytest.raises(RuntimeError, match="missing"):
+        list(iter_git_gource_log(repo, branch="missing"))
+
+
+@pytest.mark.skipif(not shutil.which('hg'), reason="Mercurial not installed")
+def test_hg_mirror(tmp_path):
+    def hg(*args, cwd=None):
+        env = dict(os.environ, HGPLAIN='1', HGUSER='Alice <alice@localhost>')
+        return subprocess.run(['hg'] + list(args), cwd=cwd, env=env,
+                              check=True, capture_output=True, text=True).stdout.strip()
+
+    source = tmp_path / "source"
+    hg('init', str(source))
+    (source / "README").write_text("one\n")
+    (source / "src").mkdir()
+    (source / "src" / "main.py").write_text("print()\n")
+    hg('add', '--quiet', cwd=source)
+    hg('commit', '--quiet', '-m', 'First', '-d', '1600000000 0', cwd=source)
+    hg('tag', '--quiet', '-d', '1600000100 0', 'v1.0', cwd=source)
+    url = str(source)
+
+    with override_settings(VCS_CACHE_DIR=tmp_path / "cache", VCS_CACHE_MAX_SIZE=None):
+        with hg_mirror(url, "default") as repo_path:
+            mirror_path = repo_path
+            assert [e.path for e in iter_hg_gource_log(repo_path, branch="default")] == \
+                ["/README", "/src/main.py", "/.hgtags"]
+            tags = retrieve_tags_from_hg_repo(repo_path, branch="default")
+            assert [(t.timestamp(), name) for t, name in tags] == [(1600000000, "v1.0")]
+
+        # New changesets are pulled into same mirror (other branches excluded)
+        (source / "README").write_text("two\n")
+        hg('rm', '--quiet', 'src/main.py', cwd=source)
+        hg('commit', '--quiet', '-m', 'Second', '-u', 'Bob', '-d', '1600086400 0', cwd=source)
+        hg('branch', '--quiet', 'feature', cwd=source)
+        (source / "feature.txt").write_text("wip\n")
+        hg('add', '--quiet', cwd=source)
+        hg('commit', '--quiet', '-m', 'Feature', '-d', '1600172800 0', cwd=source)
+        with hg_mirror(url, "default") as repo_path:
+            assert repo_path == mirror_path
+            entries = [(e.timestamp, e.user, e.action, e.path) for e in iter_hg_gource_log(repo_path, branch="default")]
+            assert entries[-2:] == [(1600086400, "Bob", "M", "/README"), (1600086400, "Bob", "D", "/src/main.py")]
+            assert "feature" not in hg('branches', cwd=repo_path)
+
+
+def test_get_ffmpeg_encoder_args():
+    args = get_ffmpeg_encoder_args(get_encoder_profile('draft'), 60)
+    assert args[:2] == ['-vcodec', 'libx264']
+    assert args[args.index('-preset') + 1] == 'ultrafast'
+    assert args[args.index('-crf') + 1] == '28'
+    assert args[args.index('-tune') + 1] == 'animation'
+    assert args[args.index('-g') + 1] == '600'
+    assert get_encoder_profile() == get_encoder_profile('standard')
+
+    with override_settings(ENCODER_PROFILES={'draft': {'preset': 'ultrafast', 'tune': None}}):
+        args = get_ffmpeg_encoder_args(get_encoder_profile('draft'), 30)
+        assert args[args.index('-preset') + 1] == 'ultrafast'
+        assert '-tune' not in args
+        assert args[args.index('-g') + 1] == '300'
+    with pytest.raises(ValueError):
+        get_encoder_profile('lossless')
+
+
+def test_copy_ppm_frames():
+    frames = [bytes([n]) * 4 * 2 * 3 for n in range(3)]
+    src = BytesIO(b"".join(b"P6\n4 2\n255\n" + frame for frame in frames))
+    dst = BytesIO()
+    assert copy_ppm_frames(src, dst, 4, 2) == 3
+    assert dst.getvalue() == b"".join(frames)
+
+    # Frame size must match FFmpeg input size
+    with pytest.raises(ValueError):
+        copy_ppm_frames(BytesIO(b"P6\n2 4\n255\n" + frames[0]), BytesIO(), 4, 2)
+    with pytest.raises(ValueError):
+        copy_ppm_frames(BytesIO(b"P6\n4 2\n255\n" + frames[0][:-1]), BytesIO(), 4, 2)
+
+    with override_settings(GOURCE_PIPE_FORMAT={'1920x1080': 'rawvideo'}):
+        assert get_gource_pipe_format('1920x1080') == 'rawvideo'
+        assert get_gource_pipe_format('1280x720') == 'ppm'
+
+
+def test_write_gource_log_segments(tmp_path):
+    # One commit per day (with a 2 day gap before day 48), files added and later removed
+    lines = []
+    timestamp = 1577836800
+    for day in range(100):
+        timestamp += 86400 * (3 if day == 48 else 1)
+        user = "Alice" if day % 2 else "Bob"
+        lines.append(f"{timestamp}|{user}|A|/file{day}.txt")
+        if day % 3 == 2:
+            lines.append(f"{timestamp}|{user}|D|/file{day - 1}.txt")
+        elif day:
+            lines.append(f"{timestamp}|{user}|M|/file0.txt")
+    log_path = tmp_path / "gource.log"
+    log_path.write_text("\n".join(lines) + "\n")
+    gource_options = {'seconds-per-day': '1', 'auto-skip-seconds': '3', 'stop-date': '2030-01-01'}
+
+    # Too short to split
+    assert write_gource_log_segments(log_path, tmp_path, 4, gource_options, min_duration=60) == \
+        [(log_path, gource_options, 0)]
+
+    segments = write_gource_log_segments(log_path, tmp_path, 4, gource_options, min_duration=10)
+    assert len(segments) == 4
+    assert [s.preroll_seconds for s in segments] == [0, 1.5, 1.5, 1.5]
+    assert ['stop-date' in s.gource_options for s in segments] == [False, False, False, True]
+
+    # Windows contain whole log in order (after pre-roll entries), split at longest gap
+    window_lines = [s.log_path.read_text().splitlines() for s in segments]
+    preroll_lines = [[line for line in w if line not in lines] for w in window_lines]
+    assert preroll_lines[0] == []
+    assert sum((w[len(p):] for w, p in zip(window_lines, preroll_lines)), []) == lines
+    assert window_lines[2][len(preroll_lines[2])] == f"{1577836800 + 86400*51}|Bob|A|/file48.txt"
+
+    # Pre-roll adds files present at start of window (by last author)
+    start = 1577836800 + 86400*51
+    assert all(line.startswith(f"{start - 129600}|") for line in preroll_lines[2])
+    preroll_paths = {line.split('|')[3]: line.split('|')[1] for line in preroll_lines[2]}
+    assert preroll_paths["/file0.txt"] == "Bob"
+    assert "/file46.txt" not in preroll_paths and "/file47.txt" in preroll_paths
+    assert len(preroll_paths) == 48 - 16
+
+
+def test_write_gource_log_increment(tmp_path):
+    log_path = tmp_path / "gource.log"
+    log_path.write_text("1577836800|Alice|A|/a.txt\n1577923200|Bob|A|/b.txt\n1578009600|Bob|D|/a.txt\n")
+    offset = log_path.stat().st_size
+    assert write_gource_log_increment(log_path, tmp_path / "new.log", offset) is None
+
+    with open(log_path, 'a') as f:
+        f.write("1578096000|Alice|M|/b.txt\n")
+    segment = write_gource_log_increment(log_path, tmp_path / "new.log", offset, {'seconds-per-day': '1'})
+    assert segment.preroll_seconds == 1.5
+    # Pre-roll adds files present at end of earlier log, followed by new entries
+    assert segment.log_path.read_text().splitlines() == [
+        f"{1578096000 - 129600}|Bob|A|/b.txt",
+        "1578096000|Alice|M|/b.txt",
+    ]
+
+
+def test_add_background_audio(tmp_path):
+    video_path = tmp_path / "video.mp4"
+    video_path.write_bytes(b"video")
+    audio_path = tmp_path / "audio.mp3"
+    audio_path.write_bytes(b"audio")
+    # Stand-in for FFmpeg (records arguments, writes output file)
+    ffmpeg_path = tmp_path / "ffmpeg"
+    ffmpeg_path.write_text("#!/bin/sh\nfor last; do :; done\n"
+                           f"printf '%s\\n' \"$@\" > {tmp_path / 'args.txt'}\n"
+                           "echo mixed > \"$last\"\n")
+    ffmpeg_path.chmod(0o755)
+
+    with override_settings(DEBUG=False, FFMPEG_PATH=str(ffmpeg_path)):
+        with patch('gource_studio.core.utils.get_video_duration', return_value=60.0):
+            output_path = add_background_audio(str(video_path), str(audio_path), output_path=tmp_path / "output.mp4")
+    assert (tmp_path / "output.mp4").read_text() == "mixed\n"
+    assert output_path == tmp_path / "output.mp4"
+
+    # Single pass: video stream copied, audio looped/trimmed/faded in one filter graph
+    args = (tmp_path / "args.txt").read_text().splitlines()
+    assert args[args.index('-c:v') + 1] == 'copy'
+    assert args[args.index('-stream_loop') + 1] == '-1'
+    assert args[args.index('-filter_complex') + 1] == \
+        '[1:a:0] atrim=duration=60.000, afade=t=out:st=58.000:d=2.000 [a]'
+
+
+def test_generate_gource_video_resume(tmp_path):
+    # 100 days of commits (split into 4 checkpoints)
+    log_path = tmp_path / "gource.log"
+    log_path.write_text("".join(f"{1577836800 + day*86400}|Alice|A|/file{day}.txt\n" for day in range(100)))
+    # Stand-in for FFmpeg concat (joins segment file contents)
+    ffmpeg_path = tmp_path / "ffmpeg"
+    ffmpeg_path.write_text("#!/bin/sh\nfor last; do :; done\n"
+                           "sed -n \"s/^file '\\(.*\\)'$/\\1/p\" \"$7\" | xargs cat > \"$last\"\n")
+    ffmpeg_path.chmod(0o755)
+
+    started = []
+    def start_render(log_path, workdir, gource_options, *, skip_frames=0, fail=False, **kwargs):
+        # Stand-in for Gource/FFmpeg processes
+        started.append(workdir.name)
+        (workdir / 'output.mp4').write_text(f"{workdir.name}\n")
+        return (subprocess.Popen(['true']), subprocess.Popen(['false' if fail else 'true']), workdir / 'output.mp4')
+
+    work_dir = tmp_path / "work"
+    options = {'seconds-per-day': '1', 'auto-skip-seconds': '3'}
+    with override_settings(DEBUG=False, FFMPEG_PATH=str(ffmpeg_path), GOURCE_CHECKPOINT_SECONDS=25,
+                           GOURCE_SEGMENT_MIN_SECONDS=10):
+        # Interrupted during third segment
+        def failing_start_render(log_path, workdir, gource_options, **kwargs):
+            return start_render(log_path, workdir, gource_options, fail=workdir.name == 'segment.2', **kwargs)
+        with patch('gource_studio.core.utils._start_gource_render', failing_start_render):
+            with pytest.raises(RuntimeError):
+                generate_gource_video(log_path, gource_options=dict(options), segments=1, work_dir=work_dir,
+                                      output_path=tmp_path / "video.mp4")
+        assert started == ['segment.0', 'segment.1', 'segment.2']
+        manifest = load_render_manifest(work_dir)
+        assert [segment['completed'] for segment in manifest['segments']] == [True, True, False, False]
+
+        # Resumed from first incomplete segment
+        started.clear()
+        with patch('gource_studio.core.utils._start_gource_render', start_render):
+            generate_gource_video(log_path, gource_options=dict(options), segments=1, work_dir=work_dir,
+                                  output_path=tmp_path / "video.mp4")
+        assert started == ['segment.2', 'segment.3']
+        assert (tmp_path / "video.mp4").read_text().split() == ['segment.0', 'segment.1', 'segment.2', 'segment.3']
+
+        # Different options start over
+        started.clear()
+        with patch('gource_studio.core.utils._start_gource_render', start_render):
+            generate_gource_video(log_path, gource_options=dict(options, **{'seconds-per-day': '2'}), segments=1,
+                                  work_dir=work_dir, output_path=tmp_path / "video.mp4")
+        assert started[0] == 'segment.0'
+
+    # Work directory lock
+    with try_lock_directory(work_dir) as acquired:
+        assert acquired
+        with try_lock_directory(work_dir) as acquired_again:
+            assert not acquired_again
+
+
+def test_generate_gource_video_audio(tmp_path):
+    log_path = tmp_path / "gource.log"
+    log_path.write_text("".join(f"{1577836800 + day*86400}|Alice|A|/file{day}.txt\n" for day in range(100)))
+    audio_path = tmp_path / "audio.mp3"
+    audio_path.write_bytes(b"audio")
+    # Stand-in for FFmpeg concat (joins segment file contents)
+    ffmpeg_path = tmp_path / "ffmpeg"
+    ffmpeg_path.write_text("#!/bin/sh\nfor last; do :; done\n"
+                           "sed -n \"s/^file '\\(.*\\)'$/\\1/p\" \"$7\" | xargs cat > \"$last\"\n")
+    ffmpeg_path.chmod(0o755)
+
+    render_audio = []
+    invalid_audio = []
+    def start_render(log_path, workdir, gource_options, *, audio_settings=None, **kwargs):
+        # Stand-in for Gource/FFmpeg processes (FFmpeg fails if audio is invalid)
+        render_audio.append(audio_settings)
+        (workdir / 'output.mp4').write_text(f"{workdir.name}\n")
+        ffmpeg_cmd = ['false'] if audio_settings and invalid_audio else ['true']
+        return (subprocess.Popen(['true']), subprocess.Popen(ffmpeg_cmd), workdir / 'output.mp4')
+
+    def mix_audio(video_path, audio_path, loop=True, output_path=None):
+        shutil.copyfile(video_path, output_path)
+        with open(output_path, 'a') as f:
+            f.write("audio\n")
+        return output_path
+
+    options = {'seconds-per-day': '1', 'auto-skip-seconds': '3'}
+    with override_settings(DEBUG=False, FFMPEG_PATH=str(ffmpeg_path), GOURCE_CHECKPOINT_SECONDS=25,
+                           GOURCE_SEGMENT_MIN_SECONDS=10):
+        with patch('gource_studio.core.utils._start_gource_render', start_render), \
+                patch('gource_studio.core.utils.add_background_audio', side_effect=mix_audio) as mock_mix:
+            # Single segment: audio muxed by main FFmpeg process (no extra pass)
+            generate_gource_video(log_path, gource_options=dict(options), segments=1, background_audio=str(audio_path),
+                                  estimated_duration=100.0, output_path=tmp_path / "video.mp4")
+            assert render_audio == [(str(audio_path), 100.0)]
+            assert not mock_mix.called
+            assert (tmp_path / "video.mp4").read_text().split() == ['segment.0']
+
+            # Checkpoint segments: audio mixed after joining segments
+            render_audio.clear()
+            generate_gource_video(log_path, gource_options=dict(options), segments=1, background_audio=str(audio_path),
+                                  estimated_duration=100.0, work_dir=tmp_path / "work", output_path=tmp_path / "video.mp4")
+            assert render_audio == [None, None, None, None]
+            assert mock_mix.call_count == 1
+            assert (tmp_path / "video.mp4").read_text().split() == ['segment.0', 'segment.1', 'segment.2', 'segment.3', 'audio']
+
+            # Invalid audio: rendered again without audio, keeping silent video if mixing fails too
+            render_audio.clear()
+            invalid_audio.append(True)
+            mock_mix.side_effect = RuntimeError("Invalid audio")
+            generate_gource_video(log_path, gource_options=dict(options), segments=1, background_audio=str(audio_path),
+                                  estimated_duration=100.0, output_path=tmp_path / "video.mp4")
+            assert render_audio == [(str(audio_path), 100.0), None]
+            assert mock_mix.call_count == 2
+            assert (tmp_path / "video.mp4").read_text().split() == ['segment.0']